@@ -0,0 +1,174 @@
+"""Benchmarks of the simulation: steps per second of a trial and trials per
+second, for every engine, on the bundled specs (networkfile.py,
+networkfileXOR.py) and on synthetic networks of 10^2 .. 10^5 LIF neurons
+with a fixed fan-in. Results are written as JSON, and can be compared with
+a baseline (a JSON file of an earlier run; bench_baseline.json is that of
+the defaults, on the machine named in it):
+
+	python benchmark.py --out bench.json
+	python benchmark.py --compare bench_baseline.json 	# fails on a slowdown
+
+Engines:
+-	objects 	: Network.simulate(engine='objects'), one trial
+-	compiled 	: Network.simulate(engine='compiled'), one trial
+-	event 		: Network.simulate(engine='event'), one trial (LIF only)
+-	batch 		: Network.simulate_batch, n_trials trials at once
+"""
+import sys
+import json
+import argparse
+import platform
+from timeit import default_timer as timer
+import numpy as np
+
+import network
+import tasks
+import kernels
+
+engines = [ 'objects', 'compiled', 'event', 'batch' ]
+
+# the largest networks (in neurons) every engine is run on, by default
+max_neurons = dict( objects=10**3, compiled=10**5, event=10**3, batch=10**4 )
+
+def synthetic_spec(n, fan_in):
+	"""A declarative spec of n LIF neurons, each with fan_in synapses from
+	random other neurons of the layer; both inputs project to all of them,
+	and they project to out1
+	"""
+	return { "populations": { "lyr": {"type": "LIF", "n": n} },
+		"projections": [
+			{"pre": "in0", "post": "lyr"},
+			{"pre": "in1", "post": "lyr"},
+			{"pre": "lyr", "post": "lyr", "rule": "fixed_indegree",
+			 "k": fan_in, "w": 0.5 / fan_in},
+			{"pre": "lyr", "post": "out1", "w": 1.0 / n},
+		] }
+
+def cases(sizes=(10**2, 10**3, 10**4, 10**5), fan_ins=(10, 100)):
+	"""The benchmark cases: (name, spec, task, n_neurons, fan_in)"""
+	found = []
+	for fname, task in [ ('networkfile.py', tasks.Discrimination()),
+						 ('networkfileXOR.py', tasks.XOR()) ]:
+		with open(fname) as f:
+			found.append( (fname, f.read(), task, None, None) )
+	for n in sizes:
+		for k in fan_ins:
+			if k < n:
+				found.append( ('lif_{}_k{}'.format(n, k), synthetic_spec(n, k),
+					tasks.Discrimination(), n, k) )
+	return found
+
+def run_case(name, spec, task, engine, T=1000, dt=1.0, n_trials=20, seed=1,
+				repeat=1):
+	"""Time one case on one engine; the best of repeat runs.
+	Returns a dict (a row of the results), or None if the engine can't
+	simulate the network
+	"""
+	t0 = timer()
+	net = network.Network(spec, task=task, seed=seed)
+	build = timer() - t0
+	best = None
+	for _ in xrange(repeat):
+		t0 = timer()
+		try:
+			if engine == 'batch':
+				results, _ = net.simulate_batch(n_trials, T, dt, seed=seed)
+				# steps simulated, counted per trial
+				steps = sum( int(rt // dt) + 1 for _, rt in results )
+				trials = n_trials
+			else:
+				_, rt = net.simulate(T, dt, engine=engine, progress=False)
+				steps, trials = int(rt // dt) + 1, 1
+		except network.engine.Unsupported_network:
+			# this engine can't simulate the network (e.g. event: only LIF)
+			return None
+		wall = timer() - t0
+		if best is None or wall < best[0]:
+			best = (wall, steps, trials)
+	wall, steps, trials = best
+	n_neurons, n_synapses = net.size()
+	return dict( case=name, engine=engine, n_neurons=n_neurons,
+		n_synapses=n_synapses, build_s=build, wall_s=wall, steps=steps,
+		trials=trials, steps_per_s=steps / wall, trials_per_s=trials / wall )
+
+def run(cases, engines=engines, max_neurons=max_neurons, verbose=True,
+			**kw):
+	"""Run all cases on all engines (skipping networks larger than
+	max_neurons[engine]); kw are passed to run_case. Returns the rows
+	"""
+	rows = []
+	for name, spec, task, n, fan_in in cases:
+		for engine in engines:
+			if n is not None and n > max_neurons.get(engine, n):
+				continue
+			row = run_case(name, spec, task, engine, **kw)
+			if row is None:
+				continue
+			row['fan_in'] = fan_in
+			rows.append(row)
+			if verbose:
+				print "{case:>20} {engine:>9}: {steps_per_s:10.1f} steps/s " \
+					"{trials_per_s:8.3f} trials/s".format(**row)
+				sys.stdout.flush()
+	return rows
+
+def save(rows, fname):
+	"""Write the rows (and where they were measured) to a JSON file"""
+	with open(fname, 'w') as f:
+		json.dump( dict( machine=platform.platform(), numpy=np.__version__,
+			python=platform.python_version(), numba=kernels.have_numba,
+			results=rows ), f, indent=1 )
+	return
+
+def load(fname):
+	"""The rows of a JSON file written by save"""
+	with open(fname) as f:
+		return json.load(f)['results']
+
+def compare(rows, baseline, tolerance=0.2):
+	"""Compare rows with the rows of a baseline, by (case, engine).
+	Returns (case, engine, speedup) for every pair in both, and the pairs
+	that are more than tolerance slower (by steps/s) than the baseline
+	"""
+	base = dict( ((row['case'], row['engine']), row) for row in baseline )
+	speedups, slower = [], []
+	for row in rows:
+		key = (row['case'], row['engine'])
+		if key not in base:
+			continue
+		speedup = row['steps_per_s'] / base[key]['steps_per_s']
+		speedups.append( key + (speedup,) )
+		if speedup < 1.0 - tolerance:
+			slower.append( key + (speedup,) )
+	return speedups, slower
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--out', help="write the results to this JSON file")
+	parser.add_argument('--compare', help="baseline JSON file to compare with")
+	parser.add_argument('--tolerance', type=float, default=0.2,
+		help="fail if more than this fraction slower than the baseline")
+	parser.add_argument('--engines', nargs='+', default=engines,
+		choices=engines)
+	parser.add_argument('--sizes', nargs='+', type=int,
+		default=[10**2, 10**3, 10**4, 10**5], help="synthetic network sizes")
+	parser.add_argument('--fan-in', nargs='+', type=int, default=[10, 100])
+	parser.add_argument('--T', type=float, default=1000)
+	parser.add_argument('--trials', type=int, default=20,
+		help="trials per batch (batch engine)")
+	parser.add_argument('--repeat', type=int, default=1)
+	args = parser.parse_args()
+
+	rows = run(cases(args.sizes, args.fan_in), args.engines, T=args.T,
+		n_trials=args.trials, repeat=args.repeat)
+	if args.out:
+		save(rows, args.out)
+	if args.compare:
+		speedups, slower = compare(rows, load(args.compare), args.tolerance)
+		for case, engine, speedup in speedups:
+			print "{:>20} {:>9}: {:.2f}x".format(case, engine, speedup)
+		if slower:
+			print "Slower than the baseline: {}".format(
+				", ".join( "{} ({})".format(*s[:2]) for s in slower ))
+			sys.exit(1)
@@ -0,0 +1,82 @@
+import numpy as np
+
+class Decision_detector(object):
+	"""Detects when a perceptual descision is made: when one of the output
+	neurons fires more than f_thres spikes/ms within the last window ms.
+	The output spikes of the last window are kept in a ring buffer, with a
+	running count per output, so an update and a check are O(1) per step
+	(instead of summing over the whole window every step).
+	Supports any number of outputs, and several independent trials at once
+	(n_trials), for batched simulations.
+	"""
+	def __init__(self, n_out=2, window=300, f_thres=0.10, t_check=300,
+					dt=1.0, n_trials=1):
+		"""
+		- n_out 	: number of output neurons
+		- window 	: length (ms) of the window spikes are counted in
+		- f_thres 	: descision when > f_thres spikes/ms in the window
+		- t_check 	: only check for descisions after t_check ms
+		- dt 		: the time step of the simulation
+		- n_trials 	: number of trials simulated at once
+		"""
+		super(Decision_detector, self).__init__()
+		self.n_out = n_out
+		self.window = window
+		self.f_thres = f_thres
+		self.t_check = t_check
+		# the window in time steps, and the threshold in spikes per window:
+		self.n_win = max(1, int(round(window / dt)))
+		self.threshold = f_thres * window
+		# ring buffer of output spikes, and the spikes in it per output:
+		self.buffer = np.zeros((self.n_win, n_trials, n_out), dtype=bool)
+		self.nspikes = np.zeros((n_trials, n_out), dtype=int)
+		self.pos = 0
+		return
+
+	def update(self, spikes):
+		"""Add the output spikes of this time step; (n_trials x) n_out"""
+		spikes = np.reshape(spikes, self.nspikes.shape)
+		self.nspikes -= self.buffer[self.pos]
+		self.nspikes += spikes
+		self.buffer[self.pos] = spikes
+		self.advance()
+		return
+
+	def advance(self):
+		"""Go on to the next time step; its spikes were added in place, as
+		the fused kernel does (see kernels.fused_step)
+		"""
+		self.pos = (self.pos + 1) % self.n_win
+		return
+
+	def check(self, t, f_thres=None):
+		"""The descision made at time t, per trial: the index of the first
+		output over threshold, or -1 if there is none (yet)
+		- f_thres : check against this threshold (spikes/ms) instead of the
+					detector's own
+		"""
+		if t <= self.t_check:
+			return -np.ones(self.nspikes.shape[0], dtype=int)
+		threshold = self.threshold if f_thres is None else f_thres * self.window
+		over = self.nspikes > threshold
+		return np.where(over.any(axis=1), np.argmax(over, axis=1), -1)
+
+	def snapshot(self):
+		"""A copy of the spikes in the window of all trials (see restore)"""
+		return dict( buffer=self.buffer.copy(), nspikes=self.nspikes.copy(),
+			pos=self.pos )
+
+	def restore(self, snap, idx):
+		"""Continue from a snapshot: trial k gets the window of trial idx[k]
+		of snap
+		"""
+		self.buffer = snap['buffer'][:, idx]
+		self.nspikes = snap['nspikes'][idx]
+		self.pos = snap['pos']
+		return
+
+	def take(self, trials):
+		"""Only keep the given trials (index or boolean mask)"""
+		self.buffer = self.buffer[:, trials]
+		self.nspikes = self.nspikes[trials]
+		return
@@ -0,0 +1,918 @@
+import numpy as np
+import scipy.sparse
+
+from neurons import LIF_Neuron, Izh_Neuron, Background_noise, gather_state, \
+	scatter_state, new_populations, _izh_params
+from synapses import Neuronal_synapse, Poisson_synapse, Continuous_synapse
+from integrators import izh_integrators, lif_integrators
+# the fused (numba) time step
+import kernels
+
+class Unsupported_network(TypeError):
+	"""Raised when an engine can't simulate a network (e.g. custom neuron
+	types for the compiled engine, Izh neurons for the event engine)
+	"""
+	pass
+
+class Network_arrays(object):
+	"""The neurons and synapses of a network as flat arrays: their types,
+	parameters and state (one array per field, see nrn_fields/syn_fields, in
+	the dicts nrn and syn), and which synapses project to which neurons (a
+	sparse matrix). This is what Compiled_network simulates.
+	They are lowered from the objects of a network (see lower), or built
+	straight from a declarative spec (see netspec.build): then no object is
+	made per neuron or synapse, until they're asked for (see objects()).
+		Neurons and synapses are added in groups (add_neurons, add_synapses),
+	then connected (connect); finish() makes the arrays. Every field has an
+	entry for every neuron (or synapse), also if only some types use it
+	"""
+	nrn_types = (Izh_Neuron, LIF_Neuron)
+	syn_types = (Poisson_synapse, Neuronal_synapse, Continuous_synapse)
+
+	# the fields of the neurons and synapses, and their dtypes
+	nrn_fields = dict( [ (par, float) for par in 'abcds' ] +
+		[ (par, float) for par in LIF_Neuron._params ] +
+		[ ('kind', np.int8), ('izh_type', object), ('method', object),
+		  ('name', object), ('record', bool), ('bg_rate', float),
+		  ('bg_w', float), ('V', float), ('U', float), ('spiking', bool),
+		  ('Vm', float), ('t_r', float), ('bg_I', float) ] )
+	syn_fields = dict( kind=np.int8, w=float, tau=float, exact=bool, pre=int,
+		rate=float, onset=float, offset=float, name=object, record=bool,
+		Iout=float, on=bool )
+
+	def __init__(self):
+		super(Network_arrays, self).__init__()
+		self.n_nrn = self.n_syn = 0
+		# (first index, number, fields) of every group added
+		self.nrn_groups, self.syn_groups = [], []
+		self.post, self.pre_syn = [], [] # connections: neuron, synapse
+		# the objects, once made (see objects), or lowered from (see lower)
+		self.objs = None
+		return
+
+	def add_neurons(self, tp, n, **fields):
+		"""Add n neurons of type tp (LIF_Neuron or Izh_Neuron); a field is
+		one value for all of them, or an array of one per neuron. The fields
+		not given are as the constructor of tp makes them (the state is set
+		by randomize_state). tp None: the fields give everything, also the
+		kind of every neuron (its index in nrn_types).
+		Returns the indices of the neurons
+		"""
+		if tp is not None:
+			defaults = dict(Izh_Neuron._bg, method='euler', name='',
+				record=False, kind=self.nrn_types.index(tp))
+			if tp == LIF_Neuron:
+				defaults.update(LIF_Neuron._params)
+			else:
+				izh_type = fields.setdefault('izh_type', 'A')
+				if izh_type not in _izh_params:
+					raise ValueError("Unknown Izhikevich type: {}".format(
+						izh_type))
+				defaults.update(zip('abcds', _izh_params[izh_type]))
+			fields = dict(defaults, **fields)
+		self.nrn_groups.append( (self.n_nrn, n, fields) )
+		self.n_nrn += n
+		return np.arange(self.n_nrn - n, self.n_nrn)
+
+	def add_synapses(self, tp, n, **fields):
+		"""Add n synapses of type tp (Poisson_, Neuronal_ or 
+		Continuous_synapse), as add_neurons: the fields not given are as 
+		the constructor of tp makes them. pre is the index of the 
+		presynaptic neuron (-1: none), rate the firing rate, offset inf
+		means no offset. Returns the indices of the synapses
+		"""
+		if tp is not None:
+			fields = dict(dict(w=0.1, tau=1.8, exact=False, pre=-1, rate=0.5,
+				onset=0.0, offset=np.inf, name='', record=False,
+				kind=self.syn_types.index(tp)), **fields)
+		self.syn_groups.append( (self.n_syn, n, fields) )
+		self.n_syn += n
+		return np.arange(self.n_syn - n, self.n_syn)
+
+	def connect(self, post, syns):
+		"""Let synapse syns[k] project to neuron post[k], for every k"""
+		self.post.append( np.asarray(post, dtype=int) )
+		self.pre_syn.append( np.asarray(syns, dtype=int) )
+		return
+
+	def finish(self, outputs=(), inputs=(), doubles=True):
+		"""Make the arrays of everything added
+		- outputs 	: the indices of the output neurons
+		- inputs 	: the indices of the input synapses (see set_inputs)
+		- doubles 	: a synapse that projects to a neuron twice counts twice
+					  (as in the syn_in lists of the objects); False: once
+		"""
+		fill = lambda n, groups, fields: dict( (field,
+			_concatenate(n, groups, field, tp)) for field, tp in fields.items() )
+		self.nrn = fill(self.n_nrn, self.nrn_groups, self.nrn_fields)
+		self.syn = fill(self.n_syn, self.syn_groups, self.syn_fields)
+		self.nrn_groups = self.syn_groups = None
+		self.syn['pre'][self.syn['pre'] < 0] = self.n_nrn
+		# how often every synapse projects to every neuron
+		post = np.concatenate([ np.zeros(0, dtype=int) ] + self.post)
+		syns = np.concatenate([ np.zeros(0, dtype=int) ] + self.pre_syn)
+		self.post = self.pre_syn = None
+		self.W_count = scipy.sparse.csr_matrix( (np.ones(len(post)),
+			(post, syns)), shape=(self.n_nrn, self.n_syn) )
+		self.W_count.sum_duplicates()
+		if not doubles:
+			self.W_count.data[:] = 1.0
+		self.out = np.asarray(outputs, dtype=int)
+		self.inp = np.asarray(inputs, dtype=int)
+		# the neurons and synapses of each type
+		kind = lambda fields, tp: np.flatnonzero(fields['kind'] == tp)
+		self.izh, self.lif = [ kind(self.nrn, k) for k in range(2) ]
+		self.pois, self.neur, self.cont = [ kind(self.syn, k)
+			for k in range(3) ]
+		return self
+
+	def topology(self):
+		"""What has to be the same for two networks to share a compiled
+		structure (see Compiled_network.rebind): the types of the neurons
+		and synapses, in order, which synapses project to which neurons
+		(and how often), the presynaptic neurons of Neuronal synapses, and
+		the outputs
+		"""
+		W = self.W_count
+		return tuple( arr.tostring() for arr in (self.nrn['kind'],
+			self.syn['kind'], W.indptr, W.indices, W.data, self.syn['pre'],
+			self.out) )
+
+	def set_inputs(self, rates, w, onset):
+		"""Stimulate the input synapses with the firing rates rates (one per
+		input), with weight w from onset on
+		"""
+		self.syn['rate'][self.inp] = rates
+		self.syn['w'][self.inp] = w
+		self.syn['onset'][self.inp] = onset
+		return
+
+	def set_methods(self, izh_method=None, lif_method=None):
+		"""Set the integration scheme of all Izh and/or LIF neurons"""
+		if izh_method:
+			self.nrn['method'][self.izh] = izh_method
+		if lif_method:
+			self.nrn['method'][self.lif] = lif_method
+		return
+
+	def randomize_state(self, rng=np.random):
+		"""Draw a new random initial state, as neurons.randomize_state does
+		(in the same order, so the same rng gives the same state); the 
+		synapses and the background noise start silent
+		"""
+		nrn, izh, lif = self.nrn, self.izh, self.lif
+		V = rng.random_sample(len(izh)) * nrn['c'][izh]
+		nrn['t_r'][lif] = rng.randint(0, 9, len(lif))
+		nrn['Vm'][lif] = nrn['V_rest'][lif] + rng.random_sample(len(lif)) * (
+			nrn['th_V'][lif] - nrn['V_rest'][lif])
+		nrn['V'][izh] = V
+		nrn['U'][izh] = nrn['b'][izh] * V
+		nrn['spiking'][:] = False
+		nrn['bg_I'][:] = 0.0
+		self.syn['Iout'][:] = 0.0
+		self.syn['on'][:] = False
+		return
+
+	def objects(self):
+		"""Make the neuron and synapse objects of the network, with the
+		parameters and state in the arrays (in their own populations, see
+		neurons.new_populations); they're kept in self.objs, to store the
+		state of a Compiled_network in (see store_state). 
+		Returns the nodes, synapses, inputs and outputs
+		"""
+		new_populations()
+		nrn, syn = self.nrn, self.syn
+		nodes = [None] * self.n_nrn
+		for j in self.izh:
+			nodes[j] = Izh_Neuron(izh_type=nrn['izh_type'][j])
+			abcds = tuple( nrn[par][j] for par in 'abcds' )
+			if abcds != nodes[j].abcd_s:
+				nodes[j].abcd_s = abcds
+		lif_nrns = [ LIF_Neuron() for _ in self.lif ]
+		for j, obj in zip(self.lif, lif_nrns):
+			nodes[j] = obj
+		if lif_nrns:
+			for par in LIF_Neuron._params:
+				scatter_state(lif_nrns, par, nrn[par][self.lif])
+		for j, obj in enumerate(nodes):
+			obj.method = nrn['method'][j]
+			obj.name, obj.record = nrn['name'][j], bool(nrn['record'][j])
+		if nodes:
+			scatter_state(nodes, 'bg_rate', nrn['bg_rate'])
+			scatter_state(nodes, 'bg_w', nrn['bg_w'])
+
+		syns = [None] * self.n_syn
+		offset = lambda i: None if np.isinf(syn['offset'][i]) else \
+			float(syn['offset'][i])
+		for i in self.pois:
+			syns[i] = Poisson_synapse(firing_rate=syn['rate'][i],
+				w=syn['w'][i], onset=syn['onset'][i], offset=offset(i),
+				exact=bool(syn['exact'][i]))
+		for i in self.neur:
+			pre = syn['pre'][i]
+			syns[i] = Neuronal_synapse(w=syn['w'][i], exact=bool(syn['exact'][i]),
+				pre=nodes[pre] if pre < self.n_nrn else None)
+		for i in self.cont:
+			syns[i] = Continuous_synapse(w=syn['w'][i],
+				onset=syn['onset'][i], offset=offset(i))
+		for i, obj in enumerate(syns):
+			obj.tau = syn['tau'][i]
+			obj.name, obj.record = syn['name'][i], bool(syn['record'][i])
+
+		# the synapses of every neuron, as often as they project to it
+		W = self.W_count
+		for j, obj in enumerate(nodes):
+			obj.syn_in = [ syns[i] for i, count in zip(
+				W.indices[W.indptr[j]:W.indptr[j + 1]],
+				W.data[W.indptr[j]:W.indptr[j + 1]]) for _ in xrange(int(count)) ]
+		self.objs = ( nodes, syns, [ syns[i] for i in self.inp ],
+			[ nodes[j] for j in self.out ] )
+		self.push_state()
+		return self.objs
+
+	def push_state(self):
+		"""Copy the state in the arrays into the objects, if any"""
+		if self.objs is None:
+			return
+		nodes, syns = self.objs[:2]
+		izh_nrns = [ nodes[j] for j in self.izh ]
+		lif_nrns = [ nodes[j] for j in self.lif ]
+		for nrns, idx, var in [ (izh_nrns, self.izh, 'V'),
+				(izh_nrns, self.izh, 'U'), (izh_nrns, self.izh, 'spiking'),
+				(lif_nrns, self.lif, 'Vm'), (lif_nrns, self.lif, 't_r'),
+				(nodes, slice(None), 'bg_I') ]:
+			if nrns:
+				scatter_state(nrns, var, self.nrn[var][idx])
+		for i, obj in enumerate(syns):
+			obj.Iout = float(self.syn['Iout'][i])
+		for i in np.concatenate((self.pois, self.cont)):
+			syns[i].on = bool(self.syn['on'][i])
+		return
+
+	def __getstate__(self):
+		# the objects aren't pickled with the arrays
+		state = dict(self.__dict__)
+		state['objs'] = None
+		return state
+
+
+def _concatenate(n, groups, field, tp):
+	"""The values of field of all groups (see Network_arrays), as one array"""
+	arr = np.zeros(n, dtype=tp)
+	if tp == object:
+		arr[:] = ''
+	for first, m, fields in groups:
+		if field in fields:
+			arr[first:first + m] = fields[field]
+	return arr
+
+
+def lower(nodes, synapses, outputs=(), inputs=()):
+	"""The Network_arrays of a network of neuron and synapse objects; the
+	objects stay attached (so the state can be stored back in them). Only
+	the types defined in neurons.py and synapses.py can be lowered: custom
+	types (also subclasses) raise an Unsupported_network
+	"""
+	nodes, synapses = list(nodes), list(synapses)
+	for nrn in nodes:
+		if type(nrn) not in Network_arrays.nrn_types:
+			raise Unsupported_network("Cannot compile neuron of type {}".format(
+				type(nrn).__name__))
+	for syn in synapses:
+		if type(syn) not in Network_arrays.syn_types:
+			raise Unsupported_network("Cannot compile synapse of type {}".format(
+				type(syn).__name__))
+	net = Network_arrays()
+	n_nrn = len(nodes)
+	kind = np.array([ Network_arrays.nrn_types.index(type(nrn))
+		for nrn in nodes ], dtype=np.int8)
+	izh, lif = np.flatnonzero(kind == 0), np.flatnonzero(kind == 1)
+	izh_nrns = [ nodes[j] for j in izh ]
+	lif_nrns = [ nodes[j] for j in lif ]
+	fields = dict( kind=kind, method=[ nrn.method for nrn in nodes ],
+		name=[ nrn.name for nrn in nodes ],
+		record=[ nrn.record for nrn in nodes ] )
+	if nodes:
+		for var in [ 'bg_rate', 'bg_w', 'bg_I' ]:
+			fields[var] = gather_state(nodes, var)
+	# per type: the values of its neurons, the others get 0
+	def of_type(idx, values):
+		arr = np.zeros(n_nrn, dtype=np.asarray(values).dtype
+			if len(values) else float)
+		arr[idx] = values
+		return arr
+	abcds = np.array([ nrn.abcd_s for nrn in izh_nrns ],
+		dtype=float).reshape(-1, 5)
+	for k, par in enumerate('abcds'):
+		fields[par] = of_type(izh, abcds[:, k])
+	izh_type = np.zeros(n_nrn, dtype=object)
+	izh_type[izh] = [ nrn.izh_type for nrn in izh_nrns ]
+	fields['izh_type'] = izh_type
+	for var in [ 'V', 'U', 'spiking' ]:
+		fields[var] = of_type(izh, gather_state(izh_nrns, var)
+			if izh_nrns else [])
+	for var in LIF_Neuron._params.keys() + [ 'Vm', 't_r' ]:
+		fields[var] = of_type(lif, gather_state(lif_nrns, var)
+			if lif_nrns else [])
+	net.add_neurons(None, n_nrn, **fields)
+
+	nrn_idx = dict( (id(nrn), j) for j, nrn in enumerate(nodes) )
+	syn_idx = dict( (id(syn), i) for i, syn in enumerate(synapses) )
+	get = lambda attr, default: [ getattr(syn, attr, default)
+		for syn in synapses ]
+	net.add_synapses(None, len(synapses),
+		kind=[ Network_arrays.syn_types.index(type(syn)) for syn in synapses ],
+		w=get('w', 0.0), tau=get('tau', 1.8), exact=get('exact', False),
+		pre=[ nrn_idx.get(id(getattr(syn, 'pre', None)), -1)
+			for syn in synapses ],
+		rate=get('firing_rate', 0.0), onset=get('onset', 0.0),
+		offset=[ getattr(syn, 'offset', None) or np.inf for syn in synapses ],
+		name=get('name', ''), record=get('record', False),
+		Iout=get('Iout', 0.0), on=get('on', False) )
+	post, pre = [], []
+	for j, nrn in enumerate(nodes):
+		for syn in nrn.syn_in:
+			post.append(j)
+			pre.append(syn_idx[id(syn)])
+	net.connect(post, pre)
+	net.finish([ nrn_idx[id(nrn)] for nrn in outputs ],
+		[ syn_idx[id(syn)] for syn in inputs ])
+	net.objs = (nodes, synapses, list(inputs), list(outputs))
+	return net
+
+
+class Compiled_network(object):
+	"""A compiled version of the neurons and synapses in a Network.
+	The Network_arrays of the network (lowered from its objects after the
+	network-spec has been executed, or built from a declarative spec) are
+	split into flat numpy arrays, one set per neuron/synapse type:
+	-	Izh_Neurons : V, U, spiking (+ parameters a,b,c,d,s)
+	-	LIF_Neurons : Vm, t_r (+ parameters tau_m, tau_r, V_rest, th_V, ...)
+	-	synapses 	: Iout, w (+ type specific firing rates, onsets, pre, ...)
+	Neuronal synapses with the same presynaptic neuron and decay (tau,
+	exact) integrate the same spikes the same way, so they share one trace
+	(Iout), that is only weighted differently, in the weight matrix; the
+	synaptic state arrays are per trace (see shared_traces). The background
+	noise of every neuron is one more Poisson trace, after those of the
+	synapses, that projects to that neuron only (with weight bg_w).
+	A time_step then is a handful of array operations for the whole network,
+	instead of a python call for every neuron and synapse.
+		The dynamics are exactly those of neurons.py and synapses.py; only
+	the types defined there can be compiled (lowering custom subclasses
+	raises an Unsupported_network, use the object-based simulation for those)
+		The state arrays have shape (trials, neurons) or (trials, synapses): 
+	with n_trials > 1 several independent trials of the same network are
+	simulated at once (they share the parameters, but not the state)
+		With numba installed, a time step is one fused kernel instead (see
+	kernels.py; use_kernel=False to use the numpy step anyway), which also
+	counts the output spikes into the window of the descision detector.
+		The structure (index arrays, connectivity) and the parameters are
+	loaded separately: rebind() lets another network with the same topology
+	(e.g. the same spec, with other weights) reuse the structure.
+	"""
+	def __init__(self, net, n_trials=1):
+		"""- net : the Network_arrays of the network (see lower)"""
+		super(Compiled_network, self).__init__()
+		self.n_trials = n_trials
+		# random generator for the Poisson spikes; or one per trial
+		self.rng = np.random
+		self.trial_rngs = None
+		# Poisson spikes are pre-drawn for blocks of this many time steps
+		self.chunk = 100
+		# a profiling.Phase_profiler to time the phases of a step, if any
+		self.profiler = None
+		# step with the fused kernel, if it's compiled
+		self.use_kernel = kernels.have_numba
+		self.scratch = None # its scratch space
+
+		### 1. the neurons and synapses of every type
+		self.net = net
+		self.n_nrn, self.n_syn = net.n_nrn, net.n_syn
+		self.izh, self.lif = net.izh, net.lif
+		self.pois, self.neur, self.cont = net.pois, net.neur, net.cont
+
+		# Neuronal synapses look up the spike of their presynaptic neuron.
+		# If pre is not simulated, it never spikes: it then points to the
+		# extra (always False) entry at the end of the spike array
+		self.pre = net.syn['pre'][self.neur]
+
+		### 2. Connectivity: how often every synapse projects to every neuron
+		# (the weights are filled in by load_parameters)
+		self.W_count = net.W_count
+
+		# outputs, for the descision, and inputs
+		self.out = net.out
+		self.inp = net.inp
+		self.topology = net.topology()
+
+		# parameters and dynamic state are taken from the arrays:
+		self.load_parameters()
+		self.load_state()
+		return
+
+	def rebind(self, net, n_trials=1):
+		"""Simulate another network with the same topology (the same types
+		of neurons/synapses, connected the same way, in the same order) with
+		this compiled network: only its parameters and state are loaded, the
+		structure is reused. Raises a ValueError if the topology differs
+		- net : its Network_arrays
+		"""
+		if net.topology() != self.topology:
+			raise ValueError("Cannot rebind to a network with another topology")
+		self.net = net
+		self.n_trials = n_trials
+		self.trial_rngs = None
+		self.load_parameters()
+		self.load_state()
+		return self
+
+	def load_parameters(self):
+		"""Copy the (fixed) parameters of all neurons/synapses into the 
+		arrays of their type
+		"""
+		nrn, syn = self.net.nrn, self.net.syn
+
+		# Izhikevich parameters: a,b,c,d and s
+		self.a, self.b, self.c, self.d, self.s = [ nrn[par][self.izh]
+			for par in 'abcds' ]
+
+		# LIF parameters, per neuron:
+		get_par = lambda par: nrn[par][self.lif]
+		self.tau_m 	= get_par('tau_m')
+		self.tau_r 	= get_par('tau_r')
+		self.V_rest = get_par('V_rest')
+		self.th_V 	= get_par('th_V')
+		self.dV_s 	= get_par('dV_s')
+		self.S 		= get_par('S')
+
+		# integration scheme of every neuron: (integrator, selection) for
+		# each scheme used; the selection is everything if there's only one
+		izh_methods = nrn['method'][self.izh]
+		lif_methods = nrn['method'][self.lif]
+		self.izh_steps = integration_groups(izh_methods, izh_integrators)
+		self.lif_steps = integration_groups(lif_methods, lif_integrators)
+		# the same, as codes for the fused kernel
+		self.izh_code = kernels.method_codes(izh_methods, kernels.izh_methods)
+		self.lif_code = kernels.method_codes(lif_methods, kernels.lif_methods)
+
+		# parameters shared by all synapses:
+		self.w 	 = syn['w']
+		self.tau = syn['tau']
+		self.exact = syn['exact']
+
+		# the trace of every synapse (its column in the state arrays), the
+		# first synapse of every trace, and the traces of each type:
+		self.trace, self.first = shared_traces(self.n_nrn, self.neur,
+			self.pre, self.tau, self.exact)
+		# background noise: trace n_syn_tr + j is that of neuron j
+		n_syn_tr = len(self.first)
+		self.bg_tr = n_syn_tr + np.arange(self.n_nrn)
+		self.n_trace = n_syn_tr + self.n_nrn
+		self.pois_tr = np.concatenate((self.trace[self.pois], self.bg_tr))
+		self.cont_tr = self.trace[self.cont]
+		is_neur = np.zeros(self.n_syn, dtype=bool)
+		is_neur[self.neur] = True
+		self.neur_tr = np.flatnonzero(is_neur[self.first])
+		pre = np.zeros(self.n_syn, dtype=int)
+		pre[self.neur] = self.pre
+		self.pre_tr = pre[self.first[self.neur_tr]]
+		self.scratch = None
+		# the decay of every trace:
+		self.tr_tau = np.concatenate((self.tau[self.first],
+			Background_noise.tau * np.ones(self.n_nrn)))
+		self.tr_exact = np.concatenate((self.exact[self.first],
+			np.zeros(self.n_nrn, dtype=bool)))
+
+		# Poisson and continuous synapses have an onset/offset (inf: they
+		# stay on), and so has the background noise, which is always on
+		self.p_on = np.concatenate((syn['onset'][self.pois],
+			np.zeros(self.n_nrn)))
+		self.p_off = np.concatenate((syn['offset'][self.pois],
+			np.inf * np.ones(self.n_nrn)))
+		self.c_on, self.c_off = syn['onset'][self.cont], syn['offset'][self.cont]
+		self.p_rate = np.concatenate((syn['rate'][self.pois], nrn['bg_rate']))
+		self.decay_dt = None
+
+		# weight matrix (postsynaptic neuron x trace): the weights of the
+		# synapses of a trace are summed
+		W = self.W_count.copy()
+		W.data = self.W_count.data * self.w[W.indices]
+		to_trace = scipy.sparse.csr_matrix( (np.ones(self.n_syn),
+			(np.arange(self.n_syn), self.trace)),
+			shape=(self.n_syn, n_syn_tr) )
+		bg = scipy.sparse.diags(nrn['bg_w'], 0,
+			shape=(self.n_nrn, self.n_nrn))
+		self.W = scipy.sparse.hstack([ W.dot(to_trace), bg ], format='csr')
+		return
+
+	def load_state(self):
+		"""Copy the dynamic state of all neurons/synapses into the arrays
+		(every trial starts from the same state)
+		"""
+		nrn, syn = self.net.nrn, self.net.syn
+		get_state = lambda var, idx: np.tile( nrn[var][idx], (self.n_trials, 1) )
+
+		self.V 		  = get_state('V', self.izh)
+		self.U 		  = get_state('U', self.izh)
+		self.spiking  = get_state('spiking', self.izh)
+		self.Vm 	  = get_state('Vm', self.lif)
+		self.t_r 	  = get_state('t_r', self.lif)
+		# synapses: per trace, from its first synapse; then the background
+		self.Iout 	  = np.tile( np.concatenate((syn['Iout'][self.first],
+			nrn['bg_I'])), (self.n_trials, 1) )
+		self.on 	  = np.zeros((self.n_trials, self.n_trace), dtype=bool)
+		self.on[:, self.trace[self.pois]] = syn['on'][self.pois]
+		self.on[:, self.cont_tr] = syn['on'][self.cont]
+		# firing rates, per trial, so inputs can differ between trials:
+		self.rate = np.tile(self.p_rate, (self.n_trials, 1))
+		# no Poisson spikes drawn yet:
+		self.pois_spikes = None
+		self.update_spikes()
+		return
+
+	def store_state(self, trial=0):
+		"""Copy the dynamic state of one trial back into the Network_arrays
+		(and its objects, if any), so the object-based simulation (or 
+		another compile) can continue from it
+		"""
+		nrn, syn = self.net.nrn, self.net.syn
+		for var, idx in [ ('V', self.izh), ('U', self.izh),
+				('spiking', self.izh), ('Vm', self.lif), ('t_r', self.lif) ]:
+			nrn[var][idx] = getattr(self, var)[trial]
+		nrn['bg_I'][:] = self.Iout[trial, self.bg_tr]
+		syn['Iout'][:] = self.Iout[trial, self.trace]
+		on = np.concatenate((self.pois, self.cont))
+		syn['on'][on] = self.on[trial, self.trace[on]]
+		self.net.push_state()
+		return
+
+	def randomize_state(self, rngs):
+		"""Draw a fresh random initial state for every trial, as the neuron
+		constructors in neurons.py do. Synapses start silent.
+		- rngs : one np.random.RandomState per trial
+		"""
+		n_izh, n_lif = self.izh.shape[0], self.lif.shape[0]
+		for k, rng in enumerate(rngs):
+			# Izh: V anywhere between c and 0, U = b*V
+			self.V[k] = rng.random_sample(n_izh) * self.c
+			# LIF: refractory period 0..8, Vm between th_V and V_rest
+			self.t_r[k] = rng.randint(0, 9, n_lif)
+			self.Vm[k] = self.V_rest + rng.random_sample(n_lif) * (
+				self.th_V - self.V_rest)
+		self.U = self.b * self.V
+		self.spiking[:] = False
+		self.Iout[:] = 0.0
+		self.on[:] = False
+		self.pois_spikes = None
+		self.update_spikes()
+		return
+
+	def set_input_rates(self, rates):
+		"""Set the firing rates of the input synapses, per trial
+		- rates : array, trials x inputs
+		"""
+		self.rate[:, np.searchsorted(self.pois, self.inp)] = rates
+		return
+
+	# the dynamic state of every trial (see snapshot, restore)
+	state_vars = [ 'V', 'U', 'spiking', 'Vm', 't_r', 'Iout', 'on', 'spikes' ]
+
+	def snapshot(self):
+		"""A copy of the dynamic state of all trials, to start other trials
+		from (see restore)
+		"""
+		return dict( (var, getattr(self, var).copy())
+			for var in self.state_vars )
+
+	def restore(self, snap, idx):
+		"""Start every trial from a state in a snapshot: trial k gets the
+		state of trial idx[k] of snap (len(idx) == n_trials)
+		"""
+		if len(idx) != self.n_trials:
+			raise ValueError("Need a state for each of the {} trials".format(
+				self.n_trials))
+		for var in self.state_vars:
+			setattr(self, var, snap[var][idx])
+		self.pois_spikes = None
+		return
+
+	def checkpoint(self):
+		"""The full dynamic state of all trials, as a dict of arrays: the
+		state (see snapshot), the firing rates, the Poisson spikes drawn
+		ahead and the state of the random streams of the Poisson spikes.
+		Simulating on after set_checkpoint gives exactly the same trials
+		"""
+		ckpt = self.snapshot()
+		ckpt['rate'] = self.rate.copy()
+		if self.pois_spikes is not None:
+			ckpt.update( pois_spikes=self.pois_spikes.copy(),
+				pois_t=np.array(self.pois_t), pois_dt=np.array(self.pois_dt) )
+		per_trial = self.trial_rngs is not None
+		ckpt.update( rng_states(self.trial_rngs if per_trial else [self.rng]) )
+		ckpt['per_trial'] = np.array(per_trial)
+		return ckpt
+
+	def set_checkpoint(self, ckpt):
+		"""Continue from a checkpoint (see checkpoint) of a network with the
+		same topology; the number of trials is taken from it. The random 
+		streams are new RandomStates, in the state of the checkpoint
+		"""
+		if ckpt['Iout'].shape[1] != self.n_trace or \
+				ckpt['spikes'].shape[1] != self.n_nrn + 1:
+			raise ValueError("The checkpoint is of another network")
+		for var in self.state_vars + ['rate']:
+			setattr(self, var, ckpt[var].copy())
+		self.n_trials = self.V.shape[0]
+		self.pois_spikes = None
+		if 'pois_spikes' in ckpt:
+			self.pois_spikes = ckpt['pois_spikes'].copy()
+			self.pois_t, self.pois_dt = float(ckpt['pois_t']), \
+				float(ckpt['pois_dt'])
+		rngs = load_rng_states(ckpt)
+		if ckpt['per_trial']:
+			self.trial_rngs = rngs
+		else:
+			self.rng, self.trial_rngs = rngs[0], None
+		return
+
+	def take(self, trials):
+		"""Only keep the given trials (index or boolean mask) in the state;
+		used to drop trials that are done from a batch
+		"""
+		for var in ['V', 'U', 'spiking', 'Vm', 't_r', 'Iout', 'on', 'rate',
+					'spikes']:
+			setattr(self, var, getattr(self, var)[trials])
+		if self.pois_spikes is not None:
+			self.pois_spikes = self.pois_spikes[:, trials]
+		if self.trial_rngs is not None:
+			keep = np.arange(self.n_trials)[trials]
+			self.trial_rngs = [ self.trial_rngs[k] for k in keep ]
+		self.n_trials = self.V.shape[0]
+		return
+
+	def draw_poisson(self, t, dt=1.0):
+		"""Pre-draw the spikes of all Poisson synapses (and then of the
+		background noise), for the self.chunk time steps starting at t, in
+		one block per trial (from that trial's random stream if trial_rngs is
+		set)
+		"""
+		tt = t + dt * np.arange(self.chunk)
+		on = (tt[:, None] >= self.p_on) & (tt[:, None] < self.p_off)
+		# spike probability, per (step, trial, synapse):
+		p = self.rate[None, :, :] * (on * dt)[:, None, :]
+		rngs = self.trial_rngs
+		if rngs is None:
+			rngs = [self.rng] * self.n_trials
+		self.pois_spikes = np.zeros(p.shape, dtype=bool)
+		for k, rng in enumerate(rngs):
+			self.pois_spikes[:, k] = rng.random_sample(on.shape) < p[:, k]
+		self.pois_t, self.pois_dt = t, dt
+		return
+
+	def poisson_spikes(self, t, dt=1.0):
+		"""The spikes of the Poisson synapses at t (trials x synapses), from
+		the pre-drawn block; a new block is drawn if needed
+		"""
+		if self.pois_spikes is not None and dt == self.pois_dt:
+			k = int(round((t - self.pois_t) / dt))
+		if self.pois_spikes is None or dt != self.pois_dt or not (
+				0 <= k < self.chunk):
+			self.draw_poisson(t, dt)
+			k = 0
+		return self.pois_spikes[k]
+
+	def kernel_step(self, t, dt=1.0, detector=None):
+		"""time_step(), as one fused kernel (see kernels.fused_step); the
+		state arrays, and the window of the detector, are updated in place
+		"""
+		if self.scratch is None:
+			self.scratch = (np.empty(self.n_nrn), np.empty(self.n_trace))
+		if detector is None: # an empty window
+			window = ( self.out[:0], np.zeros((1, self.n_trials, 0), dtype=bool),
+				np.zeros((self.n_trials, 0), dtype=int), 0 )
+		else:
+			window = ( self.out, detector.buffer, detector.nspikes,
+				detector.pos )
+		kernels.fused_step(t, dt, self.Iout, self.on, self.decay_factor(dt),
+			self.spikes, self.pois_tr, self.p_on, self.p_off,
+			self.poisson_spikes(t, dt), self.neur_tr, self.pre_tr, self.cont_tr,
+			self.c_on, self.c_off, self.W.indptr, self.W.indices, self.W.data,
+			self.izh, self.a, self.b, self.c, self.d, self.s, self.izh_code,
+			self.V, self.U, self.spiking,
+			self.lif, self.tau_m, self.tau_r, self.V_rest, self.th_V,
+			self.dV_s, self.S, self.lif_code, self.Vm, self.t_r,
+			*(window + self.scratch))
+		if detector is not None:
+			detector.advance()
+		if self.profiler is not None:
+			self.profiler.lap('compiled: fused kernel')
+		return
+
+	def update_spikes(self):
+		"""(Re)compute which neurons spike, as in Neuron.spike()"""
+		# one extra entry: the 'spike' of unsimulated neurons, always False
+		self.spikes = np.zeros((self.n_trials, self.n_nrn + 1), dtype=bool)
+		self.spikes[:, self.izh] = self.spiking
+		self.spikes[:, self.lif] = self.Vm > self.th_V
+		return
+
+	def drive(self):
+		"""The output current of every trace, without the weight w"""
+		g = self.Iout.copy()
+		g[:, self.pois_tr] *= self.on[:, self.pois_tr]
+		g[:, self.cont_tr] = self.on[:, self.cont_tr]
+		return g
+
+	def I_out(self):
+		"""The output current of every synapse, as in Synapse.I_out()"""
+		return self.w * self.drive()[:, self.trace]
+
+	def get_V(self):
+		"""The membrane potential of every neuron, as in Neuron.get_V()"""
+		V = np.zeros((self.n_trials, self.n_nrn))
+		V[:, self.izh] = np.where(self.spiking, 30.0, self.V)
+		V[:, self.lif] = self.Vm
+		return V
+
+	def decay_factor(self, dt=1.0):
+		"""The factor Iout decays with in one time step, per trace: 
+		forward-Euler (1 - dt/tau), or exp(-dt/tau) for exact synapses
+		"""
+		if dt != getattr(self, 'decay_dt', None):
+			tau, exact = self.tr_tau, self.tr_exact
+			self.decay = np.where(exact, np.exp(-dt / tau), 1 - dt / tau)
+			self.decay_dt = dt
+		return self.decay
+
+	def time_step(self, t, dt=1.0, detector=None):
+		""" Simulate a time_step for all synapses, then for all neurons
+		- detector : a decision.Decision_detector, to count the spikes of the
+					 outputs of this step in (see Decision_detector.update)
+		"""
+		if self.use_kernel:
+			return self.kernel_step(t, dt, detector)
+		prof = self.profiler
+		### 1. synapses, per trace:
+		# Poisson synapses; random spiking when on
+		pois = self.pois_tr
+		self.on[:, pois] = (t >= self.p_on) & (t < self.p_off)
+		spike = np.zeros((self.n_trials, self.n_trace))
+		spike[:, pois] = self.poisson_spikes(t, dt)
+		# Neuronal synapses; spike when pre spiked (in the previous step)
+		spike[:, self.neur_tr] = self.spikes[:, self.pre_tr]
+		# Continuous synapses; only on or off
+		self.on[:, self.cont_tr] = (t >= self.c_on) & (t < self.c_off)
+		# update 'current flow' of all traces accordingly:
+		self.Iout = self.Iout * self.decay_factor(dt) + spike
+		if prof is not None:
+			prof.lap('compiled: synapses')
+
+		### 2. gather input to every neuron; one sparse mat-vec
+		I_in = self.W.dot( self.drive().T ).T
+		if prof is not None:
+			prof.lap('compiled: gather input')
+
+		### 3. neurons:
+		# Izhikevich neurons; Izh 2003 rules, with their integration scheme
+		V, U = np.empty_like(self.V), np.empty_like(self.U)
+		I = I_in[:, self.izh] * self.s
+		for integrate, sel in self.izh_steps:
+			V[:, sel], U[:, sel] = integrate(self.V[:, sel], self.U[:, sel],
+				I[:, sel], self.a[sel], self.b[sel], dt)
+		# If spike (or overflow), reset:
+		self.spiking = ~(V < 30)
+		self.V = np.where(self.spiking, self.c, V)
+		self.U = np.where(self.spiking, U + self.d, U)
+		if prof is not None:
+			prof.lap('compiled: Izh_Neuron')
+
+		# LIF neurons; in refractory period: keep Vm at rest, count down
+		refr = self.t_r > 0
+		I = I_in[:, self.lif] * self.S
+		Vm = np.empty_like(self.Vm)
+		for integrate, sel in self.lif_steps:
+			Vm[:, sel] = integrate(self.Vm[:, sel], I[:, sel], 
+				self.V_rest[sel], self.tau_m[sel], dt)
+		fire = ~refr & (Vm > self.th_V)
+		self.Vm = np.where(refr, self.V_rest, Vm + fire * self.dV_s)
+		self.t_r = np.where(refr, self.t_r - dt,
+			np.where(fire, self.tau_r, self.t_r))
+
+		self.update_spikes()
+		if prof is not None:
+			prof.lap('compiled: LIF_Neuron')
+
+		### 4. the output spikes, to the descision detector
+		if detector is not None:
+			detector.update( self.spikes[:, self.out] )
+			if prof is not None:
+				prof.lap('outspikes')
+		return
+
+
+def shared_traces(n_nrn, neur, pre, tau, exact):
+	"""Which synapses have the same trace (Iout): Neuronal synapses with the
+	same presynaptic neuron, tau and exact share one, every other synapse
+	has its own. Traces are numbered in the order of their first synapse, so
+	without shared traces, trace i is synapse i.
+	- n_nrn 	: number of neurons
+	- neur, pre : the Neuronal synapses, and their presynaptic neurons
+	- tau, exact: of every synapse
+	Returns the trace of every synapse, and the first synapse of every trace
+	"""
+	n_syn = len(tau)
+	if n_syn == 0:
+		return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+	# group by pre; the other synapses each get a group of their own
+	group = n_nrn + 1 + np.arange(n_syn)
+	group[neur] = pre
+	keys = np.column_stack((group, tau, exact))
+	_, first, trace = np.unique(keys, axis=0, return_index=True,
+		return_inverse=True)
+	# number them by their first synapse:
+	order = np.argsort(first)
+	rank = np.empty_like(order)
+	rank[order] = np.arange(len(order))
+	return rank[trace.ravel()], first[order]
+
+def integration_groups(methods, integrators):
+	"""Group neurons by their integration scheme (methods: that of every
+	neuron). Returns a list of (integrator, selection), where selection
+	indexes the neurons using that scheme
+	"""
+	for method in methods:
+		if method not in integrators:
+			raise ValueError("Unknown integration scheme: {}".format(method))
+	if len(set(methods)) <= 1:
+		return [ (integrators[m], slice(None)) for m in set(methods) ]
+	return [ (integrators[m], np.array([ k for k, mk in enumerate(methods)
+		if mk == m ], dtype=int)) for m in sorted(set(methods)) ]
+
+
+def root_seed(seed=None):
+	"""The seed of a run; None draws one from the global numpy random state
+	(keep it, to replay the run)
+	"""
+	if seed is None:
+		seed = np.random.randint(2**31)
+	return int(seed)
+
+# arithmetic modulo 2**63, so trial seeds are non-negative int64s
+_mask63 = np.uint64(2**63 - 1)
+
+def _mix63(z):
+	"""A bijective mixing of 63-bit integers (uint64 array); a splitmix64
+	finalizer, modulo 2**63
+	"""
+	z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9) & _mask63
+	z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB) & _mask63
+	return z ^ (z >> np.uint64(31))
+
+def trial_seeds(seed, n, start=0):
+	"""The seeds of trials start, .., start+n-1 of the run with seed seed
+	(None draws it, see root_seed). Trial i gets mix(mix(seed) + i), with
+	mix a bijection: the trials of a run never get the same seed (so no
+	trial is simulated twice), however many there are, and trials of a run
+	can be derived in parts (e.g. per batch) without overlap
+	"""
+	base = _mix63(np.array([ root_seed(seed) % 2**63 ], dtype=np.uint64))
+	idx = np.arange(start, start + n, dtype=np.uint64)
+	return _mix63( (base + idx) & _mask63 ).astype(np.int64)
+
+# the random streams of a trial (see trial_streams)
+streams = ('pattern', 'state', 'noise', 'connect')
+
+def trial_streams(seed):
+	"""Independent random streams for one trial, derived from its seed: a
+	np.random.RandomState per name in streams (pattern: the input pattern,
+	state: the initial state of the neurons, noise: the Poisson spikes,
+	connect: the random connections of a declarative spec).
+	Stream k of seed s is seeded with the array [s (low, high 32 bits), k],
+	so different seeds and streams never share a generator.
+	The same seed gives the same trial, also when it ran in a batch or on
+	another worker (see Network, seed=)
+	"""
+	seed = int(seed) % 2**64
+	return dict( (name, np.random.RandomState([ seed & 0xffffffff,
+		seed >> 32, k ])) for k, name in enumerate(streams) )
+
+def rng_states(rngs):
+	"""The states of random streams (RandomStates, or np.random itself), as
+	arrays: one row per stream (see load_rng_states)
+	"""
+	states = [ rng.get_state() for rng in rngs ]
+	return dict( rng_key=np.array([ state[1] for state in states ]),
+		rng_pos=np.array([ state[2] for state in states ]),
+		rng_has_gauss=np.array([ state[3] for state in states ]),
+		rng_gauss=np.array([ state[4] for state in states ]) )
+
+def load_rng_states(states):
+	"""New RandomStates, in the states of rng_states"""
+	rngs = []
+	for k in xrange(len(states['rng_pos'])):
+		rng = np.random.RandomState()
+		rng.set_state( ('MT19937', states['rng_key'][k],
+			int(states['rng_pos'][k]), int(states['rng_has_gauss'][k]),
+			float(states['rng_gauss'][k])) )
+		rngs.append(rng)
+	return rngs
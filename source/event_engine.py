@@ -0,0 +1,289 @@
+import heapq
+import collections
+from math import exp, log
+
+import numpy as np
+
+from neurons import LIF_Neuron, Background_noise
+from synapses import Neuronal_synapse, Poisson_synapse, Continuous_synapse
+from engine import Unsupported_network
+
+class Event_network(object):
+	"""Event-driven simulation of a network of LIF_Neurons.
+	Instead of integrating every neuron every time step, this keeps a
+	priority queue of events (Poisson input spikes, neuron spikes, ends of
+	refractory periods, continuous inputs switching on/off), and advances
+	a neuron's membrane potential analytically, only when an event reaches it.
+	The cost of a trial is then proportional to the number of spikes, not T/dt.
+		In between events, the synaptic input to a neuron is a decaying
+	exponential (plus a constant for Continuous_synapses), so the membrane
+	potential is a sum of two exponentials, and the time it crosses threshold
+	can be found exactly (up to numerical precision).
+	Differences with the clock-driven simulation:
+	-	synaptic currents always decay exactly (as with exact=True) and a
+		spike reaches its postsynaptic neurons without a time step delay
+	-	the current of a Poisson synapse decays after its offset, instead of
+		being switched off at once
+	so this is the dt -> 0 limit of the clock-driven simulation; at dt=1.0
+	forward-Euler makes LIF neurons fire noticeably more than this.
+	Only networks of LIF_Neurons with Neuronal/Poisson/Continuous_synapses
+	that all have the same tau can be simulated; else this raises an
+	engine.Unsupported_network (a TypeError)
+	"""
+	def __init__(self, nodes, synapses, outputs=[], rng=np.random):
+		super(Event_network, self).__init__()
+		self.nodes = list(nodes)
+		self.outputs = list(outputs)
+		self.rng = rng
+
+		### 1. check the network can be simulated event-driven:
+		for nrn in self.nodes:
+			if type(nrn) != LIF_Neuron:
+				raise Unsupported_network("Event-driven simulation only supports " +
+					"LIF_Neurons, not {}".format(type(nrn).__name__))
+		nrn_idx = dict( (id(nrn), j) for j, nrn in enumerate(self.nodes) )
+		# all synapses that reach the neurons:
+		syns, seen = [], set()
+		for syn in list(synapses) + [ syn for nrn in self.nodes
+				for syn in nrn.syn_in ]:
+			if id(syn) not in seen:
+				seen.add(id(syn))
+				syns.append(syn)
+		for syn in syns:
+			if type(syn) not in (Neuronal_synapse, Poisson_synapse,
+								 Continuous_synapse):
+				raise Unsupported_network("Event-driven simulation does not support " +
+					"synapses of type {}".format(type(syn).__name__))
+		taus = set( syn.tau for syn in syns )
+		if self.nodes:
+			taus.add(Background_noise.tau)
+		if len(taus) > 1:
+			raise Unsupported_network("Event-driven simulation needs one tau for all " +
+				"synapses, not {}".format(sorted(taus)))
+		self.tau_s = taus.pop() if taus else 1.8
+		for nrn in self.nodes:
+			if nrn.tau_m == self.tau_s:
+				raise Unsupported_network("Event-driven simulation needs tau_m != tau")
+
+		### 2. who projects where: post[syn] = list of (neuron, weight)
+		self.post = collections.defaultdict(list)
+		for j, nrn in enumerate(self.nodes):
+			for syn in nrn.syn_in:
+				self.post[id(syn)].append( (j, syn.w) )
+		# outgoing synapses of each neuron
+		self.out_syns = collections.defaultdict(list)
+		for syn in syns:
+			if type(syn) == Neuronal_synapse and id(syn.pre) in nrn_idx:
+				self.out_syns[ nrn_idx[id(syn.pre)] ].append( id(syn) )
+		# Poisson sources: (rate, onset, offset, key in post), the Poisson
+		# synapses and the background noise of every neuron
+		self.poisson = [ (syn.firing_rate, syn.onset,
+			syn.offset if syn.offset else np.inf, id(syn))
+			for syn in syns if type(syn) == Poisson_synapse ]
+		for j, nrn in enumerate(self.nodes):
+			self.post[('bg', j)].append( (j, nrn.bg_w) )
+			self.poisson.append( (nrn.bg_rate, 0.0, np.inf, ('bg', j)) )
+		self.continuous = [ syn for syn in syns
+			if type(syn) == Continuous_synapse ]
+		self.out = [ nrn_idx[id(nrn)] for nrn in self.outputs ]
+		return
+
+	def load_state(self):
+		"""Take the initial state from the neuron/synapse objects.
+		Per neuron: x = Vm - V_rest, the (weighted) synaptic current J, the
+		constant input C of Continuous_synapses that are on, and when it
+		leaves its refractory period
+		"""
+		n = len(self.nodes)
+		self.x = [ float(nrn.Vm) - nrn.V_rest for nrn in self.nodes ]
+		self.J = [0.0] * n
+		self.C = [0.0] * n
+		self.t_last = [0.0] * n
+		self.ref_end = [ float(nrn.t_r) for nrn in self.nodes ]
+		self.refr = [ t_r > 0 for t_r in self.ref_end ]
+		# version of each neuron's state; a predicted spike is only valid
+		# if the neuron has not changed since it was predicted
+		self.version = [0] * n
+		for j, nrn in enumerate(self.nodes):
+			for syn in nrn.syn_in:
+				if type(syn) != Continuous_synapse:
+					self.J[j] += syn.w * syn.Iout
+			self.J[j] += nrn.bg_w * nrn.bg_I
+		return
+
+	def advance(self, j, t):
+		"""Bring neuron j to time t, analytically"""
+		s = t - self.t_last[j]
+		if s <= 0:
+			return
+		nrn = self.nodes[j]
+		tm, ts = nrn.tau_m, self.tau_s
+		J0 = self.J[j]
+		self.J[j] = J0 * exp(-s / ts)
+		self.t_last[j] = t
+		if self.refr[j]:
+			# membrane is kept at rest; only the input decays
+			return
+		A, B, D = self.coefficients(j, J0)
+		self.x[j] = A * exp(-s / tm) + B * exp(-s / ts) + D
+		return
+
+	def coefficients(self, j, J0=None):
+		"""x(s) = A exp(-s/tau_m) + B exp(-s/tau) + D, for neuron j from its
+		last update on, if no other events arrive
+		"""
+		nrn = self.nodes[j]
+		tm, ts = nrn.tau_m, self.tau_s
+		J0 = self.J[j] if J0 is None else J0
+		D = nrn.S * self.C[j] * tm
+		B = nrn.S * J0 / (1.0 / tm - 1.0 / ts)
+		A = self.x[j] - D - B
+		return A, B, D
+
+	def next_spike(self, j):
+		"""Predict when neuron j crosses threshold, if no other events arrive
+		Returns the time, or None if it doesn't.
+		"""
+		nrn = self.nodes[j]
+		tm, ts = nrn.tau_m, self.tau_s
+		theta = nrn.th_V - nrn.V_rest
+		A, B, D = self.coefficients(j)
+		f = lambda s: A * exp(-s / tm) + B * exp(-s / ts) + D - theta
+		if f(0) > 0:
+			return self.t_last[j]
+
+		# f has at most one extremum, where its derivative is zero:
+		lo, s_ext = 0.0, None
+		if A != 0:
+			r = - (B / ts) / (A / tm)
+			if r > 0:
+				s_ext = log(r) / (1.0 / ts - 1.0 / tm)
+		if s_ext is not None and s_ext > 0:
+			if f(s_ext) > 0: # a maximum above threshold
+				return self.t_last[j] + self.bisect(f, 0.0, s_ext)
+			lo = s_ext
+		# after the extremum, f goes to D - theta
+		if D - theta <= 0:
+			return None
+		hi = max(lo, tm, ts)
+		while f(hi) <= 0:
+			hi *= 2
+		return self.t_last[j] + self.bisect(f, lo, hi)
+
+	def bisect(self, f, lo, hi, tol=1e-9):
+		"""Find where f crosses 0, given f(lo) <= 0 < f(hi)"""
+		while hi - lo > tol:
+			mid = 0.5 * (lo + hi)
+			if f(mid) > 0:
+				hi = mid
+			else:
+				lo = mid
+		return hi
+
+	def schedule(self, j):
+		"""(Re)schedule the next spike of neuron j"""
+		self.version[j] += 1
+		if self.refr[j]:
+			return
+		t_spike = self.next_spike(j)
+		if t_spike is not None and t_spike < self.T:
+			heapq.heappush(self.events,
+				(t_spike, 'fire', j, self.version[j]) )
+		return
+
+	def inject(self, syn_id, t, J=0.0, C=0.0):
+		"""A synapse delivers input at t: add J to the synaptic current, and
+		C to the constant input, of all its postsynaptic neurons (weighted)
+		"""
+		for j, w in self.post[syn_id]:
+			self.advance(j, t)
+			self.J[j] += w * J
+			self.C[j] += w * C
+			self.schedule(j)
+		return
+
+	def push_poisson(self, k, t):
+		"""Schedule the next spike of Poisson source k after t"""
+		rate, onset, offset, _ = self.poisson[k]
+		if rate <= 0:
+			return
+		t = max(t, onset) + self.rng.exponential(1.0 / rate)
+		if t < min(offset, self.T):
+			heapq.heappush(self.events, (t, 'poisson', k, 0))
+		return
+
+	def simulate(self, T=5000, window=300, f_thres=0.10, t_check=300):
+		"""Simulate one trial, until T or until a descision is made: when an
+		output neuron fires more than f_thres * window spikes within window
+		ms (checked from t_check on), as Network.check_descision_made does.
+		Returns (descision, t), with descision None if none was made
+		"""
+		self.T = T
+		self.load_state()
+		self.events = []
+		self.spikes = [] # (t, neuron) of all spikes
+
+		# initial events: first Poisson spikes, continuous synapses,
+		# ends of refractory periods, and predicted spikes
+		for k in xrange(len(self.poisson)):
+			self.push_poisson(k, 0.0)
+		for k, syn in enumerate(self.continuous):
+			heapq.heappush(self.events, (syn.onset, 'on', k, 0))
+			if syn.offset:
+				heapq.heappush(self.events, (syn.offset, 'off', k, 0))
+		for j in xrange(len(self.nodes)):
+			if self.refr[j]:
+				heapq.heappush(self.events, (self.ref_end[j], 'ref_end', j, 0))
+			self.schedule(j)
+
+		# spike times of the outputs, in the last window ms
+		out_spikes = dict( (j, collections.deque()) for j in self.out )
+		events = self.events
+		while events:
+			t, kind, k, version = heapq.heappop(events)
+			if t >= T:
+				break
+			if kind == 'poisson':
+				self.inject(self.poisson[k][3], t, J=1.0)
+				self.push_poisson(k, t)
+			elif kind == 'on':
+				self.inject(id(self.continuous[k]), t, C=1.0)
+			elif kind == 'off':
+				self.inject(id(self.continuous[k]), t, C=-1.0)
+			elif kind == 'ref_end':
+				self.advance(k, t)
+				self.refr[k] = False
+				self.x[k] = 0.0
+				self.schedule(k)
+			elif kind == 'fire' and version == self.version[k]:
+				# spike: enter the refractory period, and notify the targets
+				self.advance(k, t)
+				self.spikes.append( (t, k) )
+				self.x[k] = 0.0
+				self.refr[k] = True
+				self.ref_end[k] = t + self.nodes[k].tau_r
+				self.version[k] += 1
+				heapq.heappush(events, (self.ref_end[k], 'ref_end', k, 0))
+				for syn_id in self.out_syns[k]:
+					self.inject(syn_id, t, J=1.0)
+
+				# descision, if an output fires too often:
+				if k in out_spikes:
+					spikes = out_spikes[k]
+					spikes.append(t)
+					while spikes[0] <= t - window:
+						spikes.popleft()
+					if t > t_check and len(spikes) > f_thres * window:
+						return ( self.out.index(k), t )
+		return (None, T)
+
+	def store_state(self, t):
+		"""Put the state of the neurons at t back into the objects (synaptic
+		currents are kept per neuron here, so the synapses and the background
+		noise are not updated)
+		"""
+		for j, nrn in enumerate(self.nodes):
+			self.advance(j, t)
+			nrn.Vm = self.x[j] + nrn.V_rest
+			nrn.t_r = max(0.0, self.ref_end[j] - t) if self.refr[j] else 0
+		return
@@ -0,0 +1,71 @@
+"""Integration schemes for the neuron models. Every function takes the state
+and input of one neuron or (as numpy arrays) a whole population at once, and
+returns the state one time step dt later. The input I is constant during the
+step, and already scaled (I_in * s for Izh_Neurons, I_in * S for LIF_Neurons)
+Spikes and resets are handled by the neurons, after the step.
+"""
+import numpy as np
+
+### Izhikevich neurons: V' = 0.04 V^2 + 5 V + 140 - U + I, U' = a (b V - U)
+def izh_dV(V, U, I):
+	return 0.04 * V**2 + 5 * V + 140 - U + I
+
+def izh_dU(V, U, a, b):
+	return a * ( b * V - U )
+
+def izh_euler(V, U, I, a, b, dt=1.0):
+	"""Forward Euler, with U updated from the new V (as in Izh 2003)"""
+	V = V + dt * izh_dV(V, U, I)
+	U = U + dt * izh_dU(V, U, a, b)
+	return V, U
+
+def izh_halfstep(V, U, I, a, b, dt=1.0):
+	"""V in two half steps, for numerical stability, then U; as in the code
+	of Izhikevich (2003)
+	"""
+	V = V + 0.5 * dt * izh_dV(V, U, I)
+	V = V + 0.5 * dt * izh_dV(V, U, I)
+	U = U + dt * izh_dU(V, U, a, b)
+	return V, U
+
+def izh_rk2(V, U, I, a, b, dt=1.0):
+	"""Second order Runge-Kutta (midpoint)"""
+	with np.errstate(over='ignore', invalid='ignore'):
+		kV, kU = izh_dV(V, U, I), izh_dU(V, U, a, b)
+		Vh, Uh = V + 0.5 * dt * kV, U + 0.5 * dt * kU
+		return V + dt * izh_dV(Vh, Uh, I), U + dt * izh_dU(Vh, Uh, a, b)
+
+def izh_rk4(V, U, I, a, b, dt=1.0):
+	"""Classic fourth order Runge-Kutta"""
+	with np.errstate(over='ignore', invalid='ignore'):
+		kV1, kU1 = izh_dV(V, U, I), izh_dU(V, U, a, b)
+		V2, U2 = V + 0.5 * dt * kV1, U + 0.5 * dt * kU1
+		kV2, kU2 = izh_dV(V2, U2, I), izh_dU(V2, U2, a, b)
+		V3, U3 = V + 0.5 * dt * kV2, U + 0.5 * dt * kU2
+		kV3, kU3 = izh_dV(V3, U3, I), izh_dU(V3, U3, a, b)
+		V4, U4 = V + dt * kV3, U + dt * kU3
+		kV4, kU4 = izh_dV(V4, U4, I), izh_dU(V4, U4, a, b)
+		return ( V + dt / 6.0 * (kV1 + 2 * kV2 + 2 * kV3 + kV4),
+				 U + dt / 6.0 * (kU1 + 2 * kU2 + 2 * kU3 + kU4) )
+
+izh_integrators = dict(
+	euler=izh_euler,
+	halfstep=izh_halfstep,
+	rk2=izh_rk2,
+	rk4=izh_rk4,
+)
+
+### LIF neurons: Vm' = I - (Vm - V_rest) / tau_m
+def lif_euler(Vm, I, V_rest, tau_m, dt=1.0):
+	"""Forward Euler"""
+	return Vm + dt * (I - (Vm - V_rest) / tau_m )
+
+def lif_exp(Vm, I, V_rest, tau_m, dt=1.0):
+	"""Exponential Euler: exact for an input that is constant during dt"""
+	V_inf = V_rest + I * tau_m
+	return V_inf + (Vm - V_inf) * np.exp(-dt / tau_m)
+
+lif_integrators = dict(
+	euler=lif_euler,
+	exp=lif_exp,
+)
@@ -0,0 +1,149 @@
+"""A fused time step for engine.Compiled_network: synapses, input, Izh and
+LIF neurons and their spikes, and the count of the output spikes in the
+window of the descision detector, in one loop over the trials instead of a
+few dozen small numpy operations per step (which dominate the cost of small
+and medium networks). It is compiled with numba when numba is installed
+(have_numba); otherwise Compiled_network uses its numpy time step, as the
+plain python loops below would be much slower than numpy.
+The kernel computes the same as Compiled_network.time_step, in the same
+order (the input sums in the order of the CSR weight matrix).
+"""
+import numpy as np
+
+try:
+	import numba
+	have_numba = True
+	jit = numba.njit(cache=True, nogil=True)
+except ImportError:
+	numba = None
+	have_numba = False
+	jit = lambda f: f
+
+# integration schemes (see integrators.py), by their code in the kernel
+izh_methods = [ 'euler', 'halfstep', 'rk2', 'rk4' ]
+lif_methods = [ 'euler', 'exp' ]
+
+def method_codes(names, methods):
+	"""The code (index in methods) of the integration scheme of every neuron
+	(names: the scheme of every neuron); raises a ValueError for an unknown
+	scheme
+	"""
+	for name in names:
+		if name not in methods:
+			raise ValueError("Unknown integration scheme: {}".format(name))
+	return np.array([ methods.index(name) for name in names ],
+		dtype=np.int64)
+
+@jit
+def izh_dV(V, U, I):
+	return 0.04 * V**2 + 5 * V + 140 - U + I
+
+@jit
+def izh_dU(V, U, a, b):
+	return a * ( b * V - U )
+
+@jit
+def izh_integrate(code, V, U, I, a, b, dt):
+	"""One step of integration scheme code, for one Izh neuron"""
+	if code == 0: # euler
+		V = V + dt * izh_dV(V, U, I)
+		return V, U + dt * izh_dU(V, U, a, b)
+	if code == 1: # halfstep
+		V = V + 0.5 * dt * izh_dV(V, U, I)
+		V = V + 0.5 * dt * izh_dV(V, U, I)
+		return V, U + dt * izh_dU(V, U, a, b)
+	kV1, kU1 = izh_dV(V, U, I), izh_dU(V, U, a, b)
+	V2, U2 = V + 0.5 * dt * kV1, U + 0.5 * dt * kU1
+	if code == 2: # rk2
+		return V + dt * izh_dV(V2, U2, I), U + dt * izh_dU(V2, U2, a, b)
+	kV2, kU2 = izh_dV(V2, U2, I), izh_dU(V2, U2, a, b)
+	V3, U3 = V + 0.5 * dt * kV2, U + 0.5 * dt * kU2
+	kV3, kU3 = izh_dV(V3, U3, I), izh_dU(V3, U3, a, b)
+	V4, U4 = V + dt * kV3, U + dt * kU3
+	kV4, kU4 = izh_dV(V4, U4, I), izh_dU(V4, U4, a, b)
+	return ( V + dt / 6.0 * (kV1 + 2 * kV2 + 2 * kV3 + kV4),
+			 U + dt / 6.0 * (kU1 + 2 * kU2 + 2 * kU3 + kU4) )
+
+@jit
+def lif_integrate(code, Vm, I, V_rest, tau_m, dt):
+	"""One step of integration scheme code, for one LIF neuron"""
+	if code == 0: # euler
+		return Vm + dt * (I - (Vm - V_rest) / tau_m )
+	V_inf = V_rest + I * tau_m
+	return V_inf + (Vm - V_inf) * np.exp(-dt / tau_m)
+
+@jit
+def fused_step(t, dt, Iout, on, decay, spikes,
+		pois, p_on, p_off, pois_spikes, neur, pre, cont, c_on, c_off,
+		indptr, indices, data,
+		izh, a, b, c, d, s, izh_code, V, U, spiking,
+		lif, tau_m, tau_r, V_rest, th_V, dV_s, S, lif_code, Vm, t_r,
+		out, window, nspikes, pos, I_in, g):
+	"""Simulate one time step of all trials (rows of the state arrays), in
+	place; the arguments are the arrays of a Compiled_network, the synapse
+	state and indices per trace (see engine.shared_traces). The spikes of
+	the outputs (neurons out) go into position pos of the window of a
+	decision.Decision_detector (window, nspikes). I_in (one per neuron) and
+	g (one per trace) are scratch space
+	"""
+	n_trials = Iout.shape[0]
+	n_nrn = I_in.shape[0]
+	for k in range(n_trials):
+		### 1. traces: spikes in, then decay; g is the drive (w/o weight)
+		for j in range(Iout.shape[1]):
+			g[j] = Iout[k, j] * decay[j]
+		for m in range(pois.shape[0]):
+			j = pois[m]
+			on[k, j] = (t >= p_on[m]) and (t < p_off[m])
+			g[j] = g[j] + pois_spikes[k, m]
+		for m in range(neur.shape[0]):
+			j = neur[m]
+			g[j] = g[j] + spikes[k, pre[m]]
+		for j in range(Iout.shape[1]):
+			Iout[k, j] = g[j]
+		for m in range(pois.shape[0]):
+			j = pois[m]
+			g[j] = g[j] * on[k, j]
+		for m in range(cont.shape[0]):
+			j = cont[m]
+			on[k, j] = (t >= c_on[m]) and (t < c_off[m])
+			g[j] = 1.0 if on[k, j] else 0.0
+
+		### 2. input to every neuron: the rows of the weight matrix
+		for i in range(n_nrn):
+			acc = 0.0
+			for p in range(indptr[i], indptr[i + 1]):
+				acc += data[p] * g[indices[p]]
+			I_in[i] = acc
+
+		### 3. Izhikevich neurons; spike (or overflow): reset
+		for m in range(izh.shape[0]):
+			Vn, Un = izh_integrate(izh_code[m], V[k, m], U[k, m],
+				I_in[izh[m]] * s[m], a[m], b[m], dt)
+			spk = not (Vn < 30)
+			spiking[k, m] = spk
+			V[k, m] = c[m] if spk else Vn
+			U[k, m] = Un + d[m] if spk else Un
+			spikes[k, izh[m]] = spk
+
+		### LIF neurons; in refractory period: keep Vm at rest, count down
+		for m in range(lif.shape[0]):
+			if t_r[k, m] > 0:
+				Vm[k, m] = V_rest[m]
+				t_r[k, m] = t_r[k, m] - dt
+			else:
+				Vn = lif_integrate(lif_code[m], Vm[k, m],
+					I_in[lif[m]] * S[m], V_rest[m], tau_m[m], dt)
+				if Vn > th_V[m]:
+					Vm[k, m] = Vn + dV_s[m]
+					t_r[k, m] = tau_r[m]
+				else:
+					Vm[k, m] = Vn
+			spikes[k, lif[m]] = Vm[k, m] > th_V[m]
+
+		### 4. output spikes: into the window, and the running counts
+		for o in range(out.shape[0]):
+			spk = spikes[k, out[o]]
+			nspikes[k, o] += int(spk) - int(window[pos, k, o])
+			window[pos, k, o] = spk
+	return
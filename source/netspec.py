@@ -0,0 +1,242 @@
+"""Declarative network specs: instead of a python file that is executed, a
+network is described by populations of neurons and projections between them
+(a dict, or the same as JSON), which is checked and then built in bulk:
+
+{ "populations": {
+	"lyr0": {"type": "Izh", "n": 20, "izh_type": "A"},
+	"lyr1": {"type": "LIF", "n": 20, "record": false}
+  },
+  "projections": [
+	{"pre": "in0", "post": "lyr0"},
+	{"pre": "lyr0", "post": "out0", "w": 1.8},
+	{"pre": "lyr0", "post": "lyr1", "rule": "fixed_probability", "p": 0.1},
+	{"type": "Poisson", "post": "out0", "n": 20, "firing_rate": 0.1,
+	 "w": 0.14, "onset": 300}
+  ]
+}
+
+Populations:
+-	type 		: "Izh" or "LIF"
+-	n 			: number of neurons
+-	izh_type 	: Izhikevich type (default "A"), method: integration scheme
+-	record 		: record all its neurons (named <population>[<i>])
+The inputs in0, in1 and the outputs out0, out1 are always there (or as many
+as the task has: in0 .. in<n_in - 1>, see tasks.py).
+Projections:
+-	from a population (type "Neuronal", the default): every neuron of pre
+	gets one Neuronal_synapse (weight w, default 0.1; tau, exact), that
+	projects to the neurons of post chosen by rule:
+	"all_to_all" (default), "one_to_one" (pre and post of the same size), or
+	"fixed_probability" (every pair connected with probability p), or
+	"fixed_indegree" (every neuron of post gets k synapses of pre, drawn at
+	random; doubles are dropped)
+-	from an input (in0, in1, ..): the input synapse projects to all neurons
+	of post
+-	type "Poisson": n (default 1) Poisson_synapses per neuron of post, with
+	firing_rate, w, onset, offset (and tau, exact) as Poisson_synapse has
+-	type "Continuous": one Continuous_synapse (w, onset, offset) to post
+Any value can be a parameter: "$name" is replaced by params['name'] (see
+Network, params=).
+A synapse is shared by all neurons it projects to (as Synapse.project does),
+so a projection costs one synapse per presynaptic neuron, not per connection.
+The network is built as arrays (see engine.Network_arrays), the objects of
+its neurons and synapses are only made when they're needed (see Network).
+"""
+import json
+import numpy as np
+
+import engine
+from neurons import LIF_Neuron, Izh_Neuron
+from synapses import Neuronal_synapse, Poisson_synapse, Continuous_synapse
+
+_neuron_types = { 'Izh': Izh_Neuron, 'LIF': LIF_Neuron }
+_rules = [ 'all_to_all', 'one_to_one', 'fixed_probability', 'fixed_indegree' ]
+
+# keys allowed in populations and (per type) in projections:
+_population_keys = set([ 'type', 'n', 'izh_type', 'method', 'record' ])
+_projection_keys = dict(
+	Neuronal=set([ 'type', 'pre', 'post', 'rule', 'p', 'k', 'w', 'tau',
+		'exact' ]),
+	Poisson=set([ 'type', 'post', 'n', 'firing_rate', 'w', 'onset', 'offset',
+		'tau', 'exact' ]),
+	Continuous=set([ 'type', 'post', 'w', 'onset', 'offset' ]),
+)
+
+def is_declarative(network_spec):
+	"""Is network_spec a declarative spec (a dict, or JSON text)?"""
+	if isinstance(network_spec, dict):
+		return True
+	return network_spec.lstrip().startswith('{')
+
+def load(network_spec, params=None, n_in=2, n_out=2):
+	"""The spec as a (validated) dict, from a dict or JSON text, with the
+	"$name" values replaced by params['name']
+	- n_in, n_out 	: the number of inputs and outputs of the network
+	"""
+	if not isinstance(network_spec, dict):
+		network_spec = json.loads(network_spec)
+	network_spec = substitute(network_spec, params or {})
+	validate(network_spec, n_in, n_out)
+	return network_spec
+
+def builtin_names(n_in=2, n_out=2):
+	"""The names of the inputs and of the outputs, which are always there"""
+	return ([ 'in{}'.format(k) for k in xrange(n_in) ],
+			[ 'out{}'.format(k) for k in xrange(n_out) ])
+
+def substitute(obj, params):
+	"""obj, with every string "$name" in it replaced by params['name']"""
+	if isinstance(obj, dict):
+		return dict( (key, substitute(value, params))
+			for key, value in obj.items() )
+	if isinstance(obj, list):
+		return [ substitute(value, params) for value in obj ]
+	if isinstance(obj, basestring) and obj.startswith('$'):
+		if obj[1:] not in params:
+			raise ValueError("No value for parameter {}".format(obj[1:]))
+		return params[obj[1:]]
+	return obj
+
+def canonical(network_spec):
+	"""The spec as JSON text, the same for equal specs (e.g. to hash it)"""
+	if not isinstance(network_spec, dict):
+		network_spec = json.loads(network_spec)
+	return json.dumps(network_spec, sort_keys=True)
+
+def validate(spec, n_in=2, n_out=2):
+	"""Check a declarative spec; raises a ValueError saying what's wrong"""
+	ins, outs = builtin_names(n_in, n_out)
+	unknown = set(spec) - set([ 'populations', 'projections' ])
+	if unknown:
+		raise ValueError("Unknown spec entries: {}".format(sorted(unknown)))
+	pops = spec.get('populations', {})
+	for name, pop in pops.items():
+		if name in ins or name in outs:
+			raise ValueError("Population name {} is reserved".format(name))
+		if set(pop) - _population_keys:
+			raise ValueError("Unknown keys in population {}: {}".format(
+				name, sorted(set(pop) - _population_keys)))
+		if pop.get('type') not in _neuron_types:
+			raise ValueError("Population {} has unknown type {}".format(
+				name, pop.get('type')))
+		if int(pop.get('n', -1)) < 0:
+			raise ValueError("Population {} needs n >= 0".format(name))
+	sizes = dict( (name, int(pop['n'])) for name, pop in pops.items() )
+	sizes.update( (name, 1) for name in outs )
+
+	for k, proj in enumerate(spec.get('projections', [])):
+		tp = proj.get('type', 'Neuronal')
+		if tp not in _projection_keys:
+			raise ValueError("Projection {} has unknown type {}".format(k, tp))
+		if set(proj) - _projection_keys[tp]:
+			raise ValueError("Unknown keys in projection {}: {}".format(
+				k, sorted(set(proj) - _projection_keys[tp])))
+		if proj.get('post') not in sizes:
+			raise ValueError("Projection {} has unknown post {}".format(
+				k, proj.get('post')))
+		if tp != 'Neuronal':
+			continue
+		pre = proj.get('pre')
+		if pre not in sizes and pre not in ins:
+			raise ValueError("Projection {} has unknown pre {}".format(k, pre))
+		rule = proj.get('rule', 'all_to_all')
+		if rule not in _rules:
+			raise ValueError("Projection {} has unknown rule {}".format(
+				k, rule))
+		if pre in ins and (rule != 'all_to_all' or 'w' in proj):
+			raise ValueError("Projection {}: inputs project all_to_all, with "
+				"their own weight".format(k))
+		if rule == 'one_to_one' and sizes[pre] != sizes[proj['post']]:
+			raise ValueError("Projection {}: one_to_one needs pre and post of "
+				"the same size".format(k))
+		if rule == 'fixed_probability' and not 0 <= proj.get('p', -1) <= 1:
+			raise ValueError("Projection {}: fixed_probability needs a p "
+				"between 0 and 1".format(k))
+		if rule == 'fixed_indegree' and not 0 <= proj.get('k', -1):
+			raise ValueError("Projection {}: fixed_indegree needs a k "
+				">= 0".format(k))
+	return
+
+def build(spec, n_in=2, n_out=2, rng=np.random):
+	"""Build the neurons and synapses of a (validated) declarative spec, as
+	arrays (see engine.Network_arrays): no object is made per neuron or 
+	synapse, the index arrays and the connectivity are made per projection.
+	- n_in 		: the number of input synapses [in0, in1, ..]; Poisson
+				  synapses, stimulated as Network.set_inputs says
+	- n_out 	: the number of output neurons [out0, out1, ..], LIF
+	- rng 		: random generator for fixed_probability/fixed_indegree
+				  connections (Network passes the 'connect' stream of its seed)
+	Returns the Network_arrays: the neurons (outputs first, then the 
+	populations in order of name) and the synapses (inputs first, then those
+	of the projections, in order), both in a fixed order
+	"""
+	net = engine.Network_arrays()
+	ins, outs = builtin_names(n_in, n_out)
+	inputs = net.add_synapses(Poisson_synapse, n_in)
+	outputs = net.add_neurons(LIF_Neuron, n_out)
+	groups = dict( (name, [j]) for name, j in zip(outs, outputs) )
+	pops = spec.get('populations', {})
+	for name in sorted(pops):
+		pop = pops[name]
+		kw = dict( (key, pop[key]) for key in ('izh_type', 'method')
+			if key in pop )
+		n = int(pop['n'])
+		groups[name] = net.add_neurons(_neuron_types[pop['type']], n,
+			name=[ '{}[{}]'.format(name, i) for i in xrange(n) ],
+			record=pop.get('record', False), **kw)
+
+	for proj in spec.get('projections', []):
+		tp = proj.get('type', 'Neuronal')
+		post = np.asarray(groups[proj['post']], dtype=int)
+		if tp == 'Poisson':
+			n = proj.get('n', 1)
+			syns = net.add_synapses(Poisson_synapse, len(post) * n,
+				rate=proj.get('firing_rate', 0.5), onset=proj.get('onset', 0),
+				offset=proj.get('offset') or np.inf, **_synapse(proj))
+			net.connect(np.repeat(post, n), syns)
+		elif tp == 'Continuous':
+			syn = net.add_synapses(Continuous_synapse, 1, w=proj.get('w', 0.1),
+				onset=proj.get('onset', 0), offset=proj.get('offset') or np.inf)
+			net.connect(post, np.repeat(syn, len(post)))
+		elif proj['pre'] in ins:
+			net.connect(post, np.repeat(inputs[ins.index(proj['pre'])],
+				len(post)))
+		else:
+			pre = groups[proj['pre']]
+			syns = net.add_synapses(Neuronal_synapse, len(pre), pre=pre,
+				**_synapse(proj))
+			connect(net, syns, post, proj.get('rule', 'all_to_all'),
+				proj.get('p'), rng, proj.get('k'))
+	# a synapse that is connected to a neuron twice counts once:
+	return net.finish(outputs, inputs, doubles=False)
+
+def connect(net, syns, post, rule, p=None, rng=np.random, k=None):
+	"""Connect the synapses syns (one per presynaptic neuron) to the neurons
+	post by rule (both as indices in the Network_arrays net)
+	"""
+	n_pre, n_post = len(syns), len(post)
+	if rule == 'all_to_all':
+		net.connect(np.repeat(post, n_pre), np.tile(syns, n_post))
+	elif rule == 'one_to_one':
+		net.connect(post, syns)
+	elif rule == 'fixed_probability':
+		# in blocks of rows, so the mask of a big projection isn't made at 
+		# once (the same numbers as drawing it at once)
+		rows = max(1, 2**20 // max(n_pre, 1))
+		for start in xrange(0, n_post, rows):
+			mask = rng.random_sample((min(rows, n_post - start), n_pre)) < p
+			j, i = np.nonzero(mask)
+			net.connect(post[start + j], syns[i])
+	elif rule == 'fixed_indegree':
+		# all at once; O(len(post) * k) instead of a full mask
+		if n_pre:
+			pre = rng.randint(n_pre, size=(n_post, int(k)))
+			net.connect(np.repeat(post, int(k)), syns[pre.ravel()])
+	return
+
+def _synapse(proj):
+	"""The weight, tau and exact of the synapses of a projection"""
+	kw = dict(w=proj.get('w', 0.1), exact=proj.get('exact', False))
+	if 'tau' in proj:
+		kw['tau'] = proj['tau']
+	return kw
@@ -1,90 +1,262 @@
 # our neuron model, and our synapses model
 import neurons
 import synapses
+# compiled (array-based) simulation of the neurons and synapses
+import engine
+from engine import Unsupported_network
+# event-driven simulation, for networks of LIF neurons
+import event_engine
+# declarative (non-python) network specs
+import netspec
+# what the network is shown, and should answer
+import tasks
+# when is a descision made?
+from decision import Decision_detector
+# recording traces to memory or disk
+from recorder import Trace_recorder, Spike_monitor
+# timing the phases of a time step
+from profiling import Phase_profiler
 
 #utils
 import numpy as np
 import matplotlib.pyplot as plt
 import sys
+import os
 import itertools
+import hashlib
+import cPickle
 
-# the following ensures every network spec will know the neuron/synapse types
-# and knows the fixed input synapses and output nodes
+# the following ensures every network spec will know the neuron/synapse types;
+# the input synapses (in0, in1, ..) and output nodes (out0, out1, ..) are put
+# in its namespace, listed in synapses and nodes (see Network.build)
 _network_spec_header = """
 from synapses import Neuronal_synapse, Continuous_synapse, Poisson_synapse
 from neurons import LIF_Neuron, Izh_Neuron
-synapses = [in0, in1]
-nodes = [out0, out1]
 """
 
+def spec_hash(network_spec, params=None):
+	"""A short hash (16 hex digits) identifying a network spec (and the
+	values of its parameters, if any)
+	"""
+	if isinstance(network_spec, dict):
+		network_spec = netspec.canonical(network_spec)
+	if params:
+		network_spec += repr(sorted(params.items()))
+	return hashlib.sha1(network_spec).hexdigest()[:16]
+
+def all_syn_step(syns, t, dt):
+	"""Step all synapses syns, in order"""
+	for syn in syns:
+		syn.time_step(t, dt)
+	return
+
+def all_nrn_step(nrns, dt):
+	"""Step all neurons nrns, in order"""
+	for nrn in nrns:
+		nrn.step(dt)
+	return
+
+def unique(objs):
+	"""The objects in objs without doubles, in the order they come first"""
+	seen = set()
+	return [ obj for obj in objs if not (obj in seen or seen.add(obj)) ]
+
+def drop_double_synapses(nrns):
+	"""A synapse added to a neuron twice counts once: drop the doubles from
+	the syn_in lists of nrns (Neuron.add_synapse doesn't check for them)
+	"""
+	for nrn in nrns:
+		if len(set(nrn.syn_in)) < len(nrn.syn_in):
+			nrn.syn_in = unique(nrn.syn_in)
+	return
+
+def by_type(objs):
+	"""The objects grouped by type: (type name, objects) per type, in the 
+	order the types come first
+	"""
+	groups = {}
+	for obj in objs:
+		groups.setdefault(type(obj).__name__, []).append(obj)
+	return [ (name, groups[name]) for name in
+		unique( type(obj).__name__ for obj in objs ) ]
+
+def read_checkpoint(path):
+	"""A checkpoint written by Network.checkpoint, as a dict of arrays"""
+	with np.load(path) as ckpt:
+		return dict(ckpt.items())
+
+def object_array(objs):
+	"""A 1d numpy array of the objects in the list objs"""
+	arr = np.empty(len(objs), dtype=object)
+	arr[:] = objs
+	return arr
+
+# compiled network specs, and networks built before (see Network, cache=True)
+_spec_code = {}
+_templates = {}
+
+# the types whose whole state is renewed by neurons.randomize_state and
+# Synapse.reset(), so that their networks can be reused for a new trial
+_resettable_types = ( neurons.LIF_Neuron, neurons.Izh_Neuron,
+	synapses.Neuronal_synapse, synapses.Poisson_synapse,
+	synapses.Continuous_synapse )
+
+def resettable(objs):
+	"""Can the neurons/synapses objs be reused for a new trial (see
+	Network.use_template)? Only if they're all of the types in neurons.py and
+	synapses.py (not subclasses): other types may keep any state
+	"""
+	return all( type(obj) in _resettable_types for obj in objs )
+
+def get_template(key, cache_dir=None):
+	"""The network built before for spec hash key (from memory, or else from
+	cache_dir), or None if there is none. A template that is only in memory
+	is written to cache_dir, if given
+	"""
+	path = None
+	if cache_dir is not None:
+		path = os.path.join(cache_dir, key + '.pkl')
+	if key not in _templates and path is not None and os.path.exists(path):
+		with open(path, 'rb') as f:
+			_templates[key] = cPickle.load(f)
+		_templates[key]['compiled'] = None
+	elif key in _templates and path is not None and not os.path.exists(path):
+		save_template(_templates[key], path)
+	return _templates.get(key)
+
+def store_template(key, net, cache_dir=None):
+	"""Keep the neurons and synapses of net (or its arrays, see
+	engine.Network_arrays), to reuse them for the next Network of spec hash
+	key (and store them in cache_dir, if given)
+	"""
+	if net.arrays is not None:
+		template = dict(arrays=net.arrays,
+			methods=net.arrays.nrn['method'].copy())
+	else:
+		template = dict(nodes=net.nodes, synapses=net.synapses,
+			inputs=net.inputs, outputs=net.outputs,
+			methods=[ nrn.method for nrn in net.nodes ])
+	if cache_dir is not None:
+		save_template(template, os.path.join(cache_dir, key + '.pkl'))
+	# the compiled arrays of the network are kept too, once it's compiled:
+	template['compiled'] = None
+	_templates[key] = template
+	return template
+
+def save_template(template, path):
+	"""Write the neurons and synapses of a template to path (a pickle); the
+	spike trains of the last trial aren't kept
+	"""
+	names = ('arrays', 'methods')
+	if 'arrays' not in template:
+		names = ('nodes', 'synapses', 'inputs', 'outputs', 'methods')
+		for syn in template['synapses'] + template['inputs']:
+			if isinstance(syn, synapses.Poisson_synapse):
+				syn.train = None
+	directory = os.path.dirname(path)
+	if directory and not os.path.isdir(directory):
+		os.makedirs(directory)
+	with open(path, 'wb') as f:
+		cPickle.dump(dict( (name, template[name]) for name in names ), f,
+			cPickle.HIGHEST_PROTOCOL)
+	return
+
 class Network(object):
 	"""This contains a bunch of neurons and synapses, and should eventually 
 	result in a perceptual descision
 	"""
-	def __init__(self, network_spec="", T=5000, dt=1.0, rand_input=True):
+	def __init__(self, network_spec="", T=5000, dt=1.0, rand_input=True,
+					window=300, f_thres=0.10, izh_method=None, lif_method=None,
+					params=None, cache=False, cache_dir=None, seed=None,
+					task=None):
 		super(Network, self).__init__()
 		"""
 		Code for the network architecture:
 		1. Set input synapses
 		2. Set output neurons
 		3. Set further, unknown network specification
+		A descision is made when an output fires > f_thres spikes/ms within
+		window ms (see decision.Decision_detector)
+		izh_method/lif_method, if given, set the integration scheme of all
+		Izh/LIF neurons (see integrators.py)
+		params are defined as variables in the network spec (e.g. 
+		params=dict(w_out=1.8) for a spec using w_out), and as a dict params,
+		so a spec can give defaults: params.get('w_out', 1.8)
+		The network_spec can also be declarative: a dict or JSON text 
+		describing populations and projections (see netspec.py), which is
+		built in bulk instead of executed, as arrays (self.arrays, see
+		engine.Network_arrays); the objects of its neurons and synapses
+		(nodes, synapses, inputs, outputs) are only made when they're asked
+		for, e.g. by the object-based simulation.
+		cache: build the network of a spec (and params) only once, and reuse
+		its neurons and synapses (and compiled arrays) for the next Network of
+		that spec, with a new input pattern and random state (see
+		use_template). NB: Networks of the same spec then share their neurons,
+		only the last one made should be simulated. Only networks of the
+		neuron and synapse types in neurons.py and synapses.py are reused
+		(see resettable); a spec with other types is built every time.
+		cache_dir: also keep the built networks in this directory, so other
+		processes/runs can load them instead of building them.
+		seed: the seed of the trial. The input pattern, the initial state, the
+		Poisson spikes and the random connections of a declarative spec (see
+		netspec.connect) each come from their own random stream, derived
+		from it (see engine.trial_streams), so a trial can be replayed from
+		its seed, e.g. one that was simulated in a batch or on a worker. None
+		draws a seed from the global numpy random state; it's kept in self.seed
+		task: what the network is shown and should answer (see tasks.py): the
+		number of inputs/outputs, the input patterns and the correct output.
+		Default: tasks.Discrimination(rand_input), one of two inputs is on.
 		"""
-		########## 1. input synapses / one is stimulated, other isn't ##########
-		# Input pattern:
-		self.patt_in = np.array( [1, 0] )
-
-		## perceptual descision making: does the input match the output?
-		if rand_input:
-			np.random.shuffle( self.patt_in )
-
-		# store which was the input:
-		self.which_in = np.where(self.patt_in==1)[0]
-
-		# Set inputs:
-		in_f = 0.75 * self.patt_in
-		in0 = synapses.Poisson_synapse(
-			firing_rate = in_f[0], w=0.5, onset=300)
-		in1 = synapses.Poisson_synapse(
-			firing_rate = in_f[1], w=0.5, onset=300)
-		
-		########### 2. output neurons: fixed, unconnected LIF neurons ##########
-		out0 = neurons.LIF_Neuron()
-		out1 = neurons.LIF_Neuron()
+		self.rand_input = rand_input
+		self.task = task if task is not None else tasks.Discrimination(
+			rand_input)
+		self.params = dict(params or {})
+		self.seed = seed = engine.root_seed(seed)
+		self.rngs = engine.trial_streams(seed)
+		self.template = None
+		self.arrays = None
+		if cache:
+			key = spec_hash(network_spec, params) + '-' + self.task.key
+			self.template = get_template(key, cache_dir)
+			if self.template is not None:
+				self.use_template(self.template)
+		if self.template is None:
+			self.build(network_spec)
+			# the initial state comes from the state stream, not from the
+			# constructors of the neurons
+			if self.arrays is not None:
+				self.arrays.randomize_state(self.rngs['state'])
+			else:
+				neurons.randomize_state(self.nodes, self.rngs['state'])
+			if cache and (self.arrays is not None or
+					resettable(self.nodes + self.synapses)):
+				self.template = store_template(key, self, cache_dir)
 
-		###### 3. Read in further network architecture specified by user #######
-		### Compile network specification
-		try:
-			cnwspec = compile(_network_spec_header + network_spec,
-				u'<string>', u'exec')
-		except Exception, e:	
-			print "!!!Failed to COMPILE network_spec!!!"
-			raise e
-		### ... and evaluate it:
-		try:
-			exec cnwspec in locals()
-		except Exception, e:
-			print "!!!!Failed to EXECUTE network_spec!!!"
-			raise e
-
-		### Store unique nodes/synapses in the class
-		# set() gets rid of doubles:
-		self.nodes = list(set(nodes))
-		# sort them by name:
-		self.nodes = sorted(self.nodes, key = lambda x: x.name) 
-		# this collects all known synapses:
-		self.synapses = self.list_network_synapses(self.nodes, synapses)
+		# integration schemes:
+		if self.arrays is not None:
+			self.arrays.set_methods(izh_method, lif_method)
+		else:
+			for nrn in self.nodes:
+				if izh_method and isinstance(nrn, neurons.Izh_Neuron):
+					nrn.method = izh_method
+				if lif_method and isinstance(nrn, neurons.LIF_Neuron):
+					nrn.method = lif_method
 
 		"""
 		Code to run the network. Step-functions, check output spikes, etc.
 		"""
-		# function to tstep all neurons/synapses at once (for self.time_step) :
-		self.all_syn_step = np.vectorize(
-			lambda syn, t, dt: syn.time_step(t, dt) )
-		self.all_nrn_step = np.vectorize(
-			lambda nrn, dt: nrn.step(dt) )
+		# function to tstep all neurons/synapses at once (for self.time_step);
+		# plain loops: np.vectorize calls the first element twice to find the 
+		# output type, which would step it twice
+		self.all_syn_step = all_syn_step
+		self.all_nrn_step = all_nrn_step
 		# does the output spike?
-		self.get_out_spikes = lambda : (out0.spike(), out1.spike())
-		self.outspikes = []
+		self.get_out_spikes = lambda : [ bool(nrn.spike())
+			for nrn in self.outputs ]
+		self.window = window
+		self.f_thres = f_thres
+		# compiled version of the network, made in simulate() if requested
+		self.compiled = None
 
 		"""
 		Code for recording(s): 
@@ -94,49 +266,300 @@ class Network(object):
 		>>> Notify user (of nr of recordings)
 		"""
 		### Extract those neurons which is recorded:
-		# Function to determine all recorded objects
-		get_recording = np.vectorize( lambda obj: obj.record)
-		# Get their indices
-		recv_idx = np.where(get_recording(self.nodes))[0]
-		reci_idx = np.where(get_recording(self.synapses))[0]
-
-		# and store them in separate lists:
-		self.rec_nrns = np.array( self.nodes 	)[recv_idx] 
-		self.rec_syns = np.array( self.synapses )[reci_idx]
+		# their indices (in nodes and synapses), and the objects (see
+		# find_recorded)
+		if self.arrays is not None:
+			self.rec_nrn_idx = np.flatnonzero(self.arrays.nrn['record'])
+			self.rec_syn_idx = np.flatnonzero(self.arrays.syn['record'])
+		else:
+			self.rec_nrn_idx = np.array([ j for j, nrn in
+				enumerate(self.nodes) if nrn.record ], dtype=int)
+			self.rec_syn_idx = np.array([ i for i, syn in
+				enumerate(self.synapses) if syn.record ], dtype=int)
+		self.find_recorded()
 
 		### Set up functions that record from them:
-		getI = lambda syn : syn.I_out()
-		getV = lambda nrn : nrn.get_V()
-		self.get_Is = np.vectorize( getI )
-		self.get_Vs = np.vectorize( getV )
+		self.get_Is = lambda syns: np.array([ syn.I_out() for syn in syns ])
+		self.get_Vs = lambda nrns: np.array([ nrn.get_V() for nrn in nrns ])
 
 		### notify user how many nodes/synapses are recorded:
-		if len(recv_idx) > 0:
-			print "#recorded Neurons : ", self.get_Vs(self.rec_nrns).shape[0]
+		if len(self.rec_nrn_idx) > 0:
+			print "#recorded Neurons : ", len(self.rec_nrn_idx)
+
+		if len(self.rec_syn_idx) > 0:
+			print "#recorded Synapses: ", len(self.rec_syn_idx)
+
+		# where and how traces are recorded (see set_recording)
+		self.set_recording()
+		self.V_rec = self.I_rec = None
+		self.spike_mon = None
+		# times the phases of a time step, when profiling (see set_profiling)
+		self.profiler = None
+		# pre-stimulus states to start trials from (see make_warm_pool)
+		self.warm_pool = None
+		# the simulation in progress or paused, if any (see new_run)
+		self.running = None
+		return
+
+	def set_recording(self, directory=None, dtype=np.float64, every=1,
+						chunk=1024, everything=False, spikes=True):
+		"""How the traces of recorded neurons (V) and synapses (I) are kept.
+		Traces are recorded in chunks, so only the time steps until the 
+		descision take memory (see recorder.Trace_recorder).
+		- directory : stream the traces to V.npy and I.npy in this directory,
+					  instead of keeping them in memory; make_plots reads them
+					  back lazily
+		- dtype 	: e.g. np.float32 halves the size of the traces
+		- every 	: only record every every-th time step
+		- chunk 	: number of time steps buffered before writing
+		- everything: record all neurons and synapses, not only the ones with
+					  record=True in the spec
+		- spikes 	: record the spikes of all neurons (see spike_mon)
+		"""
+		self.rec_opts = dict(directory=directory, dtype=dtype, every=every,
+			chunk=chunk, spikes=spikes)
+		if everything:
+			n_nrn, n_syn = self.size()
+			self.rec_nrn_idx = np.arange(n_nrn)
+			self.rec_syn_idx = np.arange(n_syn)
+			self.find_recorded()
+		return
+
+	def find_recorded(self):
+		"""The recorded neurons and synapses (rec_nrns, rec_syns: object
+		arrays), for the object-based simulation; None while there are no
+		objects (see make_objects)
+		"""
+		self.rec_nrns = self.rec_syns = None
+		if self.arrays is None:
+			self.rec_nrns = object_array([ self.nodes[j]
+				for j in self.rec_nrn_idx ])
+			self.rec_syns = object_array([ self.synapses[i]
+				for i in self.rec_syn_idx ])
+		return
+
+	def __getattr__(self, name):
+		# the objects of a network built as arrays are made when they're
+		# first asked for
+		if name in ('nodes', 'synapses', 'inputs', 'outputs') and \
+				self.__dict__.get('arrays') is not None:
+			self.make_objects()
+			return getattr(self, name)
+		raise AttributeError(name)
+
+	def make_objects(self):
+		"""Make the neuron and synapse objects of a network built as arrays
+		(see engine.Network_arrays.objects), with the parameters and state in
+		the arrays; from then on, the objects are the network
+		"""
+		self.nodes, self.synapses, self.inputs, self.outputs = \
+			self.arrays.objects()
+		self.arrays = None
+		self.find_recorded()
+		return
+
+	def size(self):
+		"""The number of neurons and of synapses"""
+		if self.arrays is not None:
+			return self.arrays.n_nrn, self.arrays.n_syn
+		return len(self.nodes), len(self.synapses)
+
+	def node_names(self):
+		"""The names of all neurons, in order"""
+		if self.arrays is not None:
+			return list(self.arrays.nrn['name'])
+		return [ nrn.name for nrn in self.nodes ]
+
+	def synapse_names(self):
+		"""The names of all synapses, in order"""
+		if self.arrays is not None:
+			return list(self.arrays.syn['name'])
+		return [ syn.name for syn in self.synapses ]
+
+	def output_idx(self):
+		"""The indices of the output neurons, in nodes"""
+		if self.arrays is not None:
+			return self.arrays.out
+		idx = dict( (id(nrn), j) for j, nrn in enumerate(self.nodes) )
+		return np.array([ idx[id(nrn)] for nrn in self.outputs ], dtype=int)
+
+	def set_inputs(self, rates):
+		"""Stimulate the input synapses with the firing rates rates (one per
+		input), and the weight and onset of the task
+		"""
+		if self.arrays is not None:
+			self.arrays.set_inputs(rates, self.task.w, self.task.onset)
+			return
+		for syn, rate in zip(self.inputs, rates):
+			syn.firing_rate = rate
+			syn.w = self.task.w
+			syn.onset = self.task.onset
+		return
+
+	def new_recorder(self, n, name, dt, t0=0.0):
+		"""A Trace_recorder for the traces of n neurons or synapses, to
+		<directory>/<name>.npy, starting at t0
+		"""
+		opts = self.rec_opts
+		path = None
+		if opts['directory'] is not None:
+			if not os.path.isdir(opts['directory']):
+				os.makedirs(opts['directory'])
+			path = os.path.join(opts['directory'], name + '.npy')
+		return Trace_recorder(n, path, opts['dtype'], opts['every'],
+			opts['chunk'], dt, t0=t0)
+
+	def new_spike_monitor(self):
+		"""A Spike_monitor for all nodes, if spikes are recorded"""
+		if not self.rec_opts['spikes']:
+			return None
+		return Spike_monitor(self.node_names())
+
+	def save_spikes(self, path=None):
+		"""Save the spikes of the last trial to an .npz file (by default
+		spikes.npz in the recording directory); load it again with
+		recorder.Spike_monitor.load
+		"""
+		if path is None:
+			path = os.path.join(self.rec_opts['directory'] or '.', 'spikes.npz')
+		self.spike_mon.save(path)
+		return path
+
+	@property
+	def Vv(self):
+		"""Recorded V of rec_nrns: n_recorded x n_samples"""
+		if self.V_rec is None:
+			return np.zeros((len(self.rec_nrn_idx), 0))
+		return self.V_rec.read()
+
+	@property
+	def Ii(self):
+		"""Recorded I of rec_syns: n_recorded x n_samples"""
+		if self.I_rec is None:
+			return np.zeros((len(self.rec_syn_idx), 0))
+		return self.I_rec.read()
+
+	def build(self, network_spec):
+		"""Build the network: inputs, outputs and the neurons and synapses
+		of the network spec
+		"""
+		# the neurons of this network get their own state arrays:
+		neurons.new_populations()
+
+		########## 1. input synapses, stimulated as the pattern says ##########
+		# Input pattern, and the correct answer to it:
+		self.patt_in = self.task.draw_pattern(self.rngs['pattern'])
+		self.answer = int(self.task.answer(self.patt_in))
+		# store which inputs are on:
+		self.which_in = np.where(self.patt_in==1)[0]
+
+		### a declarative spec is built as arrays, with its inputs/outputs
+		if netspec.is_declarative(network_spec):
+			self.arrays = netspec.build(netspec.load(network_spec,
+				self.params, self.task.n_in, self.task.n_out),
+				self.task.n_in, self.task.n_out, self.rngs['connect'])
+			self.set_inputs(self.task.input_rates(self.patt_in))
+			return
+
+		# Set inputs:
+		self.inputs = [ synapses.Poisson_synapse(firing_rate = rate,
+			w=self.task.w, onset=self.task.onset)
+			for rate in self.task.input_rates(self.patt_in) ]
+		
+		########### 2. output neurons: fixed, unconnected LIF neurons ##########
+		self.outputs = [ neurons.LIF_Neuron()
+			for _ in xrange(self.task.n_out) ]
 
-		if len(reci_idx) > 0:
-			print "#recorded Synapses: ", self.get_Is(self.rec_syns).shape[0]
+		###### 3. Read in further network architecture specified by user #######
+		### Compile network specification (once per spec)
+		key = spec_hash(network_spec)
+		if key not in _spec_code:
+			try:
+				_spec_code[key] = compile(_network_spec_header + network_spec,
+					u'<string>', u'exec')
+			except Exception, e:	
+				print "!!!Failed to COMPILE network_spec!!!"
+				raise e
+		cnwspec = _spec_code[key]
+		### ... and evaluate it, in its own namespace: the parameters (also
+		# as the dict params), the inputs and outputs, and the lists to add to
+		namespace = dict(self.params)
+		namespace['params'] = dict(self.params)
+		for k, syn in enumerate(self.inputs):
+			namespace['in{}'.format(k)] = syn
+		for k, nrn in enumerate(self.outputs):
+			namespace['out{}'.format(k)] = nrn
+		namespace['synapses'] = list(self.inputs)
+		namespace['nodes'] = list(self.outputs)
+		try:
+			exec cnwspec in namespace
+		except Exception, e:
+			print "!!!!Failed to EXECUTE network_spec!!!"
+			raise e
 
+		### Store unique nodes/synapses in the class
+		# without doubles, in the order of the spec:
+		self.nodes = unique(namespace['nodes'])
+		drop_double_synapses(self.nodes)
+		# sort them by name (a stable sort: same names keep their order):
+		self.nodes = sorted(self.nodes, key = lambda x: x.name) 
+		# this collects all known synapses:
+		self.synapses = self.list_network_synapses(self.nodes,
+			namespace['synapses'])
+		return
+
+	def use_template(self, template):
+		"""Use the neurons and synapses of a network built before (see 
+		store_template), as a new trial: with a new input pattern, a new 
+		random initial state for the neurons (from the streams of this trial,
+		as build() would), silent synapses, and the integration schemes the
+		neurons were built with
+		"""
+		if 'arrays' in template:
+			self.arrays = template['arrays']
+			# the objects of the network before are its own from now on
+			self.arrays.objs = None
+		else:
+			self.nodes = template['nodes']
+			self.synapses = template['synapses']
+			self.inputs = template['inputs']
+			self.outputs = template['outputs']
+		self.patt_in = self.task.draw_pattern(self.rngs['pattern'])
+		self.answer = int(self.task.answer(self.patt_in))
+		# store which inputs are on:
+		self.which_in = np.where(self.patt_in==1)[0]
+		# the inputs as the task says (it may differ from the one built with)
+		self.set_inputs(self.task.input_rates(self.patt_in))
+		if self.arrays is not None:
+			self.arrays.randomize_state(self.rngs['state'])
+			self.arrays.nrn['method'][:] = template['methods']
+			return
+		neurons.randomize_state(self.nodes, self.rngs['state'])
+		for syn in self.synapses:
+			syn.reset()
+		for nrn, method in zip(self.nodes, template['methods']):
+			nrn.method = method
 		return
 
+
 	def list_network_synapses(self, nodes, known_synapses = [] ):
 		""" This functions lists all unique synapses in the network. 
 		This lists all unique synapses connected to 'nodes'. Passing
 		additional 'known_synapses' is particularily useful when synapses exist 
 		independently from nodes (e.g. for testing purposes...)
 			Main purpose for this function is to ensure all synapses in the 
-		network are actually included in the simulation, including the hidden
-		BG-noise synapses that come with each neuron.
+		network are actually included in the simulation, including those
+		that are only in the syn_in lists (e.g. added with Synapse.project).
+			The order is fixed: the synapses of the nodes (in the order of
+		their syn_in lists), then the other known synapses; so the index of
+		a synapse in the list is a stable id, the same every time the spec 
+		is built.
 		"""
-		# how to get all synapses from nodes:
-		get_all_syn = np.vectorize( lambda n_s: n_s.syn_in )
 		# Nodes encode synapses as lists: 'itertools.chain' welds them together:
-		node_syns = list(itertools.chain.from_iterable( get_all_syn(nodes) ))
-		# list all synapses found + known synapses
-		all_synapses = node_syns + known_synapses 
-		# filter duplicates and return
-		return list( set(all_synapses) )
-		
+		node_syns = itertools.chain.from_iterable( nrn.syn_in for nrn in nodes )
+		# list all synapses found + known synapses, without doubles
+		return unique( itertools.chain(node_syns, known_synapses) )
+
 	def time_step(self, t, dt, idx):
 		""" Simulate a time_step in the model
 		1. update all synapses in the network
@@ -144,27 +567,128 @@ class Network(object):
 		3. Record nodes and synapses where requested
 		4. Update #output spikes, (to check output frequency > threshold)
 		"""
-		# update synapses:
-		self.all_syn_step(self.synapses, t, dt)
-		# update neurons:
-		self.all_nrn_step(self.nodes, dt)
+		if self.compiled is not None:
+			return self.compiled_time_step(t, dt, idx)
+		prof = self.profiler
+		if prof is None:
+			# update synapses, and the background noise:
+			self.all_syn_step(self.synapses, t, dt)
+			self.background.step(t, dt)
+			# update neurons:
+			self.all_nrn_step(self.nodes, dt)
+		else:
+			# the same, per type, to time the types separately (synapses 
+			# only read the neurons, and vice versa, so the order is free)
+			for name, syns in self.syn_types:
+				self.all_syn_step(syns, t, dt)
+				prof.lap('synapses: ' + name)
+			self.background.step(t, dt)
+			prof.lap('background noise')
+			for name, nrns in self.nrn_types:
+				self.all_nrn_step(nrns, dt)
+				prof.lap('neurons: ' + name)
 
 		# Record V or I where requested
-		if len(self.rec_nrns) > 0:
-			self.Vv[:,idx] = self.get_Vs(self.rec_nrns)
-		if len(self.rec_syns) > 0:
-			self.Ii[:,idx] = self.get_Is(self.rec_syns)
+		if len(self.rec_nrns) > 0 and self.V_rec.due(idx):
+			self.V_rec.append( self.get_Vs(self.rec_nrns) )
+		if len(self.rec_syns) > 0 and self.I_rec.due(idx):
+			self.I_rec.append( self.get_Is(self.rec_syns) )
+		if prof is not None:
+			prof.lap('record')
+		if self.spike_mon is not None:
+			self.spike_mon.append(t, np.flatnonzero([ nrn.spike()
+				for nrn in self.nodes ]) )
+			if prof is not None:
+				prof.lap('spike monitor')
 		# update spike_output
-		if len(self.outspikes) >= (300 * dt):
-			self.outspikes = self.outspikes[1:]
-		self.outspikes.append( self.get_out_spikes() )
+		self.detector.update( self.get_out_spikes() )
+		if prof is not None:
+			prof.lap('outspikes')
 		return
 
-	def simulate(self, T=5000, dt=1.0):
+	def compile(self, n_trials=1, reuse=None):
+		"""Lower the neurons and synapses of this network into arrays
+		(see engine.Compiled_network), so they can be simulated at once.
+		Raises an engine.Unsupported_network (a TypeError) if the network
+		contains types that can't be compiled
+		- reuse : a Compiled_network of a network with the same topology
+		(e.g. built from the same spec), whose structure is reused
+		"""
+		if reuse is None:
+			reuse = self.compiled
+		if reuse is None and self.template is not None:
+			reuse = self.template['compiled']
+		arrays = self.arrays
+		if arrays is None:
+			arrays = engine.lower(self.nodes, self.synapses, self.outputs,
+				self.inputs)
+		self.compiled = None
+		if reuse is not None:
+			try:
+				self.compiled = reuse.rebind(arrays, n_trials)
+			except ValueError:
+				pass
+		if self.compiled is None:
+			self.compiled = engine.Compiled_network(arrays, n_trials)
+		if self.template is not None:
+			self.template['compiled'] = self.compiled
+		return self.compiled
+
+	def compiled_time_step(self, t, dt, idx):
+		"""time_step() for the compiled network; same steps, but all arrays"""
+		prof = self.profiler
+		self.compiled.time_step(t, dt, self.detector)
+
+		# Record V or I where requested
+		if len(self.rec_nrn_idx) > 0 and self.V_rec.due(idx):
+			self.V_rec.append( self.compiled.get_V()[0, self.rec_nrn_idx] )
+		if len(self.rec_syn_idx) > 0 and self.I_rec.due(idx):
+			self.I_rec.append( self.compiled.I_out()[0, self.rec_syn_idx] )
+		if prof is not None:
+			prof.lap('record')
+		if self.spike_mon is not None:
+			self.spike_mon.append(t,
+				np.flatnonzero(self.compiled.spikes[0, :-1]) )
+			if prof is not None:
+				prof.lap('spike monitor')
+		return
+
+	def set_profiling(self, profile):
+		"""Time the phases of the time steps of the next simulation (see
+		profiling.Phase_profiler); per type of neuron/synapse, too.
+		- profile : True (a new profiler), a Phase_profiler to add the times
+		to (e.g. of many trials), or False/None (don't profile)
+		Returns the profiler (also kept in self.profiler), or None
+		"""
+		self.profiler = None
+		if profile:
+			self.profiler = profile if isinstance(profile, Phase_profiler) \
+				else Phase_profiler()
+		return self.profiler
+
+	def simulate(self, T=5000, dt=1.0, engine='auto', progress=True,
+					profile=False, warm=False, stop=None, checkpoint=None,
+					checkpoint_every=1000):
 		"""Simulate one trial with the current network.
 		1. set out recording-traces
 		2. Run through timesteps until descision_made or time > T
 		3. return result
+		- engine: 'objects' steps every neuron/synapse object, 'compiled' 
+		simulates them as arrays (much faster), 'auto' compiles when possible.
+		'event' simulates event-driven (see simulate_events)
+		- progress: show a progress bar
+		- profile: time the phases of the time steps (see set_profiling);
+		with profile=True, the times are printed at the end
+		- warm: start at the onset of the stimulus, from a state drawn from
+		the warm-start pool (see make_warm_pool), instead of simulating the
+		time before it; only with the compiled engine
+		- stop: pause the trial at time stop, if no descision was made by
+		then, and return None. The trial can then be saved (see checkpoint),
+		continued or forked (see resume)
+		- checkpoint: write a checkpoint of the trial to this file every
+		checkpoint_every ms (of simulated time), to resume from if the run is
+		interrupted
+		Pausing and checkpoints need the compiled engine.
 		"""
 		# T should be higher than 300, that is when stim-onset is.
 		if T < 300:
@@ -172,88 +696,512 @@ class Network(object):
 			T = 300
 		self.T = T; 
 		self.dt = dt
+		prof = self.set_profiling(profile)
+		if warm and engine not in ('compiled', 'auto'):
+			raise ValueError("Warm starts need the compiled engine")
+		pausing = stop is not None or checkpoint is not None
+		if pausing and engine not in ('compiled', 'auto'):
+			raise ValueError("Checkpoints need the compiled engine")
+		if engine == 'event':
+			if prof is not None:
+				prof.start()
+			self.simulate_events(T, dt)
+			if prof is not None:
+				prof.lap('event simulation')
+			if profile is True:
+				prof.report()
+			return self.descision_made
+
+		### compile the network if requested; the state lives in the arrays
+		# during the simulation, and is put back in the objects afterwards
+		self.compiled = None
+		if engine == 'compiled' or warm or pausing:
+			self.compile()
+		elif engine == 'auto':
+			try:
+				self.compile()
+			except Unsupported_network:
+				self.compiled = None
+		if self.compiled is None:
+			# draw the Poisson spikes of the whole trial at once, those of
+			# the background noise of the nodes after those of the synapses
+			pois = [ syn for syn in self.synapses
+				if isinstance(syn, synapses.Poisson_synapse) ]
+			trains = synapses.presample_spike_trains(pois, T, dt,
+				self.rngs['noise'],
+				bg_rate=neurons.gather_state(self.nodes, 'bg_rate'))
+			self.background = neurons.Background_noise(self.nodes, trains,
+				first=len(pois))
+			if prof is not None:
+				self.syn_types = by_type(self.synapses)
+				self.nrn_types = by_type(self.nodes)
+		else:
+			self.compiled.rng = self.rngs['noise']
+			self.compiled.profiler = prof
+		self.descision_made = None
+		self.detector = Decision_detector(self.task.n_out, self.window,
+			self.f_thres, dt=dt)
+		t0 = 0.0
+		if warm:
+			t0 = self.start_warm(self.compiled, self.detector,
+				[ self.rngs['state'] ], dt)
 
 		### 1. set out traces for neurons to be recorded
-		self.Vv = np.zeros(( self.rec_nrns.shape[0], int(T//dt)))
-		self.Ii = np.zeros(( self.rec_syns.shape[0], int(T//dt)))
+		self.V_rec = self.new_recorder(len(self.rec_nrn_idx), 'V', dt, t0)
+		self.I_rec = self.new_recorder(len(self.rec_syn_idx), 'I', dt, t0)
+		self.spike_mon = self.new_spike_monitor()
 
-		### 2. Run through timesteps:
+		### 2. Run through timesteps (see run_trial)
+		self.running = self.new_run('trial', t0, T, dt, stop, checkpoint,
+			checkpoint_every, report=profile is True)
+		return self.run_trial(progress)
+
+	def new_run(self, kind, t0, T, dt, stop=None, checkpoint=None,
+				checkpoint_every=1000, idx=0, **state):
+		"""The state of a simulation in progress (kept in self.running): 
+		where it is, when to pause and where to write checkpoints, and (for
+		a batch) the trials still running and the results so far
+		"""
+		run = dict( kind=kind, t=t0, T=T, dt=dt, stop=stop, idx=idx,
+			checkpoint=checkpoint, checkpoint_every=checkpoint_every, **state )
+		run['t_save'] = t0 + checkpoint_every if checkpoint else np.inf
+		run['t_due'] = min(run['t_save'], np.inf if stop is None else stop)
+		return run
+
+	def pause_due(self, t):
+		"""At the start of time step t: write a checkpoint if one is due,
+		and whether the simulation should pause now (see simulate, stop)
+		"""
+		run = self.running
+		run['t'] = t
+		if run['stop'] is not None and t >= run['stop']:
+			return True
+		if t >= run['t_save']:
+			self.checkpoint(run['checkpoint'])
+			run['t_save'] = t + run['checkpoint_every']
+		run['t_due'] = min(run['t_save'],
+			np.inf if run['stop'] is None else run['stop'])
+		return False
+
+	def run_trial(self, progress=False):
+		"""Run the trial in self.running (see simulate) from where it is,
+		until a descision is made, T, or it is paused. Returns the descision,
+		or None if paused
+		"""
+		run = self.running
+		T, dt, prof = run['T'], run['dt'], self.profiler
 		# 'progess bar'
-		pb_width = T//100
-		init_pbar = "[>{}]".format(" "*(pb_width))
-		sys.stdout.write(init_pbar)
-		sys.stdout.flush()
-		sys.stdout.write("\b" * (pb_width+1))
+		if progress:
+			pb_width = T//100
+			init_pbar = "[>{}]".format(" "*(pb_width))
+			sys.stdout.write(init_pbar)
+			sys.stdout.flush()
+			sys.stdout.write("\b" * (pb_width+1))
 		# /progress bar
 
-		self.descision_made = None
-		idx = 0
-		for t in np.arange(0, T, dt):
+		idx = run['idx']
+		t_due = run['t_due']
+		paused = False
+		if prof is not None:
+			prof.start()
+		for t in np.arange(run['t'], T, dt):
+			# pause, or write a checkpoint, if due
+			if t >= t_due:
+				paused = self.pause_due(t)
+				if paused:
+					run['idx'] = idx
+					break
+				t_due = run['t_due']
+
 			# update network:
 			self.time_step(t,dt, idx)
 			
 			# updat 'progress bar'
-			if t % 100 == 0:
+			if progress and t % 100 == 0:
 				sys.stdout.write("\b->")
 				sys.stdout.flush()
 			
 			# check descision made, if so, stop
-			if idx > 300:
-				self.check_descision_made(t, dt)
+			self.check_descision_made(t, dt)
+			if prof is not None:
+				prof.lap('check descision')
 			if self.descision_made:
 				break
 			idx += 1
 
 		# ...end of the progress bar
-		sys.stdout.write("\n")
+		if progress:
+			sys.stdout.write("\n")
+
+		if self.compiled is not None:
+			self.compiled.store_state()
+			if not paused:
+				self.compiled.profiler = None
+		if paused:
+			return None
+		self.running = None
+		self.V_rec.close()
+		self.I_rec.close()
+		if run['report']:
+			self.profiler.report()
 
 		# check for descisions:
 		if self.descision_made == None:
 			self.descision_made = (None, t)
 		return self.descision_made
 
-	def check_descision_made(self, t, dt, f_thres = 0.10 ):
-		# descision when > 0.1 spikes/ms, i.e. 10ms ISI
-		spike_traces = zip(*self.outspikes)
-		nspikes = sum(spike_traces[0]), sum(spike_traces[1])
-		if nspikes[0] > (f_thres * 300*dt): # if n spikes in this timespan > 200Hz
-			self.descision_made = ( 0, t )
-		elif nspikes[1] > (f_thres * 300*dt):
-			self.descision_made = ( 1, t )
-		return
+	def simulate_events(self, T=5000, dt=1.0, f_thres=None):
+		"""Simulate one trial event-driven (see event_engine.Event_network),
+		only possible for networks of LIF neurons. The cost is proportional to
+		the number of spikes instead of T/dt; only spikes are recorded. 
+		The descision is made as in check_descision_made, but RTs are exact
+		spike times rather than multiples of dt; f_thres defaults to that of
+		the network
+		"""
+		f_thres = self.f_thres if f_thres is None else f_thres
+		self.T = T
+		self.dt = dt
+		events = event_engine.Event_network(
+			self.nodes, self.synapses, self.outputs, self.rngs['noise'])
+		desc, t = events.simulate(T, window=self.window, f_thres=f_thres)
+		if desc is None:
+			t = np.arange(0, T, dt)[-1] # as in simulate
+		events.store_state(t)
+		self.spike_mon = self.new_spike_monitor()
+		if self.spike_mon is not None and events.spikes:
+			spike_t, spike_idx = zip(*events.spikes)
+			self.spike_mon.append(np.array(spike_t), spike_idx)
+		self.descision_made = (desc, t)
+		return self.descision_made
+
+	def simulate_batch(self, n_trials=10, T=5000, dt=1.0, seed=None,
+						reuse=None, patts=None, profile=False, warm=False,
+						stop=None, checkpoint=None, checkpoint_every=1000,
+						first=0):
+		"""Simulate n_trials independent trials of this network at once.
+		Every trial gets its own random initial state, input pattern and 
+		Poisson spikes, from its own random streams (see engine.trial_seeds
+		and engine.trial_streams): a trial with seed s is the same trial as
+		Network(..., seed=s) simulated on its own with the compiled engine.
+		The trials are trials first, .., first+n_trials-1 of the run with
+		seed seed (None draws one, it's kept in self.batch_seed), so the
+		batches of a run can be simulated one by one without repeating trials.
+		patts: the input pattern of every trial (n_trials x n_in), e.g. all
+		patterns of the task at once; by default they're drawn per trial
+		Trials that made a descision are dropped from the batch.
+		reuse is passed on to compile(); the compiled network is kept in 
+		self.compiled, so a next batch can reuse it.
+		profile: time the phases of the time steps, as in simulate()
+		warm: start every trial at the onset of the stimulus, from a state
+		drawn from the warm-start pool (see make_warm_pool)
+		stop, checkpoint, checkpoint_every: pause the batch, or write
+		checkpoints of it, as in simulate(); a paused batch returns None
+		Returns a list of (descision, rt) and the input patterns, per trial 
+		"""
+		if T < 300:
+			print "WARNING: T < 300ms, corrected to 300ms"
+			T = 300
+		self.T = T; 
+		self.dt = dt
+
+		### 1. compile with a fresh random state and input per trial
+		self.batch_seed = seed = engine.root_seed(seed)
+		seeds = engine.trial_seeds(seed, n_trials, first)
+		rngs = [ engine.trial_streams(s) for s in seeds ]
+		drawn = np.array([ self.task.draw_pattern(rng['pattern'])
+			for rng in rngs ])
+		patts = drawn if patts is None else np.asarray(patts)
+		compiled = self.compile(n_trials, reuse)
+		compiled.randomize_state([ rng['state'] for rng in rngs ])
+		compiled.set_input_rates(self.task.input_rates(patts))
+		# the Poisson spikes of each trial come from its own stream, too
+		compiled.trial_rngs = [ rng['noise'] for rng in rngs ]
+		compiled.profiler = self.set_profiling(profile)
+
+		### 2. Run through timesteps, until all trials made a descision
+		# (see run_batch)
+		detector = Decision_detector(self.task.n_out, self.window,
+			self.f_thres, dt=dt, n_trials=n_trials)
+		t0 = 0.0
+		if warm:
+			t0 = self.start_warm(compiled, detector,
+				[ rng['state'] for rng in rngs ], dt)
+		self.detector = detector
+		self.running = self.new_run('batch', t0, T, dt, stop, checkpoint,
+			checkpoint_every, report=profile is True, patts=patts,
+			trials=np.arange(n_trials), results=[None] * n_trials)
+		return self.run_batch()
+
+	def run_batch(self):
+		"""Run the batch in self.running (see simulate_batch) from where it
+		is, until all trials made a descision, T, or it is paused. Returns
+		the results and input patterns, or None if paused
+		"""
+		run = self.running
+		T, dt = run['T'], run['dt']
+		compiled, detector = self.compiled, self.detector
+		trials = run['trials'] # the trials still running
+		results = run['results']
+		prof = compiled.profiler
+		t_due = run['t_due']
+		if prof is not None:
+			prof.start()
+		for t in np.arange(run['t'], T, dt):
+			# pause, or write a checkpoint, if due
+			if t >= t_due:
+				if self.pause_due(t):
+					return None
+				t_due = run['t_due']
+
+			compiled.time_step(t, dt, detector)
+
+			# check descisions made, and drop those trials from the batch
+			desc = detector.check(t)
+			done = desc >= 0
+			if done.any():
+				for k in np.where(done)[0]:
+					results[trials[k]] = ( int(desc[k]), t )
+				compiled.take(~done)
+				detector.take(~done)
+				trials = run['trials'] = trials[~done]
+			if prof is not None:
+				prof.lap('check descision')
+			if len(trials) == 0:
+				break
 
-	def make_plots(self, trace=True, im=False, tmax=None):
-		"""Plot traces of recorded neurons and synapses"""
+		# no descision made:
+		for k in trials:
+			results[k] = (None, t)
+		self.running = None
+		compiled.profiler = None
+		if run['report']:
+			prof.report()
+		return results, run['patts']
 
+	def make_warm_pool(self, n_pool=100, dt=1.0, seed=None, first=0):
+		"""Simulate n_pool trials (batched, compiled) until the onset of the
+		stimulus, and keep their states (and the output spikes in the 
+		descision window) as a pool to start trials from (simulate/
+		simulate_batch, warm=True). Before the onset the inputs are silent,
+		so these states don't depend on the input pattern: every trial can
+		start from any of them, and only has to simulate the time from the
+		onset on. Trials drawing the same state differ by their noise from
+		then on. The pool is kept in self.warm_pool
+		- seed, first: the pool trials are trials first, .., first+n_pool-1
+		of the run with seed seed (see trial_seeds); use trials the run
+		doesn't simulate otherwise
+		"""
+		t0 = self.task.onset
+		rngs = [ engine.trial_streams(s)
+			for s in engine.trial_seeds(seed, n_pool, first) ]
+		compiled = self.compile(n_pool)
+		compiled.randomize_state([ rng['state'] for rng in rngs ])
+		compiled.trial_rngs = [ rng['noise'] for rng in rngs ]
+		detector = Decision_detector(self.task.n_out, self.window,
+			self.f_thres, dt=dt, n_trials=n_pool)
+		for t in np.arange(0, t0, dt):
+			compiled.time_step(t, dt, detector)
+		self.warm_pool = dict( t0=t0, dt=dt, n=n_pool,
+			state=compiled.snapshot(), detector=detector.snapshot() )
+		return self.warm_pool
+
+	def start_warm(self, compiled, detector, rngs, dt):
+		"""Start the trials of compiled (and their descision detector) from
+		states drawn from the warm-start pool, one per rng. Returns the
+		time to continue from (the onset of the stimulus)
+		"""
+		pool = self.warm_pool
+		if pool is None or pool['dt'] != dt:
+			raise ValueError("No warm-start pool for dt={} (see "
+				"make_warm_pool)".format(dt))
+		idx = np.array([ rng.randint(pool['n']) for rng in rngs ])
+		compiled.restore(pool['state'], idx)
+		detector.restore(pool['detector'], idx)
+		return pool['t0']
+
+	def checkpoint(self, path=None):
+		"""A checkpoint of the simulation in progress (a trial or a batch,
+		e.g. paused with stop=): the full dynamic state of the compiled 
+		network, including the Poisson spikes drawn ahead and the state of
+		their random streams, the output spikes in the descision window, the
+		input patterns and (of a batch) the results so far. Resuming from it
+		(see resume) gives exactly the trials as simulated without stopping.
+		It's a dict of arrays; with a path, it's (also) written to that
+		file, compressed (.npz), and the path is returned instead
+		"""
+		run = self.running
+		if run is None:
+			raise ValueError("No simulation in progress to checkpoint")
+		ckpt = dict( ('state.' + var, value)
+			for var, value in self.compiled.checkpoint().items() )
+		ckpt.update( ('detector.' + var, np.asarray(value))
+			for var, value in self.detector.snapshot().items() )
+		ckpt.update( kind=np.array(run['kind']), t=np.array(run['t']),
+			T=np.array(run['T']), dt=np.array(run['dt']),
+			idx=np.array(run['idx']), seed=np.array(self.seed) )
+		if run['kind'] == 'trial':
+			ckpt['patts'] = np.array([ self.patt_in ])
+		else:
+			# the results so far: descision and rt, -1 and nan if running
+			ckpt.update( patts=np.asarray(run['patts']), trials=run['trials'],
+				desc=np.array([ -1 if res is None else res[0]
+					for res in run['results'] ]),
+				rt=np.array([ np.nan if res is None else res[1]
+					for res in run['results'] ]) )
+		if path is None:
+			return ckpt
+		# write it next to the file first, so an interrupted write doesn't
+		# destroy the last checkpoint
+		with open(path + '.tmp', 'wb') as f:
+			np.savez_compressed(f, **ckpt)
+		os.rename(path + '.tmp', path)
+		return path
+
+	def restore_checkpoint(self, ckpt):
+		"""Set up the simulation of a checkpoint (see checkpoint) in this
+		network, which should be built from the same spec: the compiled 
+		network, the descision detector, the input patterns and (of a trial)
+		new recorders, that record from the time of the checkpoint on.
+		Returns the state of the run (see new_run)
+		"""
+		part = lambda prefix: dict( (key[len(prefix):], value)
+			for key, value in ckpt.items() if key.startswith(prefix) )
+		state = part('state.')
+		kind, dt = str(ckpt['kind']), float(ckpt['dt'])
+		t, T = float(ckpt['t']), float(ckpt['T'])
+		self.T, self.dt = T, dt
+		compiled = self.compile(state['V'].shape[0])
+		compiled.set_checkpoint(state)
+		compiled.profiler = self.profiler = None
+		self.detector = Decision_detector(self.task.n_out, self.window,
+			self.f_thres, dt=dt, n_trials=compiled.n_trials)
+		window = part('detector.')
+		window['pos'] = int(window['pos'])
+		self.detector.restore(window, np.arange(compiled.n_trials))
+		patts = ckpt['patts']
+		if kind == 'batch':
+			results = [ None if desc < 0 else (int(desc), rt)
+				for desc, rt in zip(ckpt['desc'], ckpt['rt']) ]
+			return self.new_run(kind, t, T, dt, idx=int(ckpt['idx']),
+				report=False, patts=patts, trials=ckpt['trials'],
+				results=results)
+		# the input pattern of the trial, and the correct answer to it:
+		self.patt_in = patts[0]
+		self.answer = int(self.task.answer(self.patt_in))
+		self.which_in = np.where(self.patt_in==1)[0]
+		self.set_inputs(self.task.input_rates(self.patt_in))
+		self.descision_made = None
+		self.V_rec = self.new_recorder(len(self.rec_nrn_idx), 'V', dt, t)
+		self.I_rec = self.new_recorder(len(self.rec_syn_idx), 'I', dt, t)
+		self.spike_mon = self.new_spike_monitor()
+		return self.new_run(kind, t, T, dt, report=False)
+
+	def resume(self, ckpt=None, T=None, stop=None, checkpoint=None,
+				checkpoint_every=1000, noise_seed=None, progress=False):
+		"""Continue a paused simulation (see simulate, stop), or one from a
+		checkpoint (see checkpoint) of a network of the same spec.
+		- ckpt 		: a checkpoint, or the file it was written to; None for
+					  the simulation paused in this network
+		- T 		: simulate until T, instead of the T it was started with
+		- stop, checkpoint, checkpoint_every : as in simulate
+		- noise_seed: fork the simulation: the Poisson spikes from here on
+					  come from new random streams, derived from this seed 
+					  (one per trial, see engine.trial_seeds). By default the
+					  trials go on exactly as they would have
+		Returns what simulate (or simulate_batch, for a batch) returns
+		"""
+		if ckpt is None:
+			run = self.running
+			if run is None:
+				raise ValueError("No paused simulation to resume")
+		else:
+			if isinstance(ckpt, basestring):
+				ckpt = read_checkpoint(ckpt)
+			run = self.restore_checkpoint(ckpt)
+		if noise_seed is not None:
+			self.compiled.trial_rngs = [ engine.trial_streams(s)['noise']
+				for s in engine.trial_seeds(noise_seed, self.compiled.n_trials) ]
+			self.compiled.pois_spikes = None
+		state = dict( (key, run[key]) for key in 
+			('report', 'patts', 'trials', 'results') if key in run )
+		self.running = self.new_run(run['kind'], run['t'], T or run['T'],
+			run['dt'], stop, checkpoint, checkpoint_every, idx=run['idx'],
+			**state)
+		self.T = self.running['T']
+		if run['kind'] == 'trial':
+			return self.run_trial(progress)
+		return self.run_batch()
+
+	def check_descision_made(self, t, dt, f_thres=None):
+		# descision when > f_thres spikes/ms (0.1, i.e. 10ms ISI) in window;
+		# f_thres defaults to that of the network (see __init__)
+		desc = self.detector.check(t, f_thres)[0]
+		if desc >= 0:
+			self.descision_made = ( int(desc), t )
+		return
+
+	def make_plots(self, trace=True, im=False, tmax=None, raster=False,
+					rates=False, bin=10.0):
+		"""Plot traces of recorded neurons and synapses, up to tmax ms.
+		Only the samples before tmax are read (from disk, if streamed there)
+		raster plots the spikes of all neurons, rates their firing rates in
+		bins of bin ms (see Spike_monitor.rates)
+		"""
 		tmax = self.T if tmax == None else tmax
-		tmax = int(tmax)
-		tt = np.linspace(0, tmax, tmax*self.dt)
+		if (raster or rates) and self.spike_mon is not None:
+			self.plot_spikes(raster, rates, tmax, bin)
+		if self.V_rec is None:
+			return
+		tt = self.V_rec.times()
+		n = np.searchsorted(tt, tmax, side='right')
+		tt = tt[:n]
 
 		if trace:
-			getname = lambda obj : obj.name
-			get_all_names = np.vectorize( getname)
-			if len(self.rec_nrns) > 0:
-				x = np.tile(tt, (self.Vv.shape[0],1 ) )
-				plt.plot(x.T, self.Vv[:,:tt.shape[0]].T )
-				plt.legend(get_all_names(self.rec_nrns))
+			if len(self.rec_nrn_idx) > 0:
+				plt.plot(tt, self.Vv[:,:n].T )
+				names = self.node_names()
+				plt.legend([ names[j] for j in self.rec_nrn_idx ])
 				plt.show()
 			# plot I
-			if len(self.rec_syns) > 0:
-				x = np.tile(tt, (self.Ii.shape[0],1 ) )
-				plt.plot(x.T, self.Ii[:,:tt.shape[0]].T )
-				plt.legend(get_all_names(self.rec_syns))
+			if len(self.rec_syn_idx) > 0:
+				plt.plot(tt, self.Ii[:,:n].T )
+				names = self.synapse_names()
+				plt.legend([ names[i] for i in self.rec_syn_idx ])
 				plt.show()				
 		if im:
-			if len(self.rec_nrns) > 0:
-				plt.imshow(self.Vv[:,:tmax], 
+			if len(self.rec_nrn_idx) > 0:
+				plt.imshow(self.Vv[:,:n], 
 							interpolation='none', aspect='auto')
 				plt.show()
-			if len(self.rec_syns) > 0:
-				plt.imshow(self.Ii[:,:tmax], 
+			if len(self.rec_syn_idx) > 0:
+				plt.imshow(self.Ii[:,:n], 
 							interpolation='none', aspect='auto')
 				plt.show()
 		return
 
+	def plot_spikes(self, raster=True, rates=True, tmax=None, bin=10.0):
+		"""Raster plot of all spikes, and/or firing rates over time"""
+		mon = self.spike_mon
+		tmax = self.T if tmax == None else tmax
+		keep = mon.times <= tmax
+		if raster:
+			plt.plot(mon.times[keep], mon.neurons[keep], '|', color='k')
+			out_idx = self.output_idx()
+			names = self.node_names()
+			plt.yticks(out_idx, [ names[j] for j in out_idx ])
+			plt.xlim(0, tmax)
+			plt.xlabel('t (ms)')
+			plt.show()
+		if rates:
+			edges, rate = mon.rates(bin, tmax)
+			plt.imshow(rate, interpolation='none', aspect='auto',
+				extent=(0, edges[-1], rate.shape[0], 0))
+			plt.colorbar(label='rate (Hz)')
+			plt.xlabel('t (ms)')
+			plt.ylabel('neuron')
+			plt.show()
+		return
+
 
 if __name__ == '__main__':
 	"""This code reads the network_spec file, and runs it (once)
@@ -1,58 +1,119 @@
 import numpy as np
 from scipy.stats import gaussian_kde
 import matplotlib.pyplot as plt
-import csv
+import multiprocessing
 
 # our network class:
 import network
+# columnar storage of the results
+from results import Results_table
+# what the networks are shown, and should answer
+import tasks
+# timing the phases of the time steps
+from profiling import Phase_profiler
 
 class Network_simulator(object):
 	"""This class  defines ways to run multiple networks with the same 
 	'spec-file' and turn them into readable results. Primarily, it allows:
 	-	to generate density plots of simulated RTs and decisions
-	-	to write such results to a csv file, one row per trial with the response
-	made and the simulated RT
+	-	to store such results (see results.Results_table), one row per trial
+	with the response made, the simulated RT, the input pattern and the seed
 	-	to read results from previous simulations and generate the density plots
 	again
+	Results can also be written to and read from csv files, one row per trial
+	with the response made and the simulated RT
 	"""
-	def __init__(self, nwspec="", T=2000, dt=1.0):
+	def __init__(self, nwspec="", T=2000, dt=1.0, seed=None, results_dir=None,
+					params=None, verbose=True, task=None, profile=False,
+					cache=True):
 		"""The constructor:
 		- nwspec is the network_specification_file
 		- T is the simulated time.
 		- dt is the timesteps taken
+		- seed for the random streams of the trials (None: random, the seed
+		drawn is kept in self.seed); trial i of the simulator gets its own
+		seed from it (see engine.trial_seeds), stored with its result, so it
+		can be replayed with network.Network(nwspec, seed=...)
+		- results_dir: store the results in this directory while simulating
+		(added to the results already there), instead of in memory
+		- params: values of the parameters of the spec (see Network)
+		- verbose: print the result of every trial
+		- task: what the networks are shown and should answer (see tasks.py;
+		default: tasks.Discrimination())
+		- profile: time the phases of the time steps of all trials, added up
+		in self.profiler (see profile_report, write_profile); not for trials
+		run in parallel
+		- cache: build the network only once (per process) for the trials run
+		one by one, and reuse it for the next trials (see Network, cache=);
+		specs with custom neuron/synapse types are built for every trial anyway
 		"""
 		# init 'object'
 		super(Network_simulator, self).__init__()
 		self.nwspec = nwspec
+		self.params = params
+		self.spec = network.spec_hash(nwspec, params)
+		self.verbose = verbose
 		self.T = T
 		self.dt = dt
-		# results field is intially empty
-		self.results = []
+		self.seed = network.engine.root_seed(seed)
+		# trials run so far; the next ones get the next trial seeds
+		self.n_run = 0
+		self.task = task if task is not None else tasks.Discrimination()
+		self.profiler = Phase_profiler() if profile else None
+		self.cache = cache
+		# results table is intially empty
+		self.table = Results_table(results_dir, n_in=self.task.n_in)
+
+	@property
+	def results(self):
+		"""(desc, rt) of every trial; desc is True (correct), False
+		(incorrect) or None (no descision made)
+		"""
+		return self.table.as_tuples()
+
+	def add_result(self, desc, rt, patt_in, seed=-1):
+		"""Store the result of a trial: output desc (None if none) at rt"""
+		if desc is not None:
+			# Compare result to the correct answer to the input
+			desc = bool(desc == self.task.answer(patt_in))
+		self.table.append(desc, rt, patt_in, seed, self.spec)
+		if self.verbose:
+			print (desc, rt)
+		return
 
 	def simulate(self, n_iter=10, trial_trace=False, 
-						trial_im=False, rug_plot=True):
+						trial_im=False, rug_plot=True, batch_size=None, n_jobs=None):
 		"""Run the network n_iter times, and store the results
 		- n_iter: number of iterations, int > 0
 		- trial_trace: bool; should traceplots of the trial be generated?
 		- trial_im: bool; should spike image plots be generated?
 		- rug_plot: should we generate a rug-plot (w/ density lines) of the 
 		current results?
+		- batch_size: if given, simulate the trials in batches of this size
+		at once (see Network.simulate_batch); there are no plots per trial then
+		- n_jobs: if > 1, run the trials in parallel on a pool of n_jobs 
+		processes (see simulate_parallel); no plots per trial either
 		"""
-		
-		# Run the specified amount of iterations:
-		for it in xrange(n_iter):
+		if batch_size:
+			self.simulate_batched(n_iter, batch_size)
+		elif n_jobs and n_jobs > 1:
+			self.simulate_parallel(n_iter, n_jobs)
+		if batch_size or (n_jobs and n_jobs > 1):
+			if rug_plot:
+				self.make_rug_plot(res_choice = True)
+			return
+
+		# Run the specified amount of iterations, each with its own seed:
+		seeds = network.engine.trial_seeds(self.seed, n_iter, self.n_run)
+		self.n_run += n_iter
+		for seed in seeds:
 			# setup network with the nwspec:
-			net = network.Network(network_spec=self.nwspec)
+			net = network.Network(network_spec=self.nwspec, params=self.params,
+				cache=self.cache, seed=seed, task=self.task)
 			# get desc, rt from simulation
-			desc, rt = net.simulate(T=self.T, dt=self.dt )
-			
-			# transform desc into None,True,False for correctness
-			if desc is not None:
-				# Compare result to net.which_in
-				self.results.append( (desc==net.which_in, rt) )
-			else:
-				self.results.append( (None, rt) )
-			print self.results[-1]
+			desc, rt = net.simulate(T=self.T, dt=self.dt,
+				profile=self.profiler)
+			self.add_result(desc, rt, net.patt_in, seed)
 
 			# plotting:
 			if trial_trace or trial_im:
@@ -63,6 +124,72 @@ class Network_simulator(object):
 			self.make_rug_plot(res_choice = True)
 		return
 
+	def simulate_batched(self, n_iter=10, batch_size=100, reuse=None,
+							all_patterns=False, warm=0):
+		"""Run n_iter trials in batches of batch_size, and store the results.
+		The network is only built and compiled once; every trial gets its own
+		random initial state and input pattern.
+		- reuse: a Compiled_network of the same topology, to reuse the 
+		structure of (see Network.compile)
+		- all_patterns: instead of drawing the input patterns, go through all
+		patterns of the task in turn (e.g. all four XOR patterns in a batch)
+		- warm: if > 0, simulate a pool of warm states of this size first,
+		and start every trial at the onset of the stimulus from one of them
+		(see Network.make_warm_pool)
+		Returns the compiled network
+		"""
+		net = network.Network(network_spec=self.nwspec, params=self.params,
+			task=self.task)
+		if all_patterns:
+			patterns = self.task.patterns()
+		# the batches are consecutive trials of the run, and the warm-start
+		# pool the trials after them:
+		first = self.n_run
+		self.n_run += n_iter + warm
+		if warm:
+			net.make_warm_pool(warm, self.dt, self.seed, first + n_iter)
+			reuse = net.compiled
+		for it in xrange(0, n_iter, batch_size):
+			n_trials = min(batch_size, n_iter - it)
+			patts = None
+			if all_patterns:
+				patts = patterns[ np.arange(it, it + n_trials) % len(patterns) ]
+			results, patts = net.simulate_batch(n_trials, 
+				T=self.T, dt=self.dt, seed=self.seed, reuse=reuse, patts=patts,
+				profile=self.profiler, warm=bool(warm), first=first + it)
+			reuse = net.compiled
+			# the seeds of the trials, as drawn in simulate_batch
+			trial_seeds = network.engine.trial_seeds(self.seed, n_trials,
+				first + it)
+			for (desc, rt), patt_in, trial_seed in zip(results, patts,
+														trial_seeds):
+				self.add_result(desc, rt, patt_in, trial_seed)
+		return net.compiled
+
+	def simulate_parallel(self, n_iter=10, n_jobs=None):
+		"""Run n_iter trials on a pool of n_jobs worker processes (default: 
+		one per cpu), and store the results. Useful when the trials can't be
+		batched, e.g. for specs with custom neuron types.
+		Every trial gets its own seed, derived from self.seed, independent of
+		the worker it runs on; results come back in order
+		"""
+		seeds = network.engine.trial_seeds(self.seed, n_iter, self.n_run)
+		self.n_run += n_iter
+		jobs = [ (self.nwspec, self.T, self.dt, seed, self.params, self.task,
+			self.cache) for seed in seeds ]
+		pool = multiprocessing.Pool(n_jobs)
+		try:
+			for (desc, rt, patt_in), seed in zip(pool.imap(_run_trial, jobs),
+												   seeds):
+				self.add_result(desc, rt, patt_in, seed)
+			pool.close()
+		except:
+			pool.terminate()
+			raise
+		finally:
+			pool.join()
+		return
+
 	def make_rug_plot(self, res_choice = None):
 		"""Generate a rug-plot, plotting the resulting RTs of 
 		either all responses, or correct/incorrect selectively
@@ -70,7 +197,10 @@ class Network_simulator(object):
 			True for correct responses 
 			False for incorrect responses
 			None for both responses 
+		For many trials, the densities and rugs are drawn from (at most) 
+		max_rug RTs, evenly spread over the results
 		"""
+		max_rug = 10000
 		
 		if res_choice is None:
 			res_choice = [True, False]
@@ -80,20 +210,21 @@ class Network_simulator(object):
 			plt.subplot(111)
 
 		# plot results for chosen res_choice
-		none_res = filter(lambda x: x[0] is None, self.results)
-		descT = filter(lambda x: x[0] == True, self.results)
-		descF = filter(lambda x: x[0] == False, self.results)
+		desc = np.asarray(self.table.column('desc'))
+		all_rts = np.asarray(self.table.column('rt'))
+		n_res = len(desc)
+		none_res = all_rts[desc == -1]
+		descT = all_rts[desc == 1]
+		descF = all_rts[desc == 0]
 
 		# get range of the values, for xlim()
-		vals = []
-		if descT: vals += zip(*descT)[1]
-		if descF: vals += zip(*descF)[1]
-		min_,max_ = (min(vals)-5.5, max(vals)+5.5 )
-		# vals = zip(*descT)[1] +  zip(*descF)[1]
+		vals = all_rts[desc >= 0]
+		min_,max_ = (vals.min()-5.5, vals.max()+5.5 )
+		thin = lambda rts: rts[::len(rts) // max_rug + 1]
 		if True in res_choice:
-			if descT:
+			if len(descT):
 				ax = plt.gca()
-				rts = zip(*descT)[1]
+				rts = thin(descT)
 				ax.hold(True)
 				if len(rts) > 2:
 					kernel = gaussian_kde(rts)
@@ -104,14 +235,14 @@ class Network_simulator(object):
 				ax.hold(False)
 
 			print "Correct descisions: {:.2f}%".format(float(len(descT)) / 
-													  len(self.results)*100)
+													  n_res*100)
 		if False in res_choice:
-			if descF:
+			if len(descF):
 				if len(res_choice) == 2:
 					ax = plt.subplot(122)
 				else:
 					ax = plt.gca()
-				rts = zip(*descF)[1]
+				rts = thin(descF)
 				ax.hold(True)
 				if len(rts) > 2:
 					kernel = gaussian_kde(rts)
@@ -121,39 +252,72 @@ class Network_simulator(object):
 				ax.set_xlim( min_,max_ )
 				ax.hold(False)
 			print "Incorrect descisions: {:.2f}%".format(float(len(descF)) / 
-														  len(self.results) * 100)
+														  n_res * 100)
 		
 		print "No descision made: {:.2f}%".format(float(len(none_res)) / 
-												len(self.results)*100)
+												n_res*100)
 		plt.show()
 		return
 
+	def profile_report(self):
+		"""Print where the time of the trials went, per phase of a time step
+		(if profiling, see __init__)
+		"""
+		if self.profiler is not None:
+			self.profiler.report()
+		return
+
+	def write_profile(self, fname):
+		"""Write the time per phase to a csv file (if profiling)"""
+		if self.profiler is not None:
+			self.profiler.write_csv(fname)
+		return
+
 	def write_res(self, fname):
-		with open(fname,'w') as f:
-			writer = csv.writer(f)
-			# write header?
-			for desc,rt in self.results:
-				if desc is not None:
-					writer.writerow( [bool(desc), rt] )
-				else:
-					writer.writerow( ["NoResp", rt] )
+		"""Write the results to a csv file: one row per trial, with the
+		descision (True/False/NoResp) and the RT
+		"""
+		self.table.write_csv(fname)
 		return
 
 	def read_res(self,fname):
-		with open(fname, 'r') as f:
-			reader = csv.reader(f)
-			for row in reader:
-				desc,rt = row
-				# print desc, rt
-				# self.results.append( (None,rt) )
-				if desc not in ['True', 'False']:
-					self.results.append( (None, rt) )
-				else:
-					self.results.append( (desc=='True', float(rt)) )
+		"""Add the results in a csv file written by write_res"""
+		self.table.read_csv(fname)
+		return
+
+	def save_results(self, directory):
+		"""Store the results in directory, as a Results_table (added to what
+		is already there)
+		"""
+		table = Results_table(directory, n_in=self.task.n_in)
+		table.extend(self.table)
+		table.close()
+		return
+
+	def load_results(self, directory):
+		"""Use the results stored in directory (memory mapped); the results
+		of further simulations are added to them
+		"""
+		self.table.close()
+		self.table = Results_table(directory)
 		return
 
 
 
+def _run_trial(job):
+	"""Run a single trial in a worker process (see simulate_parallel)
+	- job: (nwspec, T, dt, seed, params, task, cache)
+	Returns (desc, rt, patt_in), as passed to Network_simulator.add_result
+	"""
+	nwspec, T, dt, seed, params, task, cache = job
+	# everything random in the trial comes from the streams of its seed,
+	# the same whether this worker built the network or had it cached:
+	net = network.Network(network_spec=nwspec, params=params, cache=cache,
+		seed=seed, task=task)
+	desc, rt = net.simulate(T=T, dt=dt, progress=False)
+	return (desc, rt, net.patt_in)
+
+
 """Main (for testing)
 """
 if __name__ == '__main__':
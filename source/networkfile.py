@@ -104,15 +104,19 @@ class Synapse(object)
 # Child classes: Only child-specific implementations documented:
 # Neuronal
 class Neuronal_synapse(Synapse):
-	def __init__(self, w = 0.1, pre = None, post = None):
+	def __init__(self, w = 0.1, pre = None, post = None, exact = False):
 		> Initialize with weight w,  with one specific presynaptic neuron, 
 			and a (list of) postsynaptic neuron(s).
+		> exact = True: the current decays exactly (exponentially) between 
+			spikes, instead of by a forward-Euler step every time step
 -  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  -
 # Poisson:
 class Poisson_synapse(Synapse):
-	def __init__(self, firing_rate = 0.5, w = 0.1, onset = 0, offset = None)
+	def __init__(self, firing_rate = 0.5, w = 0.1, onset = 0, offset = None,
+					exact = False)
 		> initialize with certain firing rate (spikes/ms), a certain weight,
 			onset of stimulation (ms) and offset (if None, it stays on)
+		> exact as with Neuronal_synapse
 -  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  -
 class Continuous_synapse(Synapse):
 	def __init__(self, w = 0.1, onset = 0, offset = None):
@@ -129,7 +133,8 @@ Neurons can be of two types:
 class Neuron(object):
 	def __init__(self, syn_in = []):
 		> Initialize the neuron, possibly with one or several input synapses.
-			NB: neurons _always_ have one Poisson_synapse delivering BG-noise
+			NB: neurons _always_ get background noise (Poisson spikes at bg_rate,
+			weighted bg_w)
 	
 	def set_record(self, name = '', record = True)
 		> As in Synapse.set_record (but records V not I)
@@ -140,12 +145,16 @@ class Neuron(object):
 -  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  -
 # LIF_Neuron
 class LIF_Neuron
-	--(no LIF-specific methods)
+	def __init__(self, syn_in = [], method = 'euler'):
+		> method is the integration scheme: 'euler' or 'exp' (exponential
+			Euler, exact for input that is constant during a time step)
 
 -  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  -
 # Izh_Neuron:
 class Izh_Neuron(Neuron):
-	def __init__(self, syn_in = [], izh_type = 'A'):
+	def __init__(self, syn_in = [], izh_type = 'A', method = 'euler'):
 		> Initialize as specific Izhikevitch-type. Types A-F are supported.
+		> method is the integration scheme: 'euler', 'halfstep' (as in 
+			Izhikevich 2003), 'rk2' or 'rk4'
 -  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  -
 """
@@ -1,6 +1,147 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from synapses import Poisson_synapse
+from integrators import izh_integrators, lif_integrators
+
+class Population(object):
+	"""Struct-of-arrays storage for the state of many neurons of one type.
+	Neurons are lightweight handles (with __slots__, no __dict__) that only 
+	know their population and their index in it; their state variables 
+	(e.g. LIF_Neuron.Vm) are views into the population's arrays. This keeps 
+	big networks small, and lets the engines gather all state at once.
+	"""
+	def __init__(self, fields):
+		"""fields: dict of state variable name -> dtype"""
+		super(Population, self).__init__()
+		self.n = 0
+		self.arrays = dict( (field, np.zeros(16, dtype=tp))
+			for field, tp in fields.items() )
+		return
+
+	def add(self, **state):
+		"""Add a neuron with the given state; returns its index"""
+		if self.n == len(self.arrays.values()[0]):
+			# full: double the size of all arrays
+			for field, arr in self.arrays.items():
+				self.arrays[field] = np.concatenate((arr, np.zeros_like(arr)))
+		for field, value in state.items():
+			self.arrays[field][self.n] = value
+		self.n += 1
+		return self.n - 1
+
+# the populations new neurons are added to, per neuron type:
+_populations = {}
+
+def new_populations():
+	"""Start new populations: neurons made after this get their own arrays 
+	(those of earlier neurons are freed with them). Network does this before
+	building every network.
+	"""
+	_populations.clear()
+	return
+
+def _population(kind, fields):
+	if kind not in _populations:
+		_populations[kind] = Population(fields)
+	return _populations[kind]
+
+def _state(field):
+	"""A state variable of a neuron, stored in its population's arrays"""
+	# (item/itemset give and take python scalars, which is much faster)
+	def get(self):
+		return self._pop.arrays[field].item(self._idx)
+	def set(self, value):
+		self._pop.arrays[field].itemset(self._idx, value)
+	return property(get, set)
+
+def population_groups(nrns):
+	"""The neurons nrns by population: a list of (population, indices in
+	its arrays, positions in nrns), one per population
+	"""
+	pops, groups = {}, []
+	for k, nrn in enumerate(nrns):
+		if id(nrn._pop) not in pops:
+			pops[id(nrn._pop)] = len(groups)
+			groups.append( (nrn._pop, [], []) )
+		_, idx, pos = groups[pops[id(nrn._pop)]]
+		idx.append(nrn._idx)
+		pos.append(k)
+	return [ (pop, np.array(idx, dtype=int), np.array(pos, dtype=int))
+		for pop, idx, pos in groups ]
+
+def gather_state(nrns, field):
+	"""The state variable 'field' of all neurons nrns, as one array"""
+	groups = population_groups(nrns)
+	if len(groups) == 1:
+		pop, idx, _ = groups[0]
+		return pop.arrays[field][idx]
+	values = np.zeros(len(nrns), dtype=groups[0][0].arrays[field].dtype
+		if groups else float)
+	for pop, idx, pos in groups:
+		values[pos] = pop.arrays[field][idx]
+	return values
+
+def scatter_state(nrns, field, values):
+	"""Set the state variable 'field' of all neurons nrns, from an array"""
+	values = np.broadcast_to(values, (len(nrns),))
+	for pop, idx, pos in population_groups(nrns):
+		pop.arrays[field][idx] = values[pos]
+	return
+
+def randomize_state(nrns, rng=np.random):
+	"""Draw a new random initial state for the LIF and Izh neurons in nrns,
+	as their constructors do, for all neurons of a type at once
+	(in the same order as engine.Compiled_network.randomize_state, so the
+	same rng gives the same state); the background noise of all of them
+	starts silent
+	"""
+	lif = [ nrn for nrn in nrns if isinstance(nrn, LIF_Neuron) ]
+	izh = [ nrn for nrn in nrns if isinstance(nrn, Izh_Neuron) ]
+	abcds = np.array([ nrn.abcd_s for nrn in izh ], dtype=float)
+	V = rng.random_sample(len(izh)) * abcds[:, 2] if izh else None
+	if lif:
+		V_rest = np.asarray(gather_state(lif, 'V_rest'), dtype=float)
+		th_V = np.asarray(gather_state(lif, 'th_V'), dtype=float)
+		scatter_state(lif, 't_r', rng.randint(0, 9, len(lif)))
+		scatter_state(lif, 'Vm', V_rest + rng.random_sample(len(lif)) * (
+			th_V - V_rest))
+	if izh:
+		scatter_state(izh, 'V', V)
+		scatter_state(izh, 'U', abcds[:, 1] * V)
+		scatter_state(izh, 'spiking', np.zeros(len(izh), dtype=bool))
+	scatter_state(nrns, 'bg_I', 0.0)
+	return
+
+class Background_noise(object):
+	"""Steps the background noise (see Neuron) of the neurons nrns, at once
+	per population: spikes at bg_rate into bg_I, which decays as the current
+	of a Synapse (forward-Euler, with tau)
+	- trains 	: the synapses.Spike_trains the spikes are drawn in, the
+				  neurons in its columns first, first+1, ..; without it (or
+				  after its end) they are drawn from np.random
+	"""
+	tau = 1.8
+
+	def __init__(self, nrns, trains=None, first=0):
+		super(Background_noise, self).__init__()
+		self.nrns = nrns
+		self.groups = population_groups(nrns)
+		self.trains = trains
+		self.cols = first + np.arange(len(nrns))
+		return
+
+	def step(self, t, dt=1.0):
+		"""Let bg_I decay until t, and add the spikes at t"""
+		k = int(round(t / dt))
+		trains = self.trains
+		if trains is not None and dt == trains.dt and k < trains.n_steps:
+			spikes = trains.row(k)[self.cols]
+		else:
+			spikes = np.random.sample(len(self.nrns)) < (
+				gather_state(self.nrns, 'bg_rate') * dt)
+		for pop, idx, pos in self.groups:
+			I = pop.arrays['bg_I']
+			I[idx] += dt * (-I[idx] / self.tau) + spikes[pos]
+		return
 
 class Neuron(object):
 	"""THIS IS A TEMPLATE CLASS ONLY 
@@ -9,12 +150,30 @@ class Neuron(object):
 	- step() : what to do every timestep
 	- spike():
 	"""
-	def __init__(self, syn_in=[]):
+	__slots__ = ('record', 'name', 'syn_in', 'method', '_pop', '_idx')
+
+	# Every neuron gets background noise: Poisson spikes at bg_rate (per ms)
+	# into a current bg_I, that decays as that of a Synapse, weighted bg_w
+	# (see Background_noise). Not a synapse per neuron: per population, one
+	# array of rates and one of weights (with the defaults in _bg)
+	_bg = dict(bg_rate=0.25, bg_w=0.30)
+	bg_rate = _state('bg_rate')
+	bg_w 	= _state('bg_w')
+	bg_I 	= _state('bg_I')
+
+	# the population of the neurons of this type, and their state variables
+	_kind = 'Neuron'
+	_fields = dict(bg_I=float, **dict.fromkeys(_bg, float))
+
+	def __init__(self, syn_in=[], **state):
+		"""- state : the initial state, of the fields of the population"""
 		super(Neuron, self).__init__()
 		self.record = False
 		self.name = ''
-		# input synapses; always one bg-noise input
-		self.syn_in = syn_in + [Poisson_synapse(w=0.30, firing_rate=0.25)]
+		# input synapses, in the order they were added
+		self.syn_in = list(syn_in)
+		self._pop = _population(self._kind, self._fields)
+		self._idx = self._pop.add(**dict(self._bg, **state))
 
 	def set_record(self, name='', record=True):
 		"""Set the 'record-status' of this neuron:
@@ -31,21 +190,23 @@ class Neuron(object):
 		"""Add synapse(s) to the input of the neuron
 		syn 	: either a synapse, or a list of synapses
 					syn should be of the 
+		A synapse added twice counts once in a Network: doubles are dropped
+		when it's built (see Network.build)
 		"""
 		if type(syn) != list:
 			syn = [syn]
-		self.syn_in += list(syn)
-		self.syn_in = list(set(self.syn_in))
+		self.syn_in.extend(syn)
 		return
 
 	def I_in(self):
 		""" Summarizes all input from all synapses or injected currents that are
 		Affecting this neuron, and return as one value
 		"""
-		# By default: Sum the input coming in from each synapse
-		get_all_input = np.vectorize( lambda syn: syn.I_out() )
+		# By default: Sum the input coming in from each synapse, and the
+		# background noise
 		try:
-			return float( np.sum( get_all_input( self.syn_in ) ) )
+			return float( sum( syn.I_out() for syn in self.syn_in ) ) + \
+				self.bg_w * self.bg_I
 		except Exception, e:
 			print ("ERROR: could not get input from all synapses! \n" + 
 				"\t Are all valid synapses from synapses.py, and do they" +
@@ -64,29 +225,47 @@ class Neuron(object):
 
 class LIF_Neuron(Neuron):
 	"""Implementation of the Leaky Integrate-and-Fire Neuron"""
-	def __init__(self, syn_in=[]):
-		super(LIF_Neuron, self).__init__(syn_in)
-		
+	__slots__ = ()
 
-		"""
-		...Though the following params make the neuron spike at 30mV, rest at -65mV 
-		this is to make the neuron's behavior close to Izh-neurons
-		 	Note that the only difference is in the actual values for Vm; 
-		through to the scaling constant -- you can compare them!
-		"""
-		# Behavior params:
-		self.tau_m	= 10.0 # effective membrane time constant
-		self.tau_r 	= 4.0  # refractory period (ms)
-		self.V_rest = -65  # resting potential
-		self.th_V 	= -55
-		self.dV_s  	= 30 - self.V_rest # delta-V with a spike
-		self.S 		= 1.5 # input 'scaling'
+	"""
+	...Though the following params make the neuron spike at 30mV, rest at -65mV 
+	this is to make the neuron's behavior close to Izh-neurons
+	 	Note that the only difference is in the actual values for Vm; 
+	through to the scaling constant -- you can compare them!
+	"""
+	# Behavior params; the defaults of every LIF neuron, which can be set
+	# per neuron (they're kept in the population arrays, like the state):
+	_params = dict(
+		tau_m	= 10.0, # effective membrane time constant
+		tau_r 	= 4.0,  # refractory period (ms)
+		V_rest  = -65,  # resting potential
+		th_V 	= -55,
+		dV_s  	= 30 - (-65), # delta-V with a spike
+		S 		= 1.5 ) # input 'scaling'
+	tau_m 	= _state('tau_m')
+	tau_r 	= _state('tau_r')
+	V_rest 	= _state('V_rest')
+	th_V 	= _state('th_V')
+	dV_s 	= _state('dV_s')
+	S 		= _state('S')
 
+	# State: in the population arrays
+	_kind = 'LIF'
+	_fields = dict(Neuron._fields, Vm=float, t_r=float,
+		**dict.fromkeys(_params, float))
+	Vm  = _state('Vm')
+	t_r = _state('t_r')
+
+	def __init__(self, syn_in=[], method='euler'):
 		# random initial state:
 		# initial refractory period, random int between 0 and 8
-		self.t_r = int(np.random.random_integers(0, 8, 1))
+		t_r = np.random.randint(0, 9)
 		# initial membrane potentiol, random float between th_V and V_rest 
-		self.Vm = self.V_rest + np.random.sample(1) * (self.th_V - self.V_rest)
+		par = self._params
+		Vm = par['V_rest'] + np.random.sample() * (par['th_V'] - par['V_rest'])
+		super(LIF_Neuron, self).__init__(syn_in, Vm=Vm, t_r=t_r, **par)
+		# integration scheme, see integrators.lif_integrators
+		self.method = method
 		return
 
 	def get_V(self):
@@ -104,7 +283,8 @@ class LIF_Neuron(Neuron):
 		I = self.I_in() * self.S
 
 		# Update Vm; the following corresponds to [v' = I + a - bv]
-		self.Vm += dt * (I - (self.Vm - self.V_rest) / self.tau_m  )
+		self.Vm = lif_integrators[self.method](
+			self.Vm, I, self.V_rest, self.tau_m, dt)
 
 		# Behavior in a spike:
 		# 	Note that adding [dV_s] doesn't have any functionality here:
@@ -121,19 +301,44 @@ class LIF_Neuron(Neuron):
 
 class Izh_Neuron(Neuron):
 	"""Generic class implementing different types of Izhikevitch-neurons"""
-	def __init__(self, syn_in=[], izh_type='A'):
-		super(Izh_Neuron, self).__init__(syn_in)
+	__slots__ = ('izh_type', '_abcd_s')
+
+	# State: in the population arrays
+	_kind = 'Izh'
+	_fields = dict(Neuron._fields, V=float, U=float, spiking=bool)
+	V 		= _state('V')
+	U 		= _state('U')
+	spiking = _state('spiking')
 
-		# parameters, abcd, and s -> scaling of the input
-		self.abcd_s = _izh_params[izh_type]
+	def __init__(self, syn_in=[], izh_type='A', method='euler'):
+		# parameters, abcd, and s -> scaling of the input; stored once per
+		# type, in _izh_params
+		if izh_type not in _izh_params:
+			raise ValueError("Unknown Izhikevich type: {}".format(izh_type))
+		self.izh_type = izh_type
+		self._abcd_s = None
 		a,b,c,d, s = self.abcd_s
 
 		# State: V_0 and U_0
-		self.V = float( np.random.sample(1) ) * c # anywhere between c and 0
-		self.U = b * self.V
-		self.spiking = False
+		V = float( np.random.sample(1) ) * c # anywhere between c and 0
+		super(Izh_Neuron, self).__init__(syn_in, V=V, U=b * V, spiking=False)
+		# integration scheme, see integrators.izh_integrators
+		self.method = method
 		return
 
+	@property
+	def abcd_s(self):
+		"""The parameters of this neuron: those of its type (in _izh_params),
+		unless they were set for this neuron
+		"""
+		if self._abcd_s is not None:
+			return self._abcd_s
+		return _izh_params[self.izh_type]
+
+	@abcd_s.setter
+	def abcd_s(self, abcd_s):
+		self._abcd_s = tuple(abcd_s)
+
 	def get_V(self):
 		return self.V if not self.spiking  else 30.0
 
@@ -141,21 +346,21 @@ class Izh_Neuron(Neuron):
 		# Unpack parameters:
 		a,b,c,d,s = self.abcd_s
 		I 	 = self.I_in() * s
-		V, U = self.V, self.U
+		# (as numpy floats, which overflow to inf rather than raise)
+		V, U = np.float64(self.V), np.float64(self.U)
 
-		# update; Izh 2003 rules:
-		V += dt * ( 0.04 * V**2 + 5 * V + 140 - U + I )
-		U += dt * ( a * ( b * V - U ) )
+		# update; Izh 2003 rules, with the chosen integration scheme:
+		V, U = izh_integrators[self.method](V, U, I, a, b, dt)
 
-		# If spike, reset:
-		if V >= 30:
+		# If spike (or overflow), reset:
+		if not V < 30:
 			self.spiking = True
 			# reset
 			self.V = c
-			self.U = U + d
+			self.U = float(U + d)
 			return
 		self.spiking = False
-		self.V = V; self.U = U
+		self.V = float(V); self.U = float(U)
 
 	def spike(self):
 		return self.spiking
@@ -0,0 +1,63 @@
+import sys
+import csv
+from timeit import default_timer as timer
+
+class Phase_profiler(object):
+	"""Accumulates the wall time and number of calls of the phases of a time
+	step (see Network.simulate, profile=True). Phases are timed as laps:
+	start() starts the clock, and lap(phase) adds the time since the last
+	start/lap to phase. The code being profiled only checks whether there is
+	a profiler, so there is (next to) no cost when there isn't.
+	"""
+	def __init__(self):
+		super(Phase_profiler, self).__init__()
+		self.time = {} 		# seconds per phase
+		self.calls = {} 	# number of laps per phase
+		self.last = timer()
+
+	def start(self):
+		"""(Re)start the clock; the time until the next lap is counted"""
+		self.last = timer()
+		return
+
+	def lap(self, phase):
+		"""Add the time since the last start/lap to phase"""
+		now = timer()
+		self.time[phase] = self.time.get(phase, 0.0) + now - self.last
+		self.calls[phase] = self.calls.get(phase, 0) + 1
+		self.last = now
+		return
+
+	def merge(self, other):
+		"""Add the times and calls of another Phase_profiler"""
+		for phase, t in other.time.items():
+			self.time[phase] = self.time.get(phase, 0.0) + t
+			self.calls[phase] = self.calls.get(phase, 0) + other.calls[phase]
+		return
+
+	def rows(self):
+		"""(phase, seconds, calls, us per call, fraction of the total) for
+		every phase, the most expensive first
+		"""
+		total = sum(self.time.values()) or 1.0
+		return [ (phase, t, self.calls[phase], 1e6 * t / self.calls[phase],
+			t / total) for phase, t in sorted(self.time.items(),
+				key=lambda item: -item[1]) ]
+
+	def report(self, out=sys.stdout):
+		"""Print the time spent per phase"""
+		out.write("{:<32} {:>9} {:>9} {:>10} {:>6}\n".format(
+			"phase", "total (s)", "calls", "us/call", "%"))
+		for phase, t, calls, per_call, frac in self.rows():
+			out.write("{:<32} {:9.3f} {:9d} {:10.2f} {:6.1f}\n".format(
+				phase, t, calls, per_call, 100 * frac))
+		return
+
+	def write_csv(self, fname):
+		"""Write the rows (see rows()) to a csv file"""
+		with open(fname, 'w') as f:
+			writer = csv.writer(f)
+			writer.writerow([ 'phase', 'seconds', 'calls', 'us_per_call',
+				'fraction' ])
+			writer.writerows(self.rows())
+		return
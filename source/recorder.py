@@ -0,0 +1,215 @@
+import os
+import numpy as np
+
+class Trace_recorder(object):
+	"""Records traces (the V of some neurons, the I of some synapses) during a
+	simulation, one sample per time step, without allocating T/dt samples up
+	front. Samples are collected in a buffer of chunk samples; a full buffer
+	is appended to an .npy file (if a path is given) or kept in memory.
+	The file is time-major (n_samples x n_rows), so appending a chunk is one
+	contiguous write, and can be read lazily with np.load(path, mmap_mode='r').
+		The header of the file is written with a placeholder shape first, and
+	rewritten with the real number of samples in close(); its size is fixed,
+	so the data never has to be moved. Files written this way can be opened
+	again to append more samples (append=True).
+	"""
+	header_len = 128
+
+	def __init__(self, n_rows, path=None, dtype=np.float64, every=1,
+					chunk=1024, dt=1.0, append=False, t0=0.0):
+		"""
+		- n_rows 	: number of traces (neurons/synapses) recorded; None to
+					  take it from the file when appending
+		- path 		: .npy file to stream to, or None to keep it in memory
+		- dtype 	: dtype the samples are stored in (e.g. np.float32)
+		- every 	: only store every every-th time step (downsampling)
+		- chunk 	: number of samples buffered before they are written
+		- dt 		: the time step of the simulation
+		- append 	: add to the samples already in path, if it exists
+		- t0 		: the time of the first sample
+		"""
+		super(Trace_recorder, self).__init__()
+		self.n_rows = n_rows
+		self.path = path
+		self.dtype = np.dtype(dtype)
+		self.every = max(1, int(every))
+		self.dt = dt
+		self.t0 = t0
+		self.n_samples = 0 	# samples recorded in total
+		self.chunks = [] 	# full chunks, if kept in memory
+		self.file = None
+		if path is not None and append and os.path.exists(path):
+			self.open_existing()
+		elif path is not None:
+			self.file = open(path, 'wb')
+			self.write_header()
+		self.buffer = np.zeros((max(1, int(chunk)), self.n_rows),
+			dtype=self.dtype)
+		self.n_buf = 0 		# samples in the buffer
+		return
+
+	def open_existing(self):
+		"""Open the file in path to append to it"""
+		self.file = open(self.path, 'r+b')
+		if np.lib.format.read_magic(self.file) != (1, 0):
+			raise ValueError("{} was not written by a Trace_recorder".format(
+				self.path))
+		shape, fortran, dtype = np.lib.format.read_array_header_1_0(self.file)
+		if self.file.tell() != self.header_len or fortran or len(shape) != 2:
+			raise ValueError("{} was not written by a Trace_recorder".format(
+				self.path))
+		if self.n_rows is None:
+			self.n_rows = shape[1]
+		if dtype != self.dtype or shape[1] != self.n_rows:
+			raise ValueError("Can't append {} x {} to {}, with {} x {}".format(
+				self.dtype, self.n_rows, self.path, dtype, shape[1]))
+		self.n_samples = shape[0]
+		self.file.seek(0, os.SEEK_END)
+		return
+
+	def write_header(self):
+		"""(Re)write the .npy header, for the samples recorded so far"""
+		header = repr({ 'descr': np.lib.format.dtype_to_descr(self.dtype),
+			'fortran_order': False, 'shape': (self.n_samples, self.n_rows) })
+		# magic string (6), version (2) and header length (2) come first
+		pad = self.header_len - 10 - len(header) - 1
+		if pad < 0:
+			raise ValueError("Header too long for {}".format(self.path))
+		self.file.seek(0)
+		self.file.write(np.lib.format.magic(1, 0))
+		self.file.write(np.array(self.header_len - 10, '<u2').tostring())
+		self.file.write(header + " " * pad + "\n")
+		self.file.seek(0, os.SEEK_END)
+		return
+
+	def due(self, idx):
+		"""Is time step idx stored? (if not, it needn't even be read out)"""
+		return idx % self.every == 0
+
+	def append(self, values):
+		"""Record the values of one (stored) time step"""
+		self.buffer[self.n_buf] = values
+		self.n_buf += 1
+		self.n_samples += 1
+		if self.n_buf == self.buffer.shape[0]:
+			self.flush()
+		return
+
+	def extend(self, values):
+		"""Record the values of many (stored) time steps: n x n_rows"""
+		self.flush()
+		values = np.asarray(values, dtype=self.dtype).reshape(-1, self.n_rows)
+		if self.file is not None:
+			self.file.write(values.tostring())
+		else:
+			self.chunks.append(values.copy())
+		self.n_samples += len(values)
+		return
+
+	def flush(self):
+		"""Move the buffered samples to the file (or the in-memory chunks)"""
+		if self.n_buf == 0:
+			return
+		data = self.buffer[:self.n_buf]
+		if self.file is not None:
+			self.file.write(data.tostring())
+		else:
+			self.chunks.append(data.copy())
+		self.n_buf = 0
+		return
+
+	def close(self):
+		"""Flush everything, and fix the shape in the header of the file"""
+		self.flush()
+		if self.file is not None and not self.file.closed:
+			self.write_header()
+			self.file.close()
+		return
+
+	def read(self):
+		"""All samples recorded so far, as an n_rows x n_samples array.
+		Read from disk lazily (memory mapped) when streamed to a file.
+		"""
+		if self.file is not None:
+			if not self.file.closed:
+				self.flush()
+				self.write_header()
+				self.file.flush()
+			if self.n_samples == 0:
+				return np.zeros((self.n_rows, 0), dtype=self.dtype)
+			return np.load(self.path, mmap_mode='r').T
+		data = self.chunks + [ self.buffer[:self.n_buf] ]
+		return np.concatenate(data, axis=0).T
+
+	def times(self):
+		"""The time (ms) of every sample"""
+		return self.t0 + np.arange(self.n_samples) * self.every * self.dt
+
+
+class Spike_monitor(object):
+	"""Records the spikes of all neurons as events: (neuron index, time), in
+	typed arrays that double in size when they are full. Spikes are sparse,
+	so this is much smaller (and cheaper) than recording V of every neuron.
+	"""
+	def __init__(self, names=[], capacity=1024):
+		"""
+		- names 	: the name of every neuron (by index)
+		- capacity 	: initial number of spikes there is room for
+		"""
+		super(Spike_monitor, self).__init__()
+		self.names = list(names)
+		self.idx = np.zeros(capacity, dtype=np.int32)
+		self.t = np.zeros(capacity, dtype=np.float64)
+		self.n = 0
+		return
+
+	def append(self, t, idx):
+		"""Record spikes of neurons idx at t (t can be one time for all, or
+		one time per spike)
+		"""
+		k = len(idx)
+		if k == 0:
+			return
+		while self.n + k > len(self.idx):
+			self.idx = np.concatenate([self.idx, np.zeros_like(self.idx)])
+			self.t = np.concatenate([self.t, np.zeros_like(self.t)])
+		self.idx[self.n:self.n + k] = idx
+		self.t[self.n:self.n + k] = t
+		self.n += k
+		return
+
+	@property
+	def neurons(self):
+		"""Index of the neuron of every spike"""
+		return self.idx[:self.n]
+
+	@property
+	def times(self):
+		"""Time (ms) of every spike"""
+		return self.t[:self.n]
+
+	def rates(self, bin=10.0, tmax=None):
+		"""Firing rate (Hz) of every neuron, in bins of bin ms.
+		Returns (bin edges, rates); rates is n_neurons x n_bins
+		"""
+		if tmax is None:
+			tmax = self.times.max() + bin if self.n else bin
+		edges = np.arange(0, tmax + bin, bin)
+		n_nrn = max(len(self.names), self.neurons.max() + 1 if self.n else 0)
+		counts, _, _ = np.histogram2d(self.neurons, self.times,
+			bins=(np.arange(n_nrn + 1), edges))
+		return edges, counts * 1000.0 / bin
+
+	def save(self, path):
+		"""Save the spikes (and neuron names) to an .npz file"""
+		np.savez(path, neuron=self.neurons, t=self.times,
+			names=np.array(self.names, dtype=str))
+		return
+
+	@classmethod
+	def load(cls, path):
+		"""A Spike_monitor with the spikes saved (by save) in path"""
+		data = np.load(path)
+		mon = cls(data['names'].tolist(), capacity=max(1, len(data['t'])))
+		mon.append(data['t'], data['neuron'])
+		return mon
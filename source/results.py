@@ -0,0 +1,130 @@
+import os
+import csv
+import numpy as np
+
+from recorder import Trace_recorder
+
+class Results_table(object):
+	"""The results of many trials, as columns of numpy arrays:
+	-	desc 	: 1 for a correct descision, 0 for an incorrect one, -1 for
+				  no response
+	-	rt 		: the RT (ms), or the time simulated if there is no response
+	-	patt 	: the input pattern (one column per input)
+	-	seed 	: the seed of the trial, -1 if unknown
+	-	spec 	: hash of the network spec (see network.spec_hash)
+	Rows are buffered and appended to one .npy file per column (if a
+	directory is given, else they are kept in memory), so storing a trial is
+	cheap, and a stored table is memory mapped when it's loaded again,
+	instead of parsed like a csv file.
+	"""
+	codes = { True: 1, False: 0, None: -1 }
+
+	def __init__(self, directory=None, n_in=2, chunk=1024):
+		"""
+		- directory : directory with the .npy files of the columns; if it
+					  already holds a table, rows are added to it
+		- n_in 		: number of inputs (columns of patt)
+		- chunk 	: number of rows buffered before they are written
+		"""
+		super(Results_table, self).__init__()
+		self.directory = directory
+		if directory is not None and not os.path.isdir(directory):
+			os.makedirs(directory)
+		self.fields = [ ('desc', np.int8, 1), ('rt', np.float64, 1),
+			('patt', np.int8, n_in), ('seed', np.int64, 1), ('spec', 'S16', 1) ]
+		self.recs = {}
+		for name, dtype, n in self.fields:
+			path = None
+			if directory is not None:
+				path = os.path.join(directory, name + '.npy')
+				if name == 'patt' and os.path.exists(path):
+					n = None # as many inputs as the stored table has
+			self.recs[name] = Trace_recorder(n, path, dtype, chunk=chunk,
+				append=True)
+		return
+
+	def __len__(self):
+		return self.recs['rt'].n_samples
+
+	def append(self, desc, rt, patt=None, seed=-1, spec=''):
+		"""Add one trial; desc is True/False/None (correct, incorrect, no
+		response), as in Network_simulator.results
+		"""
+		self.recs['desc'].append( self.codes[desc] )
+		self.recs['rt'].append( rt )
+		self.recs['patt'].append( -1 if patt is None else patt )
+		self.recs['seed'].append( -1 if seed is None else seed )
+		self.recs['spec'].append( spec )
+		return
+
+	def extend(self, other):
+		"""Add all trials of another Results_table"""
+		for name, _, _ in self.fields:
+			data = other.column(name)
+			# in blocks, so a memory mapped table isn't read at once
+			for k in xrange(0, len(data), 65536):
+				self.recs[name].extend(data[k:k + 65536])
+		return
+
+	def column(self, name):
+		"""All values of column name; memory mapped if stored in files"""
+		data = self.recs[name].read().T
+		return data[:, 0] if name != 'patt' else data
+
+	def as_tuples(self):
+		"""The (desc, rt) of every trial, with desc True/False/None"""
+		descs = { 1: True, 0: False, -1: None }
+		return [ (descs[desc], rt) for desc, rt in
+			zip(self.column('desc').tolist(), self.column('rt').tolist()) ]
+
+	def close(self):
+		"""Write all buffered rows, and finish the files"""
+		for rec in self.recs.values():
+			rec.close()
+		return
+
+	def write_csv(self, fname):
+		"""Write desc and rt to a csv file, as Network_simulator did before
+		(desc as True/False/NoResp)
+		"""
+		names = { 1: 'True', 0: 'False', -1: 'NoResp' }
+		with open(fname, 'w') as f:
+			writer = csv.writer(f)
+			for desc, rt in zip(self.column('desc').tolist(),
+								self.column('rt').tolist()):
+				writer.writerow( [names[desc], rt] )
+		return
+
+	def read_csv(self, fname):
+		"""Add the trials in a csv file written by write_csv"""
+		codes = { 'True': 1, 'False': 0 }
+		with open(fname, 'r') as f:
+			rows = [ (codes.get(desc, -1), float(rt))
+				for desc, rt in csv.reader(f) ]
+		if not rows:
+			return
+		descs, rts = zip(*rows)
+		n = len(rows)
+		self.recs['desc'].extend(descs)
+		self.recs['rt'].extend(rts)
+		self.recs['patt'].extend(-np.ones((n, self.recs['patt'].n_rows)))
+		self.recs['seed'].extend(-np.ones(n))
+		self.recs['spec'].extend([''] * n)
+		return
+
+
+def summarize(table):
+	"""Accuracy and RTs of the trials in a Results_table, as a dict:
+	n (trials), correct/incorrect/no_resp (fractions of the trials), and
+	rt_correct/rt_incorrect (mean RT, nan if there are none)
+	"""
+	desc = np.asarray(table.column('desc'))
+	rt = np.asarray(table.column('rt'))
+	n = len(desc)
+	mean = lambda x: x.mean() if len(x) else np.nan
+	return dict( n=n,
+		correct=np.mean(desc == 1) if n else np.nan,
+		incorrect=np.mean(desc == 0) if n else np.nan,
+		no_resp=np.mean(desc == -1) if n else np.nan,
+		rt_correct=mean(rt[desc == 1]),
+		rt_incorrect=mean(rt[desc == 0]) )
@@ -1,14 +1,16 @@
 from network import Network
+import tasks
 
 with open('networkfileXOR.py') as nwsfile:
 	nws = nwsfile.read()
+task = tasks.XOR()
 counter = 0
 for i in range(100):
-	net = Network(nws)
+	net = Network(nws, cache=True, task=task)
 	desc, rt = net.simulate()
 	#net.make_plots(trace=True, im = True, tmax=rt)
 	print "output: %s, reaction time: %s, input patter: %s"%(str(desc), str(rt), str(net.patt_in))
-	if desc != sum(net.patt_in,0)%2:
+	if desc != net.answer:
 		counter += 1
 		print "an error occured. this is error number %s"%str(counter)
 	else:
@@ -0,0 +1,47 @@
+"""Run the tests: the test_* functions of the test_*.py modules in this
+directory (or of the modules named), as pytest would, for where pytest isn't
+installed. Prints a line per test, and exits with 1 if any failed. Tests
+can skip themselves with skip() (pytest.skip, where pytest is installed):
+
+	python run_tests.py
+	python run_tests.py test_engines
+"""
+import os
+import sys
+import glob
+import traceback
+
+class Skipped(Exception):
+	"""Raised by skip(); named as pytest's, so both are caught by run"""
+	pass
+
+def skip(reason):
+	"""Skip the test that calls this, e.g. for a missing dependency"""
+	raise Skipped(reason)
+
+def run(names):
+	"""Run the tests of the modules names; returns the number that failed"""
+	failed = 0
+	for name in names:
+		module = __import__(name)
+		tests = sorted( test for test in dir(module)
+			if test.startswith('test_') and callable(getattr(module, test)) )
+		for test in tests:
+			try:
+				getattr(module, test)()
+				print "ok    ", name, test
+			except Exception, e:
+				if type(e).__name__ == 'Skipped':
+					print "skip  ", name, test, "({})".format(e)
+					continue
+				failed += 1
+				print "FAILED", name, test
+				traceback.print_exc()
+			sys.stdout.flush()
+	return failed
+
+
+if __name__ == '__main__':
+	names = sys.argv[1:] or sorted( os.path.basename(fname)[:-3]
+		for fname in glob.glob('test_*.py') )
+	sys.exit(1 if run(names) else 0)
@@ -0,0 +1,161 @@
+import os
+import itertools
+import multiprocessing
+import numpy as np
+
+import neurons
+import network
+import tasks
+from network_simulator import Network_simulator
+from results import Results_table, summarize
+
+class Parameter_sweep(object):
+	"""Runs a network spec for many values of its parameters (variables in
+	the spec, see Network), and summarizes accuracy and RTs per point:
+	-	grid() and random_design() make the points: dicts of parameter values
+	-	run() simulates n_iter trials per point, batched, and on n_jobs
+		processes at once, and collects all trials in one Results_table (its
+		spec column tells the points apart) and a summary row per point
+	Parameters named izh_<type>_<x>, e.g. izh_A_d, set entry x (a,b,c,d or s)
+	of the Izhikevich type in neurons._izh_params, for that point only.
+	Consecutive points with the same topology (e.g. that only change weights
+	or firing rates) reuse the compiled structure of the network (see 
+	Compiled_network.rebind), instead of building it again.
+	"""
+	def __init__(self, nwspec="", T=2000, dt=1.0, seed=None, results_dir=None,
+					task=None):
+		"""
+		- nwspec 	: the network specification
+		- T, dt 	: simulated time and time step of every trial
+		- seed 		: seed of the sweep (None: random, the seed drawn is kept
+					  in self.seed); every point gets its own seed from it
+		- results_dir : store the trials (a Results_table) and the summary
+					  (summary.npy) in this directory
+		- task 		: the task of the trials (see tasks.py)
+		"""
+		super(Parameter_sweep, self).__init__()
+		self.nwspec = nwspec
+		self.T = T
+		self.dt = dt
+		self.seed = network.engine.root_seed(seed)
+		self.results_dir = results_dir
+		self.task = task if task is not None else tasks.Discrimination()
+		self.table = Results_table(results_dir, n_in=self.task.n_in)
+		self.rows = [] # (point, summary) per point run
+
+	@staticmethod
+	def grid(**values):
+		"""All combinations of the values of every parameter, e.g.
+		grid(w=[0.5, 1.0], izh_type=['A', 'C']) gives 4 points
+		"""
+		names = sorted(values)
+		return [ dict(zip(names, combo)) for combo in
+			itertools.product(*[ values[name] for name in names ]) ]
+
+	@staticmethod
+	def random_design(n, rng=np.random, **ranges):
+		"""n random points; every parameter is given as (low, high), for a
+		uniform value, or as a list of values to choose from
+		"""
+		points = [ {} for _ in xrange(n) ]
+		for name in sorted(ranges):
+			r = ranges[name]
+			if isinstance(r, tuple):
+				values = rng.uniform(r[0], r[1], n).tolist()
+			else:
+				values = [ r[k] for k in rng.randint(len(r), size=n) ]
+			for point, value in zip(points, values):
+				point[name] = value
+		return points
+
+	def run(self, points, n_iter=100, batch_size=100, n_jobs=None):
+		"""Simulate n_iter trials for every point, in batches of batch_size
+		(see Network_simulator.simulate_batched), on n_jobs processes if
+		n_jobs > 1 (every process takes whole points).
+		Returns the summary (see summary()) of all points run so far
+		"""
+		seeds = network.engine.trial_seeds(self.seed, len(points))
+		jobs = [ (self.nwspec, self.T, self.dt, seed, point, n_iter,
+			batch_size, self.task) for point, seed in zip(points, seeds) ]
+		pool = None
+		if n_jobs and n_jobs > 1:
+			pool = multiprocessing.Pool(n_jobs)
+			tables = pool.imap(_run_point, jobs)
+		else:
+			tables = itertools.imap(_run_point, jobs)
+		try:
+			for point, table in zip(points, tables):
+				self.table.extend(table)
+				self.rows.append( (point, summarize(table)) )
+				print point, "correct: {correct:.2f}, RT: {rt_correct:.1f}".format(
+					**self.rows[-1][1])
+			if pool is not None:
+				pool.close()
+		except:
+			if pool is not None:
+				pool.terminate()
+			raise
+		finally:
+			if pool is not None:
+				pool.join()
+
+		if self.results_dir is not None:
+			self.table.close()
+			np.save(os.path.join(self.results_dir, 'summary.npy'),
+				self.summary())
+		return self.summary()
+
+	def summary(self):
+		"""One row per point: the parameter values, and the summary of its
+		trials (see results.summarize), as a numpy record array
+		"""
+		if not self.rows:
+			return None
+		names = sorted(set( name for point, _ in self.rows for name in point ))
+		stats = sorted(self.rows[0][1])
+		records = [ tuple( point.get(name, np.nan) for name in names ) +
+			tuple( stat[name] for name in stats ) for point, stat in self.rows ]
+		return np.rec.fromrecords(records, names=names + stats)
+
+
+def set_izh_params(point):
+	"""Apply the izh_<type>_<x> parameters in point to neurons._izh_params.
+	Returns the entries that were changed, to restore them afterwards
+	"""
+	old = {}
+	for name, value in point.items():
+		if not name.startswith('izh_') or name.count('_') != 2:
+			continue
+		_, izh_type, par = name.split('_')
+		if izh_type not in neurons._izh_params or par not in 'abcds':
+			raise ValueError("Unknown Izhikevich parameter: {}".format(name))
+		old.setdefault(izh_type, neurons._izh_params[izh_type])
+		abcds = list(neurons._izh_params[izh_type])
+		abcds['abcds'.index(par)] = value
+		neurons._izh_params[izh_type] = tuple(abcds)
+	return old
+
+
+# the compiled network of the last point this process ran, for reuse
+_last_compiled = [None]
+
+def _run_point(job):
+	"""Run all trials of one point of a sweep (see Parameter_sweep.run)
+	- job: (nwspec, T, dt, seed, point, n_iter, batch_size, task)
+	Returns the Results_table of the trials
+	"""
+	nwspec, T, dt, seed, point, n_iter, batch_size, task = job
+	old = set_izh_params(point)
+	try:
+		sim = Network_simulator(nwspec, T, dt, seed, params=point,
+			verbose=False, task=task)
+		try:
+			_last_compiled[0] = sim.simulate_batched(n_iter, batch_size,
+				reuse=_last_compiled[0])
+		except network.engine.Unsupported_network:
+			# the network can't be compiled (that's found out before any
+			# trial is simulated); simulate trial by trial
+			sim.simulate(n_iter, rug_plot=False)
+	finally:
+		neurons._izh_params.update(old)
+	return sim.table
@@ -1,10 +1,15 @@
 import numpy as np
+from math import exp
 
 class Synapse(object):
 	"""This is a synapse object; it regulates the currents passed on by 
 	interconnected neurons
 	"""
-	def __init__(self, w = 0):
+	# no __dict__: networks have many synapses
+	__slots__ = ('record', 'name', 'w', 'exact', 't', 'I0', 't0', 'tau',
+				 'spike')
+
+	def __init__(self, w = 0, exact = False):
 		super(Synapse, self).__init__()
 		self.record = False
 		self.name = ''
@@ -13,11 +18,46 @@ class Synapse(object):
 		self.w = w
 
 		# short current wave, open-and-close after spike
+		# exact: Iout decays as I0*exp(-(t-t0)/tau) since the last spike at 
+		# t0, computed only when asked for; otherwise, forward-Euler per step
+		self.exact = exact
+		self.t = 0.0
 		self.Iout = 0.0
 		self.tau = 1.8 # 1.8 corresponds to the fast time constant of AMPA receptors
 		self.spike = False
 		return
 
+	@property
+	def Iout(self):
+		"""The current (without weight) at the last time_step"""
+		if self.exact and self.t != self.t0:
+			return self.I0 * exp( -(self.t - self.t0) / self.tau )
+		return self.I0
+
+	@Iout.setter
+	def Iout(self, I):
+		self.I0, self.t0 = I, self.t
+
+	def decay(self, t, dt = 1.0, spike = 0):
+		"""Let the current decay until t, and add the spike (if any)"""
+		if self.exact:
+			if t < self.t: # time restarted, e.g. a new trial; rebase on t
+				self.I0, self.t0 = self.Iout, t
+			self.t = t
+			if spike: # otherwise, nothing to do
+				self.Iout += spike
+			return
+		self.t = t
+		self.Iout += dt*(-self.Iout/self.tau) + spike
+		return
+
+	def reset(self):
+		"""Back to the initial state: no current, no spike, t = 0"""
+		self.t = 0.0
+		self.Iout = 0.0
+		self.spike = False
+		return
+
 	def set_record(self, name = '', record = True):
 		self.name =  name
 		self.record = record
@@ -47,6 +87,8 @@ class Continuous_synapse(Synapse):
 	"""Simulates clamped input
 	used for testing purposes primarily 
 	"""
+	__slots__ = ('onset', 'offset', 'on')
+
 	def __init__(self, w = 0.1, onset = 0, offset = None):
 		super(Continuous_synapse, self).__init__(w)
 		
@@ -64,6 +106,11 @@ class Continuous_synapse(Synapse):
 		self.on = (t >= onset and t < offset)
 		return
 
+	def reset(self):
+		super(Continuous_synapse, self).reset()
+		self.on = False
+		return
+
 	def I_out(self):
 		# I_out is really easy; w if on, else 0
 		return self.w * self.on
@@ -73,8 +120,10 @@ class Neuronal_synapse(Synapse):
 	"""Synapse wiring 2 neurons together. When they spike,
 	they produce short input: duration governed by tau, by default mimicking AMPA
 	"""
-	def __init__(self, w = 0.1, pre = None, post = None):
-		super(Neuronal_synapse, self).__init__(w)
+	__slots__ = ('pre',)
+
+	def __init__(self, w = 0.1, pre = None, post = None, exact = False):
+		super(Neuronal_synapse, self).__init__(w, exact)
 		self.pre = pre # presynaptic neuron
 		self.spike = False
 		# optional postsynaptic neuron
@@ -84,7 +133,7 @@ class Neuronal_synapse(Synapse):
 	def time_step(self, t, dt = 1.0):
 		self.spike = self.pre.spike() # pre tells you whether it's spiking
 		# update 'current flow' accordingly
-		self.Iout += dt*(-self.Iout/self.tau) + self.spike
+		self.decay(t, dt, self.spike)
 		return
 
 	def I_out(self):
@@ -95,13 +144,32 @@ class Poisson_synapse(Synapse):
 	"""A Poisson_synapse; it simulates random input to a neuron, with 
 	a certain firing rate, an onset, offset and weight
 	"""
-	def __init__(self, firing_rate = 0.5, w = 0.1, onset = 0, offset = None):
-		super(Poisson_synapse, self).__init__(w)
+	__slots__ = ('firing_rate', 'onset', 'offset', 'on', 'train', 'train_dt')
+
+	def __init__(self, firing_rate = 0.5, w = 0.1, onset = 0, offset = None,
+					exact = False):
+		super(Poisson_synapse, self).__init__(w, exact)
 		self.firing_rate = firing_rate # pr spikes per ms
 		self.spike = 0 # 0/1
 		self.onset = onset
 		self.offset = offset
 		self.on = False
+		# pre-sampled spike train (see presample_spike_trains), if any
+		self.train = None
+		return
+
+	def set_spike_train(self, train, dt = 1.0):
+		"""Use a pre-sampled spike train: train[k] is the spike at t = k*dt
+		(an array, or a Spike_train)"""
+		self.train = train
+		self.train_dt = dt
+		return
+
+	def reset(self):
+		super(Poisson_synapse, self).reset()
+		self.spike = 0
+		self.on = False
+		self.train = None
 		return
 	
 	def time_step(self, t, dt = 1.0):
@@ -109,22 +177,103 @@ class Poisson_synapse(Synapse):
 		onset = self.onset
 		offset = self.offset if self.offset else t+1
 		self.on = (t >= onset and  t < offset)
-		# update frequency dep. on onset/offset
-		freq = self.firing_rate if self.on else 0.0
-		# determine whether spike:	
-		self.spike = int( np.random.sample(1)  < (freq * dt)) # random spiking
+		# look up the spike in the pre-sampled train, if possible:
+		k = int(round(t / dt))
+		if (self.train is not None and dt == self.train_dt and 
+				k < self.train.shape[0]):
+			self.spike = int( self.train[k] )
+		else:
+			# update frequency dep. on onset/offset
+			freq = self.firing_rate if self.on else 0.0
+			# determine whether spike:	
+			self.spike = int( np.random.sample(1)  < (freq * dt)) # random spiking
 		# update current accordingly
-		self.Iout += dt*(-self.Iout/self.tau) + self.spike
+		self.decay(t, dt, self.spike)
 		return
 
 	def I_out(self):
 		return self.Iout * self.w * self.on
 
 
-"""Main code (for testing)
-"""
-if __name__ == '__main__':
-	poiss = Poisson_synapse()
-	# define total time and timestep
-	T = 800
-	dt = 1.0
+class Spike_trains(object):
+	"""The spike trains of a group of Poisson sources (e.g. Poisson_synapses),
+	for t in [0, T): drawn in blocks of chunk time steps, for all sources at
+	once (one block of random numbers), when a source first needs a spike of
+	the next block. Only one block is kept, so the memory doesn't grow with T.
+	The blocks are drawn in order from rng, so the spikes are the same as
+	when drawing all time steps at once.
+	"""
+	def __init__(self, rate, onset, offset, T, dt = 1.0, rng = np.random,
+					chunk = 100):
+		"""- rate, onset, offset : arrays, per source (offset inf: no offset)"""
+		super(Spike_trains, self).__init__()
+		self.n_steps = len(np.arange(0, T, dt))
+		self.dt = dt
+		self.rng = rng
+		self.chunk = chunk
+		self.rate = np.asarray(rate, dtype=float)
+		self.onset = np.asarray(onset, dtype=float)
+		self.offset = np.asarray(offset, dtype=float)
+		self.block = None 	# the spikes of steps start, .., start+chunk-1
+		self.start = 0
+		return
+
+	def draw(self, k):
+		"""Draw the block of time steps k, .., k+chunk-1 (until T)"""
+		tt = (k + np.arange(min(self.chunk, self.n_steps - k))) * self.dt
+		# spike where the synapse is on, with probability firing_rate * dt:
+		on = (tt[:, None] >= self.onset) & (tt[:, None] < self.offset)
+		self.block = self.rng.random_sample(on.shape) < (
+			self.rate * on * self.dt)
+		self.start = k
+		return
+
+	def row(self, k):
+		"""The spikes of all sources at time step k"""
+		if self.block is None or not (
+				0 <= k - self.start < self.block.shape[0]):
+			self.draw(k)
+		return self.block[k - self.start]
+
+	def spike(self, k, i):
+		"""The spike of source i at time step k"""
+		return self.row(k)[i]
+
+
+class Spike_train(object):
+	"""The spike train of synapse i of a Spike_trains: train[k] is its spike
+	at time step k, as in an array
+	"""
+	__slots__ = ('trains', 'i', 'shape')
+
+	def __init__(self, trains, i):
+		self.trains = trains
+		self.i = i
+		self.shape = (trains.n_steps,)
+
+	def __getitem__(self, k):
+		return self.trains.spike(k, self.i)
+
+
+def presample_spike_trains(syns, T, dt = 1.0, rng = np.random, chunk = 100,
+							bg_rate = ()):
+	"""Hand out the spike trains of Poisson synapses for t in [0, T), drawn
+	for all synapses at once, a block of chunk time steps at a time (see
+	Spike_trains).
+	- syns 	: list of Poisson_synapses
+	- rng 	: the random generator to use (np.random, or a RandomState)
+	- bg_rate : rates of background noise (see neurons.Background_noise),
+				drawn with the synapses: the columns after theirs
+	Returns the Spike_trains, or None if there is nothing to draw
+	"""
+	if len(syns) + len(bg_rate) == 0 or len(np.arange(0, T, dt)) == 0:
+		return None
+	n_bg = len(bg_rate)
+	trains = Spike_trains(
+		np.concatenate(([ syn.firing_rate for syn in syns ], bg_rate)),
+		np.concatenate(([ syn.onset for syn in syns ], np.zeros(n_bg))),
+		np.concatenate(([ syn.offset if syn.offset else np.inf
+			for syn in syns ], np.inf * np.ones(n_bg))), T, dt, rng, chunk)
+	for k, syn in enumerate(syns):
+		syn.set_spike_train(Spike_train(trains, k), dt)
+	return trains
@@ -0,0 +1,87 @@
+"""Tasks: what a network is shown and what it should answer. A task supplies
+the input patterns (one value per input synapse), the firing rates, weight
+and onset of the input synapses, and the correct output for a pattern; the
+network itself (see network.Network) is the same for every task.
+"""
+import itertools
+import numpy as np
+
+class Task(object):
+	"""Base class of the tasks: n_in inputs, n_out outputs; an input that is
+	on fires at rate (spikes/ms) from onset (ms), with weight w.
+	Children define draw_pattern() and answer(), and patterns() if the
+	patterns can be listed.
+	"""
+	n_in = 2
+	n_out = 2
+
+	def __init__(self, rate=0.75, w=0.5, onset=300):
+		super(Task, self).__init__()
+		self.rate = rate
+		self.w = w
+		self.onset = onset
+
+	@property
+	def key(self):
+		"""Identifies the inputs/outputs a network of this task is built with
+		(see Network, cache=True); rate, w and onset are set per trial
+		"""
+		return '{}x{}'.format(self.n_in, self.n_out)
+
+	def patterns(self):
+		"""All input patterns of the task, as an array n_patterns x n_in"""
+		raise NotImplementedError
+
+	def draw_pattern(self, rng):
+		"""Draw an input pattern (array of n_in values, 0 or 1)
+		- rng: the random generator (np.random or a RandomState) to use
+		"""
+		patts = self.patterns()
+		return patts[rng.randint(len(patts))].copy()
+
+	def input_rates(self, patt_in):
+		"""Firing rates of the input synapses, for (an array of) patt_in"""
+		return self.rate * np.asarray(patt_in)
+
+	def answer(self, patt_in):
+		"""The correct output (index) for (an array of) patt_in"""
+		raise NotImplementedError
+
+
+class Discrimination(Task):
+	"""Perceptual descision making: one of two inputs is on, the output of
+	that input should fire
+	- rand_input: draw which input is on; else it's always input 0
+	"""
+	def __init__(self, rand_input=True, **kw):
+		super(Discrimination, self).__init__(**kw)
+		self.rand_input = rand_input
+
+	def patterns(self):
+		if not self.rand_input:
+			return np.array([ [1, 0] ])
+		return np.array([ [1, 0], [0, 1] ])
+
+	def draw_pattern(self, rng):
+		# as the network always did: shuffle [1, 0]
+		patt_in = np.array( [1, 0] )
+		if self.rand_input:
+			rng.shuffle( patt_in )
+		return patt_in
+
+	def answer(self, patt_in):
+		return np.argmax(patt_in, axis=-1)
+
+
+class XOR(Task):
+	"""XOR of two inputs, each on or off: output 1 should fire when exactly
+	one input is on, output 0 otherwise
+	"""
+	def patterns(self):
+		return np.array(list(itertools.product([0, 1], repeat=self.n_in)))
+
+	def draw_pattern(self, rng):
+		return rng.randint(0, 2, self.n_in)
+
+	def answer(self, patt_in):
+		return np.sum(patt_in, axis=-1) % 2
@@ -0,0 +1,86 @@
+"""Tests of the detection of descisions (see decision.py): the running spike
+counts of the ring buffer have to be those of the last window ms. Run with
+pytest, or with run_tests.py
+"""
+import numpy as np
+
+import network
+from decision import Decision_detector
+from test_network import spec
+
+def naive(spikes, k, n_win, threshold):
+	"""The descisions after step k, from the spikes (steps x trials x outputs)
+	of the last n_win steps, summed over the whole window
+	"""
+	over = spikes[max(0, k + 1 - n_win):k + 1].sum(axis=0) > threshold
+	return np.where(over.any(axis=1), np.argmax(over, axis=1), -1)
+
+def test_window():
+	"""The spikes counted are those of the last window ms, for any dt,
+	number of outputs and of trials
+	"""
+	rng = np.random.RandomState(0)
+	for dt, n_out, n_trials in [ (1.0, 2, 1), (0.5, 3, 4), (0.25, 2, 8) ]:
+		det = Decision_detector(n_out, window=20, f_thres=0.2, t_check=0,
+			dt=dt, n_trials=n_trials)
+		assert det.n_win == int(20 / dt)
+		spikes = rng.rand(400, n_trials, n_out) < 0.2 * dt
+		for k in xrange(len(spikes)):
+			det.update(spikes[k])
+			assert (det.nspikes == spikes[max(0, k + 1 - det.n_win):k + 1].sum(
+				axis=0)).all()
+			assert (det.check((k + 1) * dt) == naive(spikes, k, det.n_win,
+				det.threshold)).all()
+
+def test_t_check():
+	"""No descision is made before t_check, however many spikes there are;
+	when several outputs are over threshold, the first one is taken
+	"""
+	det = Decision_detector(3, window=10, f_thres=0.1, t_check=50)
+	for _ in xrange(10):
+		det.update([ False, True, True ])
+	assert det.check(50)[0] == -1
+	assert det.check(51)[0] == 1
+	# one spike less than the threshold of 0.1 * 10 = 1 spike:
+	det = Decision_detector(2, window=10, f_thres=0.1, t_check=0)
+	det.update([ True, False ])
+	assert det.check(1)[0] == -1
+	det.update([ True, False ])
+	assert det.check(2)[0] == 0
+
+def test_f_thres():
+	"""check() takes another threshold, as check_descision_made does"""
+	det = Decision_detector(2, window=10, f_thres=0.5, t_check=0)
+	for _ in xrange(3):
+		det.update([ False, True ])
+	assert det.check(3)[0] == -1
+	assert det.check(3, f_thres=0.2)[0] == 1
+	net = network.Network(spec, seed=0)
+	net.detector = det
+	net.descision_made = False
+	net.check_descision_made(3, 1.0)
+	assert not net.descision_made
+	net.check_descision_made(3, 1.0, f_thres=0.2)
+	assert net.descision_made == (1, 3)
+
+def test_snapshot():
+	"""A restored detector continues as the trials it was restored from;
+	take() keeps the windows of the trials taken
+	"""
+	rng = np.random.RandomState(1)
+	spikes = rng.rand(60, 3, 2) < 0.3
+	det = Decision_detector(2, window=20, t_check=0, n_trials=3)
+	for k in xrange(30):
+		det.update(spikes[k])
+	snap = det.snapshot()
+	other = Decision_detector(2, window=20, t_check=0, n_trials=2)
+	other.restore(snap, [2, 0])
+	det.take([2, 0])
+	for k in xrange(30, 60):
+		det.update(spikes[k, [2, 0]])
+		other.update(spikes[k, [2, 0]])
+		assert (det.nspikes == other.nspikes).all()
+		assert (det.nspikes == spikes[k + 1 - 20:k + 1, [2, 0]].sum(
+			axis=0)).all()
+	# the snapshot is a copy:
+	assert (snap['nspikes'] == spikes[10:30].sum(axis=0)).all()
@@ -0,0 +1,273 @@
+"""Seeded equivalence tests of the simulation engines: the same seed has to
+give the same trial, however it is simulated (objects, compiled, in a
+batch, paused and resumed, on a worker), and stored results have to read
+back as they were written. Run with pytest, or with run_tests.py
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import network
+import tasks
+import engine
+import kernels
+from network_simulator import Network_simulator
+from recorder import Trace_recorder
+from results import Results_table
+try:
+	from pytest import skip
+except ImportError:
+	from run_tests import skip
+
+with open('networkfile.py') as f:
+	spec = f.read()
+with open('networkfileXOR.py') as f:
+	spec_xor = f.read()
+# (spec, task) pairs: Izh and LIF neurons, Poisson, continuous and neuronal
+# synapses, two tasks
+specs = [ (spec, None), (spec_xor, tasks.XOR()) ]
+seeds = [ 0, 1, 2 ]
+T = 1500
+
+# neurons that project to several neurons, with synapses that can share
+# their trace (same tau and exact) and synapses that can't
+spec_shared = """
+hubs = [ Izh_Neuron(syn_in=[in0]) for _ in xrange(5) ] + \
+	[ LIF_Neuron(syn_in=[in1]) for _ in xrange(5) ]
+mid = [ Izh_Neuron(syn_in=[in0, in1]) for _ in xrange(3) ]
+for k, hub in enumerate(hubs):
+	for post in [ out0, out1, mid[k % 3] ]:
+		synapses += [ Neuronal_synapse(w=1.0 + 0.1 * k, pre=hub, post=[post]) ]
+	slow = Neuronal_synapse(w=0.5, pre=hub, post=[out0])
+	slow.tau = 3.0
+	synapses += [ slow, Neuronal_synapse(w=0.5, pre=hub, post=[out1],
+		exact=True) ]
+for nrn in mid:
+	synapses += [ Neuronal_synapse(w=1.5, pre=nrn, post=[out0, out1]) ]
+nodes += hubs + mid
+"""
+
+def new_network(spec, task, seed, **kw):
+	return network.Network(spec, task=task, seed=seed, **kw)
+
+def simulate(net, **kw):
+	return net.simulate(T=T, progress=False, **kw)
+
+
+def test_objects_compiled():
+	"""The object and compiled engines give the same trial for a seed. They
+	sum in different orders, and the round-off grows over a trial, so traces
+	are compared over its start only
+	"""
+	for spec, task in specs:
+		for seed in seeds:
+			nets = []
+			for eng in [ 'objects', 'compiled' ]:
+				net = new_network(spec, task, seed)
+				net.set_recording(everything=True)
+				nets.append( (simulate(net, engine=eng), net) )
+			(res_obj, obj), (res_cmp, cmp) = nets
+			assert res_obj == res_cmp, (seed, res_obj, res_cmp)
+			assert np.allclose(obj.Vv[:,:500], cmp.Vv[:,:500], atol=1e-6)
+			assert np.allclose(obj.Ii[:,:500], cmp.Ii[:,:500], atol=1e-6)
+
+def test_batch_replay():
+	"""A trial of a batch is the trial of its seed, simulated on its own"""
+	for spec, task in specs:
+		net = new_network(spec, task, 0)
+		results, patts = net.simulate_batch(6, T=T, seed=5, first=3)
+		for k, seed in enumerate(engine.trial_seeds(5, 6, 3)):
+			single = new_network(spec, task, seed)
+			assert simulate(single, engine='compiled') == results[k]
+			assert (single.patt_in == patts[k]).all()
+
+def test_batches_disjoint():
+	"""The trials of a run never repeat, also over batches and calls"""
+	sim = Network_simulator(spec, T=T, seed=7, verbose=False)
+	sim.simulate_batched(10, batch_size=4)
+	sim.simulate_batched(10, batch_size=3)
+	trial_seeds = sim.table.column('seed')
+	assert (trial_seeds == engine.trial_seeds(7, 20)).all()
+	assert len(np.unique(engine.trial_seeds(7, 10**5))) == 10**5
+
+def test_simulator_replay():
+	"""Sequential, batched and parallel runs of a simulator with the same
+	seed give the same trials, and every trial replays from its stored seed
+	"""
+	runs = []
+	for how in [ 'sequential', 'batched', 'parallel' ]:
+		sim = Network_simulator(spec, T=T, seed=11, verbose=False)
+		if how == 'sequential':
+			sim.simulate(6, rug_plot=False)
+		elif how == 'batched':
+			sim.simulate_batched(6, batch_size=4)
+		else:
+			sim.simulate_parallel(6, n_jobs=2)
+		runs.append( sim.results )
+	assert runs[0] == runs[1] == runs[2], runs
+	seed, desc = sim.table.column('seed')[0], sim.results[0]
+	net = new_network(spec, None, seed)
+	res, rt = simulate(net)
+	assert ( (None if res is None else res == net.answer), rt ) == desc
+
+def test_checkpoint_trial():
+	"""Pausing, checkpointing and resuming a trial doesn't change it"""
+	directory = tempfile.mkdtemp()
+	try:
+		path = os.path.join(directory, 'trial.npz')
+		for spec, task in specs:
+			for seed in seeds:
+				ref = new_network(spec, task, seed)
+				ref.set_recording(everything=True)
+				expected = simulate(ref, engine='compiled')
+				net = new_network(spec, task, seed)
+				net.set_recording(everything=True)
+				assert simulate(net, stop=400) is None
+				net.checkpoint(path)
+				assert net.resume() == expected
+				assert np.array_equal(net.Vv, ref.Vv)
+				# in another network of the spec, from the file:
+				other = new_network(spec, task, seed + 100)
+				assert other.resume(path) == expected
+				assert (other.patt_in == ref.patt_in).all()
+	finally:
+		shutil.rmtree(directory)
+
+def test_checkpoint_batch():
+	"""A batch resumed from its last periodic checkpoint, in a new network,
+	gives the same results as the batch run at once
+	"""
+	directory = tempfile.mkdtemp()
+	try:
+		path = os.path.join(directory, 'batch.npz')
+		expected = new_network(spec, None, 1).simulate_batch(12, T=T, seed=3)
+		net = new_network(spec, None, 1)
+		results = net.simulate_batch(12, T=T, seed=3, checkpoint=path,
+			checkpoint_every=200)
+		assert results[0] == expected[0]
+		resumed = new_network(spec, None, 2).resume(path)
+		assert resumed[0] == expected[0]
+		assert (resumed[1] == expected[1]).all()
+	finally:
+		shutil.rmtree(directory)
+
+def test_warm_replay():
+	"""A warm-started trial of a batch is the trial of its seed, started
+	from the same pool
+	"""
+	net = new_network(spec, None, 1)
+	pool = net.make_warm_pool(20, seed=9)
+	results, _ = net.simulate_batch(4, T=T, seed=3, warm=True)
+	for k, seed in enumerate(engine.trial_seeds(3, 4)):
+		single = new_network(spec, None, seed)
+		single.warm_pool = pool
+		assert simulate(single, engine='compiled', warm=True) == results[k]
+
+def test_declarative_connectivity():
+	"""Random connections of a declarative spec follow the seed"""
+	decl = { "populations": { "a": {"type": "LIF", "n": 30} },
+		"projections": [ {"pre": "in0", "post": "a"},
+			{"pre": "a", "post": "a", "rule": "fixed_probability", "p": 0.2},
+			{"pre": "a", "post": "out0", "rule": "fixed_indegree", "k": 5} ] }
+	topology = lambda seed: network.Network(decl, seed=seed).arrays.topology()
+	assert topology(1) == topology(1)
+	assert topology(1) != topology(2)
+
+def test_shared_traces():
+	"""Neuronal synapses share a trace if they have the same pre, tau and
+	exact; traces are numbered by their first synapse
+	"""
+	neur = np.array([ 1, 2, 3, 4, 5, 7 ])
+	pre = np.array([ 0, 0, 0, 1, 0, 1 ])
+	tau = np.array([ 1.8, 1.8, 1.8, 3.0, 1.8, 1.8, 1.8, 1.8 ])
+	exact = np.array([ 0, 0, 0, 0, 0, 1, 0, 0 ])
+	trace, first = engine.shared_traces(3, neur, pre, tau, exact)
+	assert list(trace) == [ 0, 1, 1, 2, 3, 4, 5, 3 ]
+	assert list(first) == [ 0, 1, 3, 4, 5, 6 ]
+	# without shared traces, trace i is synapse i:
+	trace, first = engine.shared_traces(6, neur, np.arange(6), np.ones(8),
+		np.zeros(8))
+	assert list(trace) == range(8) and list(first) == range(8)
+
+def test_shared_objects():
+	"""Synapses that share a trace in the compiled engine give the trial,
+	and the currents per synapse, of the object engine
+	"""
+	for seed in seeds:
+		nets = []
+		for eng in [ 'objects', 'compiled' ]:
+			net = new_network(spec_shared, None, seed)
+			net.set_recording(everything=True)
+			nets.append( (simulate(net, engine=eng), net) )
+		(res_obj, obj), (res_cmp, cmp) = nets
+		# the 3 synapses of every hub with the same tau share a trace:
+		assert cmp.compiled.n_syn - len(cmp.compiled.first) == 2 * 10
+		assert res_obj == res_cmp, (seed, res_obj, res_cmp)
+		assert np.allclose(obj.Vv[:,:500], cmp.Vv[:,:500], atol=1e-6)
+		assert np.allclose(obj.Ii[:,:500], cmp.Ii[:,:500], atol=1e-6)
+
+def test_fused_kernel():
+	"""The fused kernel (with numba) gives the trials, and the descisions,
+	of the numpy time step
+	"""
+	if not kernels.have_numba:
+		skip("numba is not installed")
+	for spec, task in specs + [ (spec_shared, None) ]:
+		for seed in seeds:
+			runs = []
+			for use_kernel in [ True, False ]:
+				kernels.have_numba = use_kernel
+				try:
+					net = new_network(spec, task, seed)
+					net.set_recording(everything=True)
+					result = simulate(net, engine='compiled')
+					assert net.compiled.use_kernel == use_kernel
+					batch, _ = new_network(spec, task, seed).simulate_batch(6,
+						T=T, seed=seed)
+				finally:
+					kernels.have_numba = True
+				runs.append( (result, batch, net) )
+			(res_k, batch_k, net_k), (res_np, batch_np, net_np) = runs
+			assert res_k == res_np and batch_k == batch_np, (seed, res_k, res_np)
+			assert np.allclose(net_k.Vv[:,:500], net_np.Vv[:,:500], atol=1e-6)
+			assert np.allclose(net_k.Ii[:,:500], net_np.Ii[:,:500], atol=1e-6)
+
+def test_results_roundtrip():
+	"""Results stored as memory-mapped columns, and as csv, read back"""
+	directory = tempfile.mkdtemp()
+	try:
+		sim = Network_simulator(spec, T=T, seed=5, verbose=False)
+		sim.simulate_batched(8, batch_size=8)
+		sim.save_results(os.path.join(directory, 'table'))
+		table = Results_table(os.path.join(directory, 'table'))
+		for name in [ 'desc', 'rt', 'patt', 'seed', 'spec' ]:
+			assert np.array_equal(table.column(name), sim.table.column(name))
+		table.close()
+		sim.write_res(os.path.join(directory, 'res.csv'))
+		other = Network_simulator(spec, verbose=False)
+		other.read_res(os.path.join(directory, 'res.csv'))
+		assert other.results == sim.results
+	finally:
+		shutil.rmtree(directory)
+
+def test_trace_roundtrip():
+	"""Traces streamed to .npy files are the traces kept in memory"""
+	directory = tempfile.mkdtemp()
+	try:
+		values = np.random.RandomState(0).random_sample((2500, 3))
+		in_memory = Trace_recorder(3, chunk=100)
+		on_disk = Trace_recorder(3, os.path.join(directory, 'V.npy'),
+			chunk=100)
+		for rec in [ in_memory, on_disk ]:
+			for row in values[:1234]:
+				rec.append(row)
+			rec.extend(values[1234:])
+			rec.close()
+		assert np.array_equal(in_memory.read(), values.T)
+		assert np.array_equal(on_disk.read(), values.T)
+		assert np.array_equal(np.load(os.path.join(directory, 'V.npy')),
+			values)
+	finally:
+		shutil.rmtree(directory)
+
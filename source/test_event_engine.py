@@ -0,0 +1,110 @@
+"""Tests of the event-driven simulation of LIF networks (see event_engine.py):
+spikes at the exact threshold crossings, refractory periods, and the same
+spikes as a clock-driven simulation with a small time step. Run with pytest,
+or with run_tests.py
+"""
+from math import log
+
+from neurons import LIF_Neuron
+from synapses import Continuous_synapse, Neuronal_synapse
+from event_engine import Event_network
+
+def quiet(nrn, t_r=0.0):
+	"""A neuron at rest, without background noise"""
+	nrn.Vm, nrn.t_r = nrn.V_rest, t_r
+	nrn.bg_rate, nrn.bg_w, nrn.bg_I = 0.0, 0.0, 0.0
+	nrn.method = 'exp'
+	return nrn
+
+def t_cross(nrn, w):
+	"""When a neuron at rest crosses threshold, with a constant input w"""
+	D = nrn.S * w * nrn.tau_m
+	return nrn.tau_m * log( D / (D - (nrn.th_V - nrn.V_rest)) )
+
+def chain(w=1.0, w_ab=10.0, t_r=0.0):
+	"""Neuron a with a constant input w, that projects to neuron b"""
+	syn = Continuous_synapse(w=w)
+	a = quiet(LIF_Neuron(syn_in=[syn]), t_r)
+	b = quiet(LIF_Neuron())
+	ab = Neuronal_synapse(w=w_ab, pre=a, post=[b], exact=True)
+	return [a, b], [syn, ab]
+
+def clock_driven(nodes, synapses, T, dt):
+	"""The (t, neuron) of all spikes, simulated with time step dt"""
+	spikes = []
+	for k in xrange(int(round(T / dt))):
+		for syn in synapses:
+			syn.time_step(k * dt, dt)
+		for j, nrn in enumerate(nodes):
+			nrn.step(dt)
+			if nrn.spike():
+				spikes.append( ((k + 1) * dt, j) )
+	return spikes
+
+def test_threshold_crossing():
+	"""A constant input makes a neuron fire when its membrane potential
+	crosses threshold, at the analytic crossing time, and again the
+	refractory period plus that time later
+	"""
+	for w in [ 0.7, 1.0, 3.0 ]:
+		nodes, syns = chain(w)
+		net = Event_network(nodes[:1], syns[:1])
+		net.simulate(T=100)
+		t0 = t_cross(nodes[0], w)
+		period = t0 + nodes[0].tau_r
+		times = [ t for t, j in net.spikes ]
+		assert len(times) == int( (100 - t0) / period ) + 1
+		for k, t in enumerate(times):
+			assert abs(t - (t0 + k * period)) < 1e-6
+	# below threshold, the neuron never fires:
+	nodes, syns = chain(0.6)
+	net = Event_network(nodes[:1], syns[:1])
+	net.simulate(T=100)
+	assert net.spikes == []
+
+def test_refractory():
+	"""A neuron in its refractory period ignores its input, and is kept at
+	rest until the period ends
+	"""
+	nodes, syns = chain(w=1.0, t_r=5.0)
+	nrn = nodes[0]
+	net = Event_network(nodes, syns)
+	net.simulate(T=100)
+	t0 = t_cross(nrn, 1.0)
+	times = [ t for t, j in net.spikes if j == 0 ]
+	assert abs(times[0] - (5.0 + t0)) < 1e-6
+	assert all( t2 - t1 > nrn.tau_r for t1, t2 in zip(times, times[1:]) )
+	# the state at the end of a trial, within a refractory period:
+	nodes, syns = chain(w=1.0, t_r=5.0)
+	net = Event_network(nodes, syns)
+	net.simulate(T=times[0] + 1.0)
+	net.store_state(times[0] + 1.0)
+	nrn = nodes[0]
+	assert nrn.Vm == nrn.V_rest
+	assert abs(nrn.t_r - (nrn.tau_r - 1.0)) < 1e-9
+	# input that arrives in the refractory period is lost: b fires after
+	# the first spike of a, unless that is within its refractory period
+	nodes, syns = chain(w_ab=10.0)
+	net = Event_network(nodes, syns)
+	net.simulate(T=25)
+	assert [ j for t, j in net.spikes ] == [ 0, 1 ]
+	nodes, syns = chain(w_ab=10.0)
+	nodes[1].t_r = 20.0
+	net = Event_network(nodes, syns)
+	net.simulate(T=25)
+	assert [ t for t, j in net.spikes if j == 1 ] == []
+
+def test_clock_driven():
+	"""The event-driven spikes are those of a clock-driven simulation, in
+	the limit dt -> 0: with dt = 0.01 ms, they differ by a few time steps
+	"""
+	T, dt = 100, 0.01
+	for w_ab in [ 5.0, 10.0, 20.0 ]:
+		nodes, syns = chain(w_ab=w_ab)
+		net = Event_network(nodes, syns)
+		net.simulate(T=T)
+		nodes, syns = chain(w_ab=w_ab)
+		spikes = clock_driven(nodes, syns, T, dt)
+		assert len(spikes) == len(net.spikes)
+		for (t_ev, j_ev), (t_cl, j_cl) in zip(net.spikes, spikes):
+			assert j_ev == j_cl and abs(t_ev - t_cl) < 10 * dt
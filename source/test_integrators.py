@@ -0,0 +1,88 @@
+"""Tests of the integration schemes of the neurons (see integrators.py): their
+order of accuracy, and that every engine integrates a neuron with its own
+scheme. Run with pytest, or with run_tests.py
+"""
+import numpy as np
+
+import network
+import neurons
+from integrators import izh_integrators, lif_integrators
+from test_network import spec
+
+# the order of accuracy of every scheme
+orders = dict(euler=1, halfstep=1, rk2=2, rk4=4)
+
+def izh_run(step, dt, T=20.0, V=-60.0, U=-14.0, a=0.02, b=0.2):
+	"""An Izh neuron without input, relaxing to rest (no spikes), up to T"""
+	V, U = np.array([V]), np.array([U])
+	for _ in xrange(int(round(T / dt))):
+		V, U = step(V, U, 0.0, a, b, dt)
+	return V[0], U[0]
+
+def test_izh_order():
+	"""Halving dt divides the error of a scheme by 2**order"""
+	V_ref = izh_run(izh_integrators['rk4'], 1e-3)[0]
+	for method, step in izh_integrators.items():
+		errors = [ abs(izh_run(step, dt)[0] - V_ref) for dt in [ 0.2, 0.1,
+			0.05 ] ]
+		for e1, e2 in zip(errors, errors[1:]):
+			assert abs(np.log2(e1 / e2) - orders[method]) < 0.1, (method, errors)
+
+def test_lif():
+	"""Exponential Euler is exact for a constant input, at any dt; forward
+	Euler converges to it with order 1
+	"""
+	V_rest, tau_m, I, T = -65.0, 10.0, 0.8, 20.0
+	exact = V_rest + I * tau_m * (1 - np.exp(-T / tau_m))
+	errors = []
+	for dt in [ 2.0, 0.5, 0.1, 0.05 ]:
+		Vm, Ve = V_rest, V_rest
+		for _ in xrange(int(round(T / dt))):
+			Vm = lif_integrators['exp'](Vm, I, V_rest, tau_m, dt)
+			Ve = lif_integrators['euler'](Ve, I, V_rest, tau_m, dt)
+		assert abs(Vm - exact) < 1e-9
+		errors.append(abs(Ve - exact))
+	assert abs(np.log2(errors[-2] / errors[-1]) - 1) < 0.1
+
+def test_arrays():
+	"""A step of a population, as arrays, is that of its neurons one by one"""
+	rng = np.random.RandomState(0)
+	V, U = rng.uniform(-70, -50, 10), rng.uniform(-15, -10, 10)
+	I, a, b = rng.uniform(0, 10, 10), rng.uniform(.02, .1, 10), rng.uniform(
+		.2, .25, 10)
+	for step in izh_integrators.values():
+		V1, U1 = step(V, U, I, a, b, 0.5)
+		for k in xrange(10):
+			Vk, Uk = step(V[k], U[k], I[k], a[k], b[k], 0.5)
+			assert np.allclose([ Vk, Uk ], [ V1[k], U1[k] ], rtol=1e-12)
+	for step in lif_integrators.values():
+		Vm = step(V, I, -65.0, a * 100, 0.5)
+		for k in xrange(10):
+			assert np.allclose(step(V[k], I[k], -65.0, a[k] * 100, 0.5), Vm[k],
+				rtol=1e-12)
+
+def test_engines():
+	"""The object and compiled engines give the same trial for any scheme,
+	also when the neurons of a network use different ones
+	"""
+	methods = [ ('euler', 'euler'), ('halfstep', 'exp'), ('rk2', 'euler'),
+		('rk4', 'exp'), None ]
+	for seed, m in enumerate(methods):
+		nets = []
+		for eng in [ 'objects', 'compiled' ]:
+			if m is None:
+				net = network.Network(spec, seed=seed)
+				for k, nrn in enumerate(net.nodes):
+					if isinstance(nrn, neurons.Izh_Neuron):
+						nrn.method = sorted(izh_integrators)[k % 4]
+					elif isinstance(nrn, neurons.LIF_Neuron):
+						nrn.method = sorted(lif_integrators)[k % 2]
+			else:
+				net = network.Network(spec, seed=seed, izh_method=m[0],
+					lif_method=m[1])
+			net.set_recording(everything=True)
+			nets.append( (net.simulate(T=600, engine=eng, progress=False),
+				net) )
+		(res_obj, obj), (res_cmp, cmp) = nets
+		assert res_obj == res_cmp, (m, res_obj, res_cmp)
+		assert np.allclose(obj.Vv[:,:300], cmp.Vv[:,:300], atol=1e-6)
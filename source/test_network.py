@@ -0,0 +1,156 @@
+"""Tests of building networks, and of reusing them for new trials (see
+Network, cache=): a reused network has to start every trial as a new one
+would. Run with pytest, or with run_tests.py
+"""
+import shutil
+import tempfile
+import numpy as np
+
+import network
+import neurons
+
+with open('networkfile.py') as f:
+	spec = f.read()
+
+# a spec with a custom neuron type, that counts its steps: state that
+# neurons.randomize_state doesn't know of
+counting_spec = spec + """
+class Counting_neuron(LIF_Neuron):
+	def __init__(self, syn_in=[]):
+		super(Counting_neuron, self).__init__(syn_in)
+		self.steps = 0
+
+	def step(self, dt=1.0):
+		self.steps += 1
+		super(Counting_neuron, self).step(dt)
+
+counter = Counting_neuron(syn_in=[in0])
+counter.name = 'counter'
+Neuronal_synapse(w=1.0, pre=counter, post=out0)
+nodes += [counter]
+"""
+
+# a declarative spec (see netspec.py), built as arrays
+decl = { "populations": { "a": {"type": "LIF", "n": 20},
+		"b": {"type": "Izh", "n": 10, "record": True} },
+	"projections": [ {"pre": "in0", "post": "a"}, {"pre": "in1", "post": "b"},
+		{"pre": "a", "post": "out0", "rule": "fixed_indegree", "k": 5,
+		 "w": 2.0},
+		{"pre": "b", "post": "out1", "w": 2.0},
+		{"type": "Poisson", "post": "a", "n": 2, "firing_rate": 0.05,
+		 "w": 0.5},
+		{"pre": "a", "post": "a", "rule": "fixed_probability", "p": 0.1,
+		 "w": 0.2} ] }
+
+def counter(net):
+	return [ nrn for nrn in net.nodes if nrn.name == 'counter' ][0]
+
+def test_cache_custom_types():
+	"""A network with custom types is built anew for every trial, so its
+	trials don't depend on the trials before
+	"""
+	for seed in [ 0, 1, 2 ]:
+		net = network.Network(counting_spec, cache=True, seed=seed)
+		assert net.template is None
+		assert counter(net).steps == 0
+		result = net.simulate(T=400, engine='objects', progress=False)
+		assert counter(net).steps > 0
+		fresh = network.Network(counting_spec, seed=seed)
+		assert fresh.simulate(T=400, engine='objects', progress=False) == result
+
+def test_auto_engine():
+	"""engine='auto' compiles the network if it can, and simulates the
+	objects if it has types that can't be compiled
+	"""
+	net = network.Network(spec, seed=0)
+	net.simulate(T=400, engine='auto', progress=False)
+	assert net.compiled is not None
+	net = network.Network(counting_spec, seed=0)
+	net.simulate(T=400, engine='auto', progress=False)
+	assert net.compiled is None and counter(net).steps > 0
+
+def test_cache_reuse():
+	"""A reused network gives the trial of its seed, as a new one does"""
+	first = network.Network(spec, cache=True, seed=0)
+	first.simulate(T=600, engine='objects', progress=False)
+	for seed in [ 1, 2 ]:
+		net = network.Network(spec, cache=True, seed=seed)
+		assert net.nodes is first.nodes
+		fresh = network.Network(spec, seed=seed)
+		for eng in [ 'objects', 'compiled' ]:
+			assert net.simulate(T=600, engine=eng, progress=False) == \
+				fresh.simulate(T=600, engine=eng, progress=False)
+			net = network.Network(spec, cache=True, seed=seed)
+			fresh = network.Network(spec, seed=seed)
+
+def test_cache_methods():
+	"""The integration schemes of a network don't carry over to the next
+	network of the spec
+	"""
+	izh = lambda net: set( nrn.method for nrn in net.nodes
+		if isinstance(nrn, neurons.Izh_Neuron) )
+	lif = lambda net: set( nrn.method for nrn in net.nodes
+		if isinstance(nrn, neurons.LIF_Neuron) )
+	net = network.Network(spec, cache=True, izh_method='rk4',
+		lif_method='exp')
+	assert izh(net) == set(['rk4']) and lif(net) == set(['exp'])
+	net = network.Network(spec, cache=True)
+	assert net.template is not None
+	assert izh(net) == set(['euler']) and lif(net) == set(['euler'])
+	net = network.Network(spec, cache=True, lif_method='exp')
+	assert izh(net) == set(['euler']) and lif(net) == set(['exp'])
+
+def test_cache_dir():
+	"""A network stored in cache_dir is loaded from there, with the
+	integration schemes it was built with
+	"""
+	directory = tempfile.mkdtemp()
+	try:
+		params = dict(cache_dir_test=True) # a spec of its own
+		net = network.Network(spec, cache=True, cache_dir=directory,
+			params=params, izh_method='rk2', seed=3)
+		expected = net.simulate(T=600, engine='compiled', progress=False)
+		network._templates.clear()
+		net = network.Network(spec, cache=True, cache_dir=directory,
+			params=params, seed=3)
+		assert net.template is not None
+		assert all( nrn.method == 'euler' for nrn in net.nodes )
+		net = network.Network(spec, cache=True, cache_dir=directory,
+			params=params, izh_method='rk2', seed=3)
+		assert net.simulate(T=600, engine='compiled',
+			progress=False) == expected
+	finally:
+		shutil.rmtree(directory)
+
+def test_declarative_objects():
+	"""A declarative spec is built as arrays, without objects; the objects
+	made from them on demand simulate the same trial (up to round-off)
+	"""
+	for seed in [ 0, 1 ]:
+		net = network.Network(decl, seed=seed)
+		net.simulate(T=400, engine='compiled', progress=False)
+		assert net.arrays is not None and 'nodes' not in net.__dict__
+		objs = network.Network(decl, seed=seed)
+		objs.simulate(T=400, engine='objects', progress=False)
+		assert objs.arrays is None and len(objs.nodes) == 32
+		assert np.allclose(objs.Vv, net.Vv)
+
+def test_declarative_cache():
+	"""The arrays of a declarative spec are reused as objects are"""
+	directory = tempfile.mkdtemp()
+	try:
+		first = network.Network(decl, cache=True, cache_dir=directory,
+			izh_method='rk4', seed=0)
+		first.simulate(T=400, engine='compiled', progress=False)
+		network._templates.clear()
+		for seed in [ 1, 2 ]:
+			net = network.Network(decl, cache=True, cache_dir=directory,
+				seed=seed)
+			assert net.template is not None
+			assert set(net.arrays.nrn['method']) == set(['euler'])
+			fresh = network.Network(decl, seed=seed)
+			assert net.simulate(T=400, engine='compiled', progress=False) \
+				== fresh.simulate(T=400, engine='compiled', progress=False)
+			assert np.array_equal(net.Vv, fresh.Vv)
+	finally:
+		shutil.rmtree(directory)
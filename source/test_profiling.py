@@ -0,0 +1,92 @@
+"""Tests of the profiling of the time step (see profiling.py): every phase is
+timed once per step, and profiling doesn't change a trial. Run with pytest,
+or with run_tests.py
+"""
+import os
+import csv
+import shutil
+import tempfile
+import StringIO
+import numpy as np
+
+import network
+from profiling import Phase_profiler
+from network_simulator import Network_simulator
+from test_network import spec
+
+def test_laps():
+	"""Laps add up per phase; merge adds up profilers; rows are the most
+	expensive phase first, with fractions of the total
+	"""
+	prof = Phase_profiler()
+	for _ in xrange(3):
+		prof.start()
+		prof.lap('a')
+		sum(xrange(10000))
+		prof.lap('b')
+	assert prof.calls == dict(a=3, b=3)
+	assert prof.time['b'] > prof.time['a'] >= 0
+	other = Phase_profiler()
+	other.lap('b')
+	other.lap('c')
+	prof.merge(other)
+	assert prof.calls == dict(a=3, b=4, c=1)
+	rows = prof.rows()
+	assert [ row[0] for row in rows ][0] == 'b'
+	assert abs(sum( row[4] for row in rows ) - 1) < 1e-12
+	assert all( abs(row[3] - 1e6 * row[1] / row[2]) < 1e-6 for row in rows )
+
+def test_output():
+	"""report() prints, and write_csv() writes, a row per phase"""
+	prof = Phase_profiler()
+	prof.lap('a')
+	prof.lap('b')
+	out = StringIO.StringIO()
+	prof.report(out)
+	lines = out.getvalue().splitlines()
+	assert len(lines) == 3 and lines[0].split()[0] == 'phase'
+	directory = tempfile.mkdtemp()
+	try:
+		fname = os.path.join(directory, 'profile.csv')
+		prof.write_csv(fname)
+		with open(fname) as f:
+			rows = list(csv.reader(f))
+		assert rows[0][0] == 'phase'
+		assert sorted( row[0] for row in rows[1:] ) == [ 'a', 'b' ]
+	finally:
+		shutil.rmtree(directory)
+
+def test_network():
+	"""Every engine times its phases once per time step, and gives the
+	trial it gives without profiling
+	"""
+	phases = dict(
+		objects=[ 'synapses: Poisson_synapse', 'neurons: Izh_Neuron',
+			'background noise', 'record', 'check descision' ],
+		compiled=[ 'compiled: synapses', 'compiled: gather input',
+			'compiled: Izh_Neuron', 'compiled: LIF_Neuron', 'record',
+			'check descision' ] )
+	for eng in [ 'objects', 'compiled' ]:
+		prof = Phase_profiler()
+		net = network.Network(spec, seed=0)
+		result = net.simulate(T=800, engine=eng, progress=False,
+			profile=prof)
+		assert result == network.Network(spec, seed=0).simulate(T=800,
+			engine=eng, progress=False)
+		steps = int(np.arange(0, 800, 1.0).searchsorted(result[1])) + 1
+		for phase in phases[eng]:
+			assert prof.calls[phase] == steps, (eng, phase)
+		assert net.profiler is prof
+		# the next trial isn't profiled, unless asked:
+		net = network.Network(spec, seed=1)
+		net.simulate(T=400, engine=eng, progress=False)
+		assert net.profiler is None and prof.calls['record'] == steps
+
+def test_simulator():
+	"""A profiled Network_simulator adds up the phases of all its trials"""
+	sim = Network_simulator(spec, T=600, seed=3, verbose=False, profile=True)
+	sim.simulate_batched(4, batch_size=2)
+	steps = sim.profiler.calls['check descision']
+	assert steps >= 2 * 300
+	sim.simulate(2, rug_plot=False)
+	assert sim.profiler.calls['check descision'] > steps
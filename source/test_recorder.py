@@ -0,0 +1,121 @@
+"""Tests of the recorders (see recorder.py): traces and spikes have to read
+back as they were recorded, however they were stored. Run with pytest, or
+with run_tests.py
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import network
+from recorder import Trace_recorder, Spike_monitor
+from test_network import spec
+
+def test_trace_append():
+	"""A trace file can be opened again, to append to it; times() follows
+	the samples stored, also when downsampled
+	"""
+	directory = tempfile.mkdtemp()
+	try:
+		path = os.path.join(directory, 'V.npy')
+		values = np.random.RandomState(0).random_sample((300, 4))
+		rec = Trace_recorder(4, path, dtype=np.float32, chunk=64, every=2)
+		for k, row in enumerate(values[:100]):
+			if rec.due(k):
+				rec.append(row)
+		rec.close()
+		rec = Trace_recorder(None, path, dtype=np.float32, chunk=64, every=2,
+			append=True, t0=100.0)
+		assert rec.n_rows == 4 and rec.n_samples == 50
+		# read before close: the samples so far
+		assert rec.read().shape == (4, 50)
+		for k, row in enumerate(values[100:], 100):
+			if rec.due(k):
+				rec.append(row)
+		rec.close()
+		expected = values[::2].astype(np.float32)
+		assert np.array_equal(rec.read(), expected.T)
+		assert np.array_equal(np.load(path), expected)
+		assert np.allclose(rec.times()[:3], [ 100.0, 102.0, 104.0 ])
+		# appending other rows or another dtype is an error:
+		for n_rows, dtype in [ (3, np.float32), (4, np.float64) ]:
+			try:
+				Trace_recorder(n_rows, path, dtype=dtype, append=True)
+				raised = False
+			except ValueError:
+				raised = True
+			assert raised
+	finally:
+		shutil.rmtree(directory)
+
+def test_spikes():
+	"""The monitor grows as spikes come in, and keeps them in order"""
+	rng = np.random.RandomState(0)
+	mon = Spike_monitor([ 'n{}'.format(k) for k in xrange(5) ], capacity=4)
+	idx, t = [], []
+	for step in xrange(100):
+		spiking = np.flatnonzero(rng.rand(5) < 0.3)
+		mon.append(step * 0.5, spiking)
+		idx.extend(spiking)
+		t.extend([ step * 0.5 ] * len(spiking))
+	mon.append(np.array([ 50.25, 50.75 ]), [ 4, 0 ])
+	assert list(mon.neurons) == idx + [ 4, 0 ]
+	assert list(mon.times) == t + [ 50.25, 50.75 ]
+	assert mon.neurons.dtype == np.int32
+
+def test_rates():
+	"""rates() counts the spikes per neuron and bin, in Hz"""
+	mon = Spike_monitor([ 'a', 'b', 'c' ])
+	mon.append(1.0, [ 0, 1 ])
+	mon.append(np.array([ 2.0, 15.0, 19.0 ]), [ 0, 0, 1 ])
+	edges, rates = mon.rates(bin=10.0, tmax=20.0)
+	assert list(edges) == [ 0.0, 10.0, 20.0 ]
+	assert rates.tolist() == [ [ 200.0, 100.0 ], [ 100.0, 100.0 ],
+		[ 0.0, 0.0 ] ]
+
+def test_spikes_roundtrip():
+	"""Spikes saved to .npz load as they were"""
+	directory = tempfile.mkdtemp()
+	try:
+		mon = Spike_monitor([ 'a', 'b' ])
+		mon.append(np.array([ 0.5, 1.5, 3.0 ]), [ 1, 0, 1 ])
+		path = os.path.join(directory, 'spikes.npz')
+		mon.save(path)
+		loaded = Spike_monitor.load(path)
+		assert loaded.names == [ 'a', 'b' ]
+		assert np.array_equal(loaded.neurons, mon.neurons)
+		assert np.array_equal(loaded.times, mon.times)
+	finally:
+		shutil.rmtree(directory)
+
+def test_network_spikes():
+	"""The object and compiled engines record the same spikes (over the
+	start of a trial; see test_engines.test_objects_compiled), and the
+	spikes of the recorded neurons are where their V jumps above threshold
+	"""
+	for seed in [ 0, 1 ]:
+		spikes = []
+		for eng in [ 'objects', 'compiled' ]:
+			net = network.Network(spec, seed=seed)
+			net.simulate(T=600, engine=eng, progress=False)
+			mon = net.spike_mon
+			assert mon.names == net.node_names()
+			early = mon.times < 300
+			spikes.append( (mon.times[early], mon.neurons[early]) )
+		assert np.array_equal(spikes[0][0], spikes[1][0])
+		assert np.array_equal(spikes[0][1], spikes[1][1])
+	net = network.Network(spec, seed=0)
+	net.set_recording(everything=True)
+	net.simulate(T=600, engine='compiled', progress=False)
+	n_spikes = 0
+	for row, j in enumerate(net.rec_nrn_idx):
+		times = net.spike_mon.times[net.spike_mon.neurons == j]
+		V = net.Vv[row][np.searchsorted(net.V_rec.times(), times)]
+		assert (V >= 30).all()
+		n_spikes += len(times)
+	assert n_spikes > 0
+	# no monitor if spikes aren't recorded:
+	net = network.Network(spec, seed=0)
+	net.set_recording(spikes=False)
+	net.simulate(T=300, engine='compiled', progress=False)
+	assert net.spike_mon is None
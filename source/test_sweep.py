@@ -0,0 +1,73 @@
+"""Tests of the parameter sweeps (see sweep.py). Run with pytest, or with
+run_tests.py
+"""
+import numpy as np
+
+import network
+import neurons
+from sweep import Parameter_sweep
+from test_network import spec, counting_spec
+
+def test_grid():
+	"""grid() gives every combination of the values, once"""
+	points = Parameter_sweep.grid(w=[0.5, 1.0], izh_type=['A', 'B', 'C'])
+	assert len(points) == 6
+	assert set( (p['w'], p['izh_type']) for p in points ) == set(
+		(w, tp) for w in [0.5, 1.0] for tp in 'ABC' )
+
+def test_random_design():
+	"""random_design() draws from the ranges, reproducibly"""
+	draw = lambda: Parameter_sweep.random_design(50,
+		np.random.RandomState(1), w=(0.5, 2.0), izh_type=['A', 'C'])
+	points = draw()
+	assert len(points) == 50 and points == draw()
+	assert all( 0.5 <= p['w'] < 2.0 for p in points )
+	assert set( p['izh_type'] for p in points ) == set(['A', 'C'])
+
+def test_run():
+	"""Every point gets n_iter trials, its own spec hash and a row of the
+	summary; the Izhikevich parameters of a point are undone after it, and
+	the same seed gives the same sweep
+	"""
+	params = dict(neurons._izh_params)
+	points = Parameter_sweep.grid(izh_A_d=[2, 8])
+	runs = []
+	for _ in xrange(2):
+		sweep = Parameter_sweep(spec, T=1000, seed=4)
+		summary = sweep.run(points, n_iter=6, batch_size=4)
+		assert neurons._izh_params == params
+		runs.append( (sweep.table.column('desc'), sweep.table.column('rt')) )
+	assert len(summary) == 2 and list(summary['izh_A_d']) == [2, 8]
+	assert list(summary['n']) == [6, 6]
+	assert len(set(sweep.table.column('spec'))) == 2
+	assert (runs[0][0] == runs[1][0]).all() and (runs[0][1] == runs[1][1]).all()
+
+def test_run_objects():
+	"""A spec that can't be compiled is simulated trial by trial"""
+	sweep = Parameter_sweep(counting_spec, T=500, seed=4)
+	summary = sweep.run([ dict(a=1), dict(a=2) ], n_iter=3, batch_size=2)
+	assert list(summary['n']) == [3, 3]
+	assert len(sweep.table.column('desc')) == 6
+
+def test_run_errors():
+	"""Other errors while simulating a point are raised, not taken for a
+	network that can't be compiled (that would simulate the point again,
+	after the trials of the batches before it were stored)
+	"""
+	simulate_batch = network.Network.simulate_batch
+	calls = []
+	def failing(self, *args, **kw):
+		calls.append(1)
+		if len(calls) > 1:
+			raise TypeError("a bug in the second batch")
+		return simulate_batch(self, *args, **kw)
+	network.Network.simulate_batch = failing
+	try:
+		Parameter_sweep(spec, T=500, seed=4).run([ {} ], n_iter=4,
+			batch_size=2)
+		raised = False
+	except TypeError:
+		raised = True
+	finally:
+		network.Network.simulate_batch = simulate_batch
+	assert raised and len(calls) == 2